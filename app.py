@@ -16,23 +16,138 @@ warnings.filterwarnings("ignore", ".*safety_checker.*")
 warnings.filterwarnings("ignore", ".*You have disabled the safety checker.*")
 warnings.filterwarnings("ignore", category=UserWarning)
 
-parser = argparse.ArgumentParser(
-    description="ArtTic-LAB: A clean UI for Intel ARC GPUs."
-)
-parser.add_argument(
-    "--disable-filters", action="store_true", help="Disable custom log filters."
-)
-parser.add_argument(
-    "--host", type=str, default="127.0.0.1", help="Host address to bind the server to."
-)
-parser.add_argument("--port", type=int, default=7860, help="Port to run the server on.")
-parser.add_argument(
-    "--share", action="store_true", help="Create a public link using ngrok."
-)
 
-args = parser.parse_args()
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ArtTic-LAB: A clean UI for Intel ARC GPUs.",
+        # Prefix matching would read `batch --model` as an abbreviated --model-cache-gb.
+        allow_abbrev=False,
+    )
+    parser.add_argument(
+        "--disable-filters", action="store_true", help="Disable custom log filters."
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Host address to bind the server to."
+    )
+    parser.add_argument("--port", type=int, default=7860, help="Port to run the server on.")
+    parser.add_argument(
+        "--share", action="store_true", help="Create a public link using ngrok."
+    )
+    parser.add_argument(
+        "--png-compression",
+        type=int,
+        default=6,
+        choices=range(10),
+        metavar="{0-9}",
+        help="zlib compression level for saved images (0 = none, 9 = smallest).",
+    )
+    parser.add_argument(
+        "--fast-png",
+        action="store_true",
+        help="Save images with fast lossless compression (same as --png-compression 1).",
+    )
+    parser.add_argument(
+        "--model-cache-gb",
+        type=float,
+        default=None,
+        help="Host RAM for recently used models kept for fast switching (default: half of RAM, 0 disables).",
+    )
+    parser.add_argument(
+        "--model-cache-vram-gb",
+        type=float,
+        default=0,
+        help="VRAM recently used models may stay on the GPU with (default: 0).",
+    )
+    parser.add_argument(
+        "--preview-every",
+        type=int,
+        default=1,
+        help="Send a live latent preview at most every N sampling steps (default: 1).",
+    )
+    parser.add_argument(
+        "--preview-overhead",
+        type=float,
+        default=5,
+        help="Max share of sampling time spent on live previews, in percent (default: 5).",
+    )
+    parser.add_argument(
+        "--progress-rate",
+        type=float,
+        default=10,
+        help="Max progress/preview updates per second sent to each browser (default: 10).",
+    )
+    parser.add_argument(
+        "--device",
+        choices=["auto", "xpu", "cpu", "fake"],
+        default="auto",
+        help="Compute device backend; auto uses the Intel GPU when present (default: auto).",
+    )
+    parser.add_argument(
+        "--cpu-threads",
+        type=int,
+        default=None,
+        help="Intra-op threads for the CPU backend (default: physical cores).",
+    )
+    parser.add_argument(
+        "--native-rng",
+        action="store_true",
+        help="Draw initial noise on the device instead of the CPU. Reproduces seeds from "
+        "older versions on XPU, but the same seed then differs between devices.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser(
+        "warm-cache",
+        help="Convert every checkpoint in ./models into the converted-model cache and exit.",
+    )
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Render a job file or saved prompts without the web UI.",
+        description="Jobs are grouped by model and LoRA set, and finished jobs are recorded "
+        "in a checkpoint file so an interrupted batch resumes where it stopped.",
+    )
+    batch_source = batch_parser.add_mutually_exclusive_group(required=True)
+    batch_source.add_argument(
+        "jobs_file",
+        nargs="?",
+        help="JSONL job file: one object per line with prompt (or title of a saved prompt), "
+        "and optionally negative_prompt, seed, width, height, steps, guidance, num_images, "
+        "model, scheduler, lora, lora_weight, loras, id.",
+    )
+    batch_source.add_argument(
+        "--prompts",
+        nargs="*",
+        metavar="TITLE",
+        help="Render entries of prompts.toml instead: all of them, or the given titles.",
+    )
+    batch_parser.add_argument("--model", help="Model for jobs that do not name one.")
+    batch_parser.add_argument("--scheduler", help="Default scheduler.")
+    batch_parser.add_argument("--steps", type=int, help="Default sampling steps.")
+    batch_parser.add_argument("--guidance", type=float, help="Default guidance scale.")
+    batch_parser.add_argument("--width", type=int, help="Default width (default: the model's).")
+    batch_parser.add_argument("--height", type=int, help="Default height (default: the model's).")
+    batch_parser.add_argument("--seed", type=int, help="Default seed (default: random).")
+    batch_parser.add_argument("--num-images", type=int, help="Default images per job.")
+    batch_parser.add_argument(
+        "--checkpoint",
+        help="File recording finished jobs (default: next to the job file, or "
+        "./outputs/.batch_prompts.done.jsonl for --prompts).",
+    )
+    batch_parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and render every job."
+    )
+    batch_parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write a Chrome trace of each job next to its first image.",
+    )
+    batch_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Include torch.profiler events for the sampling loop in the traces (implies --trace).",
+    )
+    return parser
+
 
-setup_logging(disable_filters=args.disable_filters)
 logger = logging.getLogger(APP_LOGGER_NAME)
 
 
@@ -42,6 +157,30 @@ def signal_handler(sig, frame):
     sys.exit(0)
 
 
+def configure_runtime():
+    """Apply the tuning flags shared by the web UI, batch and warm-cache commands."""
+    from core.metadata_handler import metadata_handler, FAST_PNG_COMPRESS_LEVEL
+    from core.model_cache import model_cache
+    from core.latent_preview import latent_previewer
+    from web import progress_channel
+
+    progress_channel.set_max_rate(args.progress_rate)
+    latent_previewer.configure(
+        every_n_steps=args.preview_every, max_overhead=args.preview_overhead / 100
+    )
+    model_cache.configure(
+        max_host_bytes=(
+            int(args.model_cache_gb * 1024**3)
+            if args.model_cache_gb is not None
+            else None
+        ),
+        max_device_bytes=int(args.model_cache_vram_gb * 1024**3),
+    )
+    metadata_handler.set_png_compress_level(
+        FAST_PNG_COMPRESS_LEVEL if args.fast_png else args.png_compression
+    )
+
+
 def launch_web_ui():
     try:
         import uvicorn
@@ -84,11 +223,90 @@ def launch_web_ui():
     server.run()
 
 
+def run_batch_command():
+    from core.batch import (
+        BatchCheckpoint,
+        load_job_file,
+        jobs_from_prompt_book,
+        run_batch,
+    )
+
+    defaults = {
+        key: value
+        for key, value in {
+            "model": args.model,
+            "scheduler": args.scheduler,
+            "steps": args.steps,
+            "guidance": args.guidance,
+            "width": args.width,
+            "height": args.height,
+            "seed": args.seed,
+            "num_images": args.num_images,
+        }.items()
+        if value is not None
+    }
+    try:
+        if args.jobs_file:
+            jobs = load_job_file(args.jobs_file, defaults)
+            checkpoint_path = args.checkpoint or f"{args.jobs_file}.done.jsonl"
+        else:
+            jobs = jobs_from_prompt_book(args.prompts, defaults)
+            checkpoint_path = args.checkpoint or "./outputs/.batch_prompts.done.jsonl"
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not read the batch jobs: {e}")
+        sys.exit(2)
+
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    stats = run_batch(
+        jobs,
+        BatchCheckpoint(checkpoint_path),
+        trace=args.trace or args.profile,
+        profile=args.profile,
+    )
+
+    logger.info("-" * 60)
+    logger.info(
+        f"Batch finished: {stats['rendered']} jobs rendered, {stats['skipped']} already done, "
+        f"{stats['failed']} failed."
+    )
+    logger.info(
+        f"{stats['images']} images in {stats['elapsed_seconds']:.1f}s: "
+        f"{stats['images_per_minute']:.2f} images/min, {stats['seconds_per_step']:.3f} s/step, "
+        f"{stats['model_loads']} model loads ({stats['load_seconds']:.1f}s)."
+    )
+    if stats["failed"]:
+        sys.exit(1)
+
+
+def warm_cache():
+    from pipelines import warm_converted_cache
+
+    results = warm_converted_cache()
+    converted = sum(1 for _, status in results if status == "converted")
+    logger.info(
+        f"Converted model cache is warm: {converted} converted, {len(results) - converted} already cached."
+    )
+
+
 if __name__ == "__main__":
+    args = build_parser().parse_args()
+    setup_logging(disable_filters=args.disable_filters)
     signal.signal(signal.SIGINT, signal_handler)
     if not args.disable_filters:
         os.system("cls" if os.name == "nt" else "clear")
     os.makedirs("./outputs", exist_ok=True)
 
-    log_system_info()
-    launch_web_ui()
+    from pipelines.devices import set_backend
+
+    backend = set_backend(
+        args.device, native_rng=args.native_rng, threads=args.cpu_threads
+    )
+    log_system_info(backend)
+    configure_runtime()
+    if args.command == "warm-cache":
+        warm_cache()
+    elif args.command == "batch":
+        run_batch_command()
+    else:
+        launch_web_ui()
@@ -0,0 +1,123 @@
+"""Broadcast fan-out with one stalled client: per-connection send queues vs. sequential sends.
+
+Usage: python benchmarks/bench_broadcast.py [--clients 32] [--messages 50]
+
+"sequential" awaits send_json on every socket in turn (the old
+ConnectionManager.broadcast); "queued" hands each message to the clients'
+ClientConnection queues. One client never finishes a send, like a browser
+behind a dead --share tunnel. Reports how long the broadcasting handler is
+held up and how long healthy clients wait for the last message.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web.client_connection import ClientConnection
+
+
+class FakeSocket:
+    def __init__(self, latency, stalled=False):
+        self.latency = latency
+        self.stalled = stalled
+        self.received = 0
+        self.last_received_at = None
+        self.closed_with = None
+
+    async def send_json(self, message):
+        if self.stalled:
+            await asyncio.Event().wait()
+        json.dumps(message)
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        self.last_received_at = time.perf_counter()
+
+    async def send_bytes(self, data):
+        await self.send_json({})
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def run(mode, args):
+    sockets = [FakeSocket(args.latency_ms / 1000) for _ in range(args.clients - 1)]
+    stalled = FakeSocket(0, stalled=True)
+    everyone = [stalled] + sockets
+    connections = (
+        [ClientConnection(s, send_timeout=args.send_timeout) for s in everyone]
+        if mode == "queued"
+        else []
+    )
+
+    async def broadcast(message):
+        if mode == "queued":
+            for connection in connections:
+                connection.offer_json(message)
+        else:
+            for socket in everyone:
+                await asyncio.wait_for(socket.send_json(message), args.send_timeout)
+
+    start = time.perf_counter()
+    handler_blocked = 0.0
+    for i in range(args.messages):
+        message = {"type": "gallery_updated", "data": {"version": i, "images": ["x.png"] * 50}}
+        t = time.perf_counter()
+        try:
+            await broadcast(message)
+        except asyncio.TimeoutError:
+            # The old loop raised here and every later client missed the message.
+            pass
+        handler_blocked += time.perf_counter() - t
+        await asyncio.sleep(args.interval_ms / 1000)
+
+    deadline = time.perf_counter() + args.send_timeout * 2
+    while mode == "queued" and time.perf_counter() < deadline:
+        if all(c.stats()["depth"] == 0 for c in connections[1:]):
+            break
+        await asyncio.sleep(0.001)
+    healthy_done = max((s.last_received_at or start) for s in sockets) - start
+    while mode == "queued" and not connections[0].closed and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    result = {
+        "mode": mode,
+        "handler_blocked_s": round(handler_blocked, 3),
+        "healthy_clients_done_s": round(healthy_done, 3),
+        "healthy_messages_received": sum(s.received for s in sockets),
+    }
+    if mode == "queued":
+        result["coalesced"] = sum(c.coalesced for c in connections)
+        result["stalled_client_close_reason"] = connections[0].close_reason
+        for connection in connections:
+            connection.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    parser.add_argument("--send-timeout", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run("sequential", args)), asyncio.run(run("queued", args))]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(r["mode"])
+        for key, value in r.items():
+            if key != "mode":
+                print(f"  {key:<30} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Component dedup report: identical VAEs / text encoders across checkpoints.
+
+Usage: python benchmarks/bench_component_dedup.py [--models-dir ./models]
+       python benchmarks/bench_component_dedup.py --synthetic 6
+
+Hashes the shareable components of every checkpoint from the safetensors
+header offsets and reports how many bytes loading them all at once would
+save by sharing identical components. --synthetic builds fine-tune-like
+files (shared VAE/text encoder, distinct UNet) in a temp dir instead.
+"""
+import os
+import sys
+import json
+import glob
+import time
+import struct
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipelines.component_dedup import component_digests, COMPONENT_PREFIXES
+
+
+def _write_checkpoint(path, tensors):
+    header, offset = {}, 0
+    for key, data in tensors.items():
+        header[key] = {"dtype": "U8", "shape": [len(data)], "data_offsets": [offset, offset + len(data)]}
+        offset += len(data)
+    encoded = json.dumps(header).encode()
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)) + encoded)
+        for data in tensors.values():
+            f.write(data)
+
+
+def build_synthetic(directory, count, mib):
+    vae = os.urandom(mib * 1024**2 // 8)
+    text_encoder = os.urandom(mib * 1024**2 // 4)
+    for i in range(count):
+        _write_checkpoint(
+            os.path.join(directory, f"finetune_{i}.safetensors"),
+            {
+                "first_stage_model.decoder.weight": vae,
+                "cond_stage_model.transformer.weight": text_encoder,
+                "model.diffusion_model.weight": os.urandom(mib * 1024**2),
+            },
+        )
+
+
+def _component_bytes(path):
+    with open(path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    sizes = {}
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        for name, prefixes in COMPONENT_PREFIXES.items():
+            if key.startswith(prefixes):
+                begin, end = info["data_offsets"]
+                sizes[name] = sizes.get(name, 0) + end - begin
+    return sizes
+
+
+def report(paths):
+    groups = {}
+    start = time.perf_counter()
+    for path in paths:
+        sizes = _component_bytes(path)
+        for name, digest in component_digests(path).items():
+            group = groups.setdefault((name, digest), {"bytes": sizes[name], "files": []})
+            group["files"].append(os.path.basename(path))
+    elapsed = time.perf_counter() - start
+
+    shared = [
+        {"component": name, "digest": digest[:16], "bytes": g["bytes"], "files": g["files"]}
+        for (name, digest), g in groups.items()
+        if len(g["files"]) > 1
+    ]
+    return {
+        "checkpoints": len(paths),
+        "hash_s": round(elapsed, 3),
+        "shared_groups": shared,
+        "bytes_saved": sum(g["bytes"] * (len(g["files"]) - 1) for g in shared),
+        "component_bytes_total": sum(g["bytes"] * len(g["files"]) for g in groups.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models-dir", default="./models")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N")
+    parser.add_argument("--mib", type=int, default=64, help="Synthetic UNet size in MiB.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    directory = args.models_dir
+    if args.synthetic:
+        directory = tempfile.mkdtemp(prefix="arttic_dedup_")
+        build_synthetic(directory, args.synthetic, args.mib)
+    try:
+        results = report(sorted(glob.glob(os.path.join(directory, "*.safetensors"))))
+    finally:
+        if args.synthetic:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{results['checkpoints']} checkpoints hashed in {results['hash_s']}s")
+    for group in results["shared_groups"]:
+        print(
+            f"  {group['component']:<15} {group['bytes'] / 1024**2:>9.1f} MiB  x{len(group['files'])}  {group['digest']}"
+        )
+    total = results["component_bytes_total"]
+    saved = results["bytes_saved"]
+    print(
+        f"Sharing saves {saved / 1024**2:.1f} MiB of {total / 1024**2:.1f} MiB of VAE/text encoder weights"
+        + (f" ({saved / total:.0%})." if total else ".")
+    )
+
+
+if __name__ == "__main__":
+    main()
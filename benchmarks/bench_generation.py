@@ -0,0 +1,329 @@
+"""Generation-path suite on tiny random models: detection to gallery, on the CPU.
+
+Usage: python benchmarks/bench_generation.py [--families sd15 sdxl sd3 flux]
+           [--steps 8] [--repeats 5] [--threads 4] [--output results.json]
+
+Builds SD1.5/SDXL/SD3/FLUX-shaped pipelines from in-code configs (no
+downloads, fixed seed) and times each stage the app goes through: model-type
+detection from the checkpoint header, loading the converted pipeline, text
+encoding, every denoising step, VAE decode, PNG save with metadata and the
+gallery listing over N images. Stages report the median and minimum of
+--repeats runs after one warm-up. Compare two result files with
+benchmarks/compare_results.py.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+import diffusers
+import transformers
+from PIL import Image
+from pipelines import (
+    SD15Pipeline,
+    SDXLPipeline,
+    SD3Pipeline,
+    ArtTicFLUXPipeline,
+    _classify_header,
+    read_safetensors_header,
+)
+from pipelines.devices import set_backend
+from core.metadata_handler import MetadataHandler
+from core.gallery_index import GalleryIndex, INDEX_FILENAME
+from bench_png_metadata import build_gallery
+import tiny_pipelines
+from tiny_pipelines import PROMPT, NEGATIVE_PROMPT, SEED
+
+WRAPPERS = {
+    "sd15": SD15Pipeline,
+    "sdxl": SDXLPipeline,
+    "sd3": SD3Pipeline,
+    "flux": lambda path: ArtTicFLUXPipeline(path, is_schnell=True),
+}
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "runs": len(samples),
+    }
+
+
+def measure(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_detection(workdir, args, results):
+    for layout in tiny_pipelines.CHECKPOINT_LAYOUTS:
+        name = tiny_pipelines.checkpoint_name(layout)
+        path = os.path.join(workdir, f"{name}.safetensors")
+        expected = tiny_pipelines.write_checkpoint(path, layout, args.header_keys)
+
+        def detect():
+            return _classify_header(read_safetensors_header(path), name)["architecture"]
+
+        detected = detect()
+        assert detected == expected, f"{layout} detected as {detected}, expected {expected}"
+        results[f"detect.{layout}"] = measure(detect, args.repeats)
+
+
+def decode_latents(pipe, family, latents, width, height):
+    vae = pipe.vae
+    if family == "flux":
+        latents = pipe._unpack_latents(latents, height, width, pipe.vae_scale_factor)
+    latents = latents / vae.config.scaling_factor
+    if family in ("sd3", "flux"):
+        latents = latents + vae.config.shift_factor
+    image = vae.decode(latents.to(vae.dtype), return_dict=False)[0]
+    return pipe.image_processor.postprocess(image, output_type="pil")
+
+
+def bench_family(family, workdir, args, results):
+    pipe = tiny_pipelines.build_pipeline(family)
+    pipeline_class = type(pipe)
+    model_dir = os.path.join(workdir, family)
+    pipe.save_pretrained(model_dir)
+    del pipe
+
+    wrapper = WRAPPERS[family](os.path.join(workdir, f"{family}.safetensors"))
+
+    # A warm converted-cache load: from_pretrained on the diffusers layout.
+    def load():
+        wrapper.pipe = pipeline_class.from_pretrained(model_dir, torch_dtype=wrapper.dtype)
+        wrapper.pipe.set_progress_bar_config(disable=True)
+        wrapper.place_on_device()
+
+    results[f"{family}.load"] = measure(load, args.repeats)
+
+    # FLUX is guidance-distilled and encodes the positive prompt only.
+    is_flux = family == "flux"
+    guidance = 0.0 if is_flux else args.guidance
+    negative_prompt = None if is_flux else NEGATIVE_PROMPT
+    do_cfg = guidance > 1
+    embeds = {}
+
+    def encode():
+        embeds.update(wrapper.encode_prompt_embeds(PROMPT, negative_prompt, do_cfg))
+
+    results[f"{family}.encode"] = measure(encode, args.repeats)
+
+    step_seconds = []
+    latents = {}
+
+    def denoise():
+        stamps = []
+
+        def on_step_end(pipe, step, timestep, callback_kwargs):
+            stamps.append(time.perf_counter())
+            return callback_kwargs
+
+        output = wrapper.generate(
+            **embeds,
+            num_inference_steps=args.steps,
+            guidance_scale=guidance,
+            width=args.width,
+            height=args.height,
+            generator=wrapper.backend.generator(SEED),
+            output_type="latent",
+            callback_on_step_end=on_step_end,
+        )
+        latents["value"] = output.images
+        # The first step also pays for latent and timestep setup.
+        step_seconds.extend(b - a for a, b in zip(stamps, stamps[1:]))
+
+    denoise()
+    step_seconds.clear()
+    results[f"{family}.denoise"] = measure(denoise, args.repeats, warmup=0)
+    results[f"{family}.denoise_step"] = summarize(step_seconds)
+
+    def decode():
+        with torch.no_grad(), wrapper.backend.autocast(wrapper.dtype):
+            return decode_latents(
+                wrapper.pipe, family, latents["value"], args.width, args.height
+            )
+
+    results[f"{family}.decode"] = measure(decode, args.repeats)
+    wrapper.pipe = None
+
+
+def bench_png(workdir, args, results):
+    size = args.png_size
+    # Smooth gradients compress roughly like a generated image; noise would not.
+    image = Image.merge(
+        "RGB",
+        (
+            Image.linear_gradient("L").resize((size, size)),
+            Image.radial_gradient("L").resize((size, size)),
+            Image.linear_gradient("L").rotate(90).resize((size, size)),
+        ),
+    )
+    handler = MetadataHandler()
+    path = os.path.join(workdir, "png_save.png")
+
+    def save():
+        metadata = handler.create_metadata(
+            prompt=PROMPT,
+            negative_prompt=NEGATIVE_PROMPT,
+            model_name="tiny-sd15",
+            seed=SEED,
+            width=size,
+            height=size,
+            steps=args.steps,
+            cfg_scale=args.guidance,
+        )
+        handler.save_image_with_metadata(image, path, metadata)
+
+    results["png.save"] = measure(save, args.repeats)
+
+
+def bench_gallery(workdir, args, results):
+    gallery_dir = os.path.join(workdir, "gallery")
+    os.makedirs(gallery_dir)
+    build_gallery(gallery_dir, args.gallery_size, 64)
+    db_path = os.path.join(gallery_dir, INDEX_FILENAME)
+
+    def reconcile(cold):
+        if cold:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+        index = GalleryIndex(gallery_dir)
+        index.reconcile()
+        index._conn.close()
+
+    results["gallery.reconcile_cold"] = measure(lambda: reconcile(True), args.repeats)
+    results["gallery.reconcile_warm"] = measure(lambda: reconcile(False), args.repeats)
+
+    index = GalleryIndex(gallery_dir)
+    index.reconcile()
+
+    def page_all():
+        page = index.page()
+        while page["next_cursor"]:
+            page = index.page(page["next_cursor"])
+
+    results["gallery.first_page"] = measure(index.page, args.repeats)
+    results["gallery.page_all"] = measure(page_all, args.repeats)
+    index._conn.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--families",
+        nargs="*",
+        choices=tiny_pipelines.FAMILIES,
+        default=list(tiny_pipelines.FAMILIES),
+        help="Model families to run; pass none to time only detection, PNG and gallery.",
+    )
+    parser.add_argument("--device", choices=["cpu", "fake"], default="cpu")
+    parser.add_argument(
+        "--threads", type=int, default=4, help="CPU threads (fixed so runs compare)."
+    )
+    parser.add_argument("--steps", type=int, default=8)
+    parser.add_argument("--guidance", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=64)
+    parser.add_argument("--height", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--header-keys", type=int, default=2500, help="Tensors per synthetic checkpoint."
+    )
+    parser.add_argument("--png-size", type=int, default=512)
+    parser.add_argument("--gallery-size", type=int, default=500)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    if args.device == "cpu":
+        set_backend("cpu", threads=args.threads)
+    else:
+        set_backend("fake")
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="arttic_bench_")
+    try:
+        bench_detection(workdir, args, results)
+        for family in args.families:
+            bench_family(family, workdir, args, results)
+        bench_png(workdir, args, results)
+        bench_gallery(workdir, args, results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "diffusers": diffusers.__version__,
+            "transformers": transformers.__version__,
+            "threads": torch.get_num_threads(),
+            "device": args.device,
+            "config": {
+                key: getattr(args, key)
+                for key in (
+                    "families",
+                    "steps",
+                    "guidance",
+                    "width",
+                    "height",
+                    "repeats",
+                    "header_keys",
+                    "png_size",
+                    "gallery_size",
+                )
+            },
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    meta = report["meta"]
+    print(f"{meta['commit'] or 'working tree'} on {meta['processor']}, {meta['threads']} threads")
+    for name, stats in results.items():
+        print(f"  {name:<26} {stats['median_ms']:>10.3f} ms  (min {stats['min_ms']:.3f})")
+    if args.output:
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Load test for the device job queue using a fake pipeline.
+
+Usage: python benchmarks/bench_job_queue.py [--clients 16] [--jobs 3] [--burst 20]
+
+One "heavy" client submits a burst of jobs first, then every other client
+submits a few. The same workload is run with round-robin scheduling and with
+a single shared FIFO to show what fairness buys the light clients. The fake
+pipeline asserts that no two jobs ever touch it at once and that a model swap
+never happens mid-generation.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.job_queue import JobQueue
+
+
+class FakePipeline:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeBackend:
+    def __init__(self, step_time, steps):
+        self.step_time = step_time
+        self.steps = steps
+        self.pipe = FakePipeline("initial")
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def generate_image(self):
+        self._enter()
+        try:
+            pipe = self.pipe
+            for _ in range(self.steps):
+                time.sleep(self.step_time)
+                assert self.pipe is pipe, "model swapped during generation"
+            return pipe.name
+        finally:
+            self._exit()
+
+    def load_model(self, name):
+        self._enter()
+        try:
+            time.sleep(self.step_time * self.steps)
+            self.pipe = FakePipeline(name)
+        finally:
+            self._exit()
+
+
+async def run(args, fair):
+    backend = FakeBackend(args.step_time, args.steps)
+    updates = 0
+
+    def on_change():
+        nonlocal updates
+        updates += 1
+
+    queue = JobQueue(max_pending=100000, max_per_client=100000, on_change=on_change)
+    queue.start()
+    start = time.perf_counter()
+
+    def client_key(client_id):
+        return client_id if fair else "shared"
+
+    async def submit(client_id, kind, fn, **kwargs):
+        job = queue.submit(client_key(client_id), kind, fn, **kwargs)
+        return job, asyncio.wrap_future(job.future)
+
+    heavy = [
+        await submit("heavy", "generate_image", backend.generate_image)
+        for _ in range(args.burst)
+    ]
+    heavy.append(await submit("heavy", "load_model", backend.load_model, name="swapped"))
+
+    light = {}
+    for c in range(args.clients - 1):
+        client_id = f"client-{c}"
+        light[client_id] = [
+            await submit(client_id, "generate_image", backend.generate_image)
+            for _ in range(args.jobs)
+        ]
+
+    first_result = {}
+    all_futures = [f for _, f in heavy]
+    for client_id, jobs in light.items():
+        for i, (_, future) in enumerate(jobs):
+            if i == 0:
+                future.add_done_callback(
+                    lambda _, c=client_id: first_result.setdefault(
+                        c, time.perf_counter() - start
+                    )
+                )
+            all_futures.append(future)
+    await asyncio.gather(*all_futures)
+    elapsed = time.perf_counter() - start
+    queue.stop()
+
+    total_jobs = len(all_futures)
+    ideal = total_jobs * args.steps * args.step_time
+    waits = list(first_result.values())
+    return {
+        "scheduling": "round-robin" if fair else "fifo",
+        "jobs": total_jobs,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_jobs_per_s": round(total_jobs / elapsed, 2),
+        "worker_efficiency": round(ideal / elapsed, 3),
+        "max_concurrent_pipe_users": backend.max_active,
+        "light_first_result_mean_s": round(statistics.mean(waits), 3),
+        "light_first_result_max_s": round(max(waits), 3),
+        "queue_change_events": updates,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=5)
+    parser.add_argument("--step-time", type=float, default=0.002)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(args, fair=True)), asyncio.run(run(args, fair=False))]
+    for r in results:
+        assert r["max_concurrent_pipe_users"] == 1, "pipeline entered concurrently"
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(r["scheduling"])
+        for key, value in r.items():
+            if key != "scheduling":
+                print(f"  {key:<30} {value}")
+
+
+if __name__ == "__main__":
+    main()
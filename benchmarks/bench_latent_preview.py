@@ -0,0 +1,99 @@
+"""Latent preview cost: projection + JPEG per model family, and throttled overhead.
+
+Usage: python benchmarks/bench_latent_preview.py [--steps 30] [--step-ms 250]
+
+Times one preview frame per family on random latents of a 1024x1024 image,
+then replays a generation with a fake sampling step of --step-ms and reports
+how many previews the throttle sent and their share of the total time.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.latent_preview import LatentPreviewer, LATENT_RGB_FACTORS, latents_to_image
+
+MODEL_TYPE_FOR_FAMILY = {"SD 1.5": "SD 1.5", "SDXL": "SDXL", "SD3": "SD3", "FLUX": "FLUX Dev"}
+
+
+def random_latents(family, width, height):
+    channels = len(LATENT_RGB_FACTORS[family])
+    if family == "FLUX":
+        return torch.randn(1, (height // 16) * (width // 16), channels * 4)
+    return torch.randn(1, channels, height // 8, width // 8)
+
+
+def frame_cost(family, width, height, repeats):
+    previewer = LatentPreviewer()
+    latents = random_latents(family, width, height)
+    latents_to_image(latents, family, width, height, previewer.max_size)
+    samples = []
+    for _ in range(repeats):
+        session = previewer.start(MODEL_TYPE_FOR_FAMILY[family], width, height)
+        # A fresh session has no budget yet; pretend one step has already run.
+        session.started -= 1.0
+        start = time.perf_counter()
+        frame = session.maybe_preview(0, 1, latents)
+        samples.append(time.perf_counter() - start)
+    return {"ms": round(min(samples) * 1000, 3), "frame_bytes": len(frame)}
+
+
+def throttled_run(family, width, height, steps, step_s, max_overhead, every_n_steps):
+    previewer = LatentPreviewer(every_n_steps=every_n_steps, max_overhead=max_overhead)
+    latents = random_latents(family, width, height)
+    session = previewer.start(MODEL_TYPE_FOR_FAMILY[family], width, height)
+    start = time.perf_counter()
+    for step in range(steps):
+        time.sleep(step_s)
+        session.maybe_preview(step, steps, latents)
+    stats = session.stats()
+    stats["total_s"] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--step-ms", type=float, default=250)
+    parser.add_argument("--overhead", type=float, default=5, help="Budget in percent.")
+    parser.add_argument("--every", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = {
+        "frame": {
+            family: frame_cost(family, args.size, args.size, args.repeats)
+            for family in LATENT_RGB_FACTORS
+        },
+        "throttled": throttled_run(
+            "SDXL",
+            args.size,
+            args.size,
+            args.steps,
+            args.step_ms / 1000,
+            args.overhead / 100,
+            args.every,
+        ),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for family, r in results["frame"].items():
+        print(f"{family:<8} {r['ms']:>8.2f} ms/frame  {r['frame_bytes'] / 1024:>6.1f} KiB")
+    t = results["throttled"]
+    print(
+        f"{args.steps} steps @ {args.step_ms:.0f} ms: {t['previews']} previews, {t['skipped']} skipped, "
+        f"{t['overhead']:.2%} of {t['total_s']}s spent on previews (budget {args.overhead:.0f}%)"
+    )
+
+
+if __name__ == "__main__":
+    main()
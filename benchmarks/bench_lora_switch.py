@@ -0,0 +1,66 @@
+"""LoRA switch latency: full pipeline reload vs adapter hot-swap.
+
+Usage: python benchmarks/bench_lora_switch.py MODEL LORA_A LORA_B [--rounds 3]
+
+Needs an XPU and real files in ./models and ./loras. "reload" unloads and
+reloads the checkpoint with the other LoRA (what changing the LoRA used to
+cost); "swap" switches adapters on the loaded pipe, cold (first load of the
+adapter) and warm (adapter already resident). "fuse" includes fusing the
+active LoRA into the base weights.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import logic
+
+
+def _time(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("model")
+    parser.add_argument("lora_a")
+    parser.add_argument("lora_b")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    def load(lora):
+        logic.unload_model()
+        logic.load_model(args.model, None, True, False, lora)
+
+    reload_times = [_time(lambda: load(args.lora_b if i % 2 else args.lora_a)) for i in range(args.rounds)]
+
+    load(None)
+    stack = lambda lora, fuse=False: logic.set_loras([{"name": lora, "weight": 1.0}], fuse)
+    cold = [_time(lambda: stack(args.lora_a)), _time(lambda: stack(args.lora_b))]
+    warm = [_time(lambda: stack(args.lora_b if i % 2 else args.lora_a)) for i in range(args.rounds)]
+    fused = [_time(lambda: stack(args.lora_b if i % 2 else args.lora_a, True)) for i in range(args.rounds)]
+    logic.unload_model()
+
+    results = {
+        "model": args.model,
+        "reload_s": round(statistics.median(reload_times), 3),
+        "swap_cold_s": round(statistics.median(cold), 3),
+        "swap_warm_s": round(statistics.median(warm), 3),
+        "swap_fused_s": round(statistics.median(fused), 3),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for key, value in results.items():
+        print(f"  {key:<14} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-generation cost of picking an output filename as the gallery grows.
+
+Usage: python benchmarks/bench_output_counter.py [--sizes 1000 10000 100000]
+
+"listing" is the cheapest form of the old approach (list the folder and regex
+the highest number, without even opening the PNGs); "reserve" is the cost
+OutputCounter adds to every generation once warm.
+"""
+import os
+import re
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.output_counter import OutputCounter
+
+
+def _populate(directory, count):
+    for i in range(1, count + 1):
+        open(os.path.join(directory, f"ArtTic-LAB_{i}.png"), "wb").close()
+
+
+def _listing_next_number(directory):
+    pattern = re.compile(r"ArtTic-LAB_(\d+)\.png")
+    highest_num = 0
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            highest_num = max(highest_num, int(match.group(1)))
+    return highest_num + 1
+
+
+def run(size, reserves):
+    directory = tempfile.mkdtemp(prefix="arttic_counter_")
+    try:
+        _populate(directory, size)
+
+        start = time.perf_counter()
+        _listing_next_number(directory)
+        listing_ms = (time.perf_counter() - start) * 1000
+
+        counter = OutputCounter(directory)
+        start = time.perf_counter()
+        counter.reserve()
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(reserves):
+            counter.reserve()
+        reserve_ms = (time.perf_counter() - start) * 1000 / reserves
+
+        return {
+            "gallery_size": size,
+            "listing_ms": round(listing_ms, 3),
+            "cold_recovery_ms": round(cold_ms, 3),
+            "reserve_ms": round(reserve_ms, 4),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--reserves", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = [run(size, args.reserves) for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'gallery':>10} {'listing ms':>12} {'cold ms':>10} {'reserve ms':>12}")
+    for r in results:
+        print(
+            f"{r['gallery_size']:>10} {r['listing_ms']:>12.3f} "
+            f"{r['cold_recovery_ms']:>10.3f} {r['reserve_ms']:>12.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
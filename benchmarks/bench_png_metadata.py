@@ -0,0 +1,113 @@
+"""Metadata extraction over a synthetic gallery: PIL vs header-only chunk reader.
+
+Usage: python benchmarks/bench_png_metadata.py [--count 2000] [--size 512]
+
+"pil" is the previous implementation (Image.open(...).text, which decodes the
+image to collect every text chunk); "chunks" walks chunk headers only and
+"batch" runs the chunk reader over a thread pool.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import struct
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from core.metadata_handler import MetadataHandler, PNG_SIGNATURE
+
+
+def _chunk(chunk_type, data):
+    body = chunk_type + data
+    return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+
+def _idat(size):
+    row = bytes(x % 256 for x in range(size * 3))
+    raw = b"".join(b"\0" + row for _ in range(size))
+    return zlib.compress(raw, 6)
+
+
+def build_gallery(directory, count, size):
+    handler = MetadataHandler()
+    ihdr = _chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+    idat = _chunk(b"IDAT", _idat(size))
+    iend = _chunk(b"IEND", b"")
+    paths = []
+    for i in range(count):
+        metadata = handler.create_metadata(
+            prompt=f"synthetic gallery image {i}",
+            negative_prompt="",
+            model_name="benchmark",
+            seed=i,
+            width=size,
+            height=size,
+            steps=20,
+            cfg_scale=5.0,
+        )
+        text = _chunk(b"tEXt", b"parameters\0" + json.dumps(metadata).encode("latin-1"))
+        path = os.path.join(directory, f"ArtTic-LAB_{i + 1}.png")
+        with open(path, "wb") as f:
+            f.write(PNG_SIGNATURE + ihdr + text + idat + iend)
+        paths.append(path)
+    return paths
+
+
+def _pil_text(path):
+    with Image.open(path) as image:
+        return json.loads(image.text["parameters"])
+
+
+def _time(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    handler = MetadataHandler()
+    directory = tempfile.mkdtemp(prefix="arttic_meta_")
+    try:
+        paths = build_gallery(directory, args.count, args.size)
+        pil_ms, pil = _time(lambda: [_pil_text(p) for p in paths])
+        chunk_ms, chunks = _time(
+            lambda: [handler.extract_metadata_from_image(p) for p in paths]
+        )
+        batch_ms, batch = _time(
+            lambda: handler.extract_metadata_batch(paths, max_workers=args.workers)
+        )
+        assert pil == chunks == [batch[p] for p in paths], "reader mismatch"
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    results = {
+        "count": args.count,
+        "size": args.size,
+        "pil_ms": round(pil_ms, 1),
+        "chunks_ms": round(chunk_ms, 1),
+        "batch_ms": round(batch_ms, 1),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.count} images at {args.size}x{args.size}")
+    for mode in ("pil", "chunks", "batch"):
+        total = results[f"{mode}_ms"]
+        print(f"  {mode:<7} {total:>10.1f} ms  ({total / args.count:.3f} ms/image)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""PNG write latency and file size for generated images, old path vs single pass.
+
+Usage: python benchmarks/bench_png_write.py [--sizes 512 1024 2048] [--repeat 3]
+
+"save+embed" is the previous behaviour (plain save, then reopen and re-encode
+to add the metadata chunk); the other rows write image and metadata in one
+encode at the given zlib level.
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from core.metadata_handler import MetadataHandler
+
+
+def _synthetic_image(size):
+    # Smooth structure plus mild noise compresses roughly like a real render.
+    red = Image.effect_mandelbrot((size, size), (-2.0, -1.5, 1.0, 1.5), 100)
+    green = Image.linear_gradient("L").resize((size, size))
+    blue = Image.effect_noise((size, size), 24)
+    return Image.merge("RGB", (red, green, blue))
+
+
+def _metadata(handler, size):
+    return handler.create_metadata(
+        prompt="benchmark prompt " * 8,
+        negative_prompt="blurry",
+        model_name="benchmark",
+        seed=1234,
+        width=size,
+        height=size,
+        steps=30,
+        cfg_scale=5.0,
+    )
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(size, levels, repeat, directory):
+    handler = MetadataHandler()
+    image = _synthetic_image(size)
+    metadata = _metadata(handler, size)
+    path = os.path.join(directory, f"bench_{size}.png")
+    results = []
+
+    def save_then_embed():
+        image.save(path)
+        handler.embed_metadata_to_image(path, metadata)
+
+    results.append(
+        {
+            "resolution": size,
+            "mode": "save+embed",
+            "ms": round(_time(save_then_embed, repeat), 2),
+            "bytes": os.path.getsize(path),
+        }
+    )
+
+    for level in levels:
+        ms = _time(
+            lambda: handler.save_image_with_metadata(image, path, metadata, level),
+            repeat,
+        )
+        results.append(
+            {
+                "resolution": size,
+                "mode": f"single level={level}",
+                "ms": round(ms, 2),
+                "bytes": os.path.getsize(path),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--levels", type=int, nargs="+", default=[6, 1, 0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="arttic_png_")
+    try:
+        results = []
+        for size in args.sizes:
+            results.extend(run(size, args.levels, args.repeat, directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'res':>6} {'mode':<18} {'ms':>10} {'KiB':>10}")
+    for r in results:
+        print(
+            f"{r['resolution']:>6} {r['mode']:<18} {r['ms']:>10.2f} {r['bytes'] / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Event-loop cost of per-step progress: one future per step vs. a coalescing channel.
+
+Usage: python benchmarks/bench_progress_channel.py [--clients 8] [--steps 200] [--step-ms 1]
+
+Each client gets a worker thread that reports progress for --steps fake
+sampling steps. "per-step" schedules a coroutine with run_coroutine_threadsafe
+for every step (the old behaviour); "channel" publishes into a ProgressChannel.
+Loop CPU time is measured with time.thread_time() on the loop thread, which
+does nothing but deliver progress here.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web.progress_channel import ProgressChannel
+
+
+class FakeSocket:
+    def __init__(self, latency):
+        self.latency = latency
+        self.frames = 0
+
+    async def send_json(self, message):
+        json.dumps(message)
+        self.frames += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+def worker(report, steps, step_s):
+    for step in range(steps):
+        if step_s:
+            time.sleep(step_s)
+        report(step / steps, f"Sampling... {step + 1}/{steps}")
+
+
+async def run(mode, args):
+    loop = asyncio.get_running_loop()
+    sockets = [FakeSocket(args.latency_ms / 1000) for _ in range(args.clients)]
+    futures = []
+    futures_lock = threading.Lock()
+    channels = []
+
+    def per_step_reporter(socket):
+        def report(progress, desc):
+            future = asyncio.run_coroutine_threadsafe(
+                socket.send_json(
+                    {"type": "progress_update", "data": {"progress": progress, "description": desc}}
+                ),
+                loop,
+            )
+            with futures_lock:
+                futures.append(future)
+
+        return report
+
+    reporters = []
+    for socket in sockets:
+        if mode == "channel":
+            channel = ProgressChannel(loop, socket.send_json, rate=args.rate)
+            channels.append(channel)
+            reporters.append(channel.publish)
+        else:
+            reporters.append(per_step_reporter(socket))
+
+    publish_times = []
+
+    def timed_worker(report):
+        start = time.perf_counter()
+        worker(report, args.steps, args.step_ms / 1000)
+        publish_times.append(time.perf_counter() - start - args.steps * args.step_ms / 1000)
+
+    loop_cpu = time.thread_time()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(asyncio.to_thread(timed_worker, report) for report in reporters)
+    )
+    if mode == "channel":
+        while any(c._scheduled for c in channels):
+            await asyncio.sleep(0.001)
+    else:
+        await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+    elapsed = time.perf_counter() - start
+    loop_cpu = time.thread_time() - loop_cpu
+
+    total_steps = args.clients * args.steps
+    return {
+        "mode": mode,
+        "steps": total_steps,
+        "elapsed_s": round(elapsed, 3),
+        "loop_cpu_ms": round(loop_cpu * 1000, 2),
+        "loop_cpu_us_per_step": round(loop_cpu / total_steps * 1e6, 2),
+        "frames_sent": sum(s.frames for s in sockets),
+        "futures_created": len(futures),
+        "worker_overhead_us_per_step": round(
+            max(0.0, sum(publish_times)) / total_steps * 1e6, 2
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--step-ms", type=float, default=1)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated send latency.")
+    parser.add_argument("--rate", type=float, default=10, help="Channel flushes per second.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run("per-step", args)), asyncio.run(run("channel", args))]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(r["mode"])
+        for key, value in r.items():
+            if key != "mode":
+                print(f"  {key:<30} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compare two bench_generation.py result files and flag regressions.
+
+Usage: python benchmarks/compare_results.py BASELINE.json CURRENT.json
+           [--threshold 0.10] [--min-delta-ms 0.5] [--json]
+
+A stage regresses when its median is more than --threshold slower than the
+baseline and the difference exceeds --min-delta-ms, which keeps sub-millisecond
+stages from failing on timer noise. Exits with status 1 if any stage regressed,
+so it can gate a CI job.
+"""
+import sys
+import json
+import argparse
+
+# Settings that change what a stage measures; results across them don't compare.
+COMPARABLE_META = ("threads", "device", "config")
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    if "results" not in report:
+        raise ValueError(f"{path} is not a bench_generation.py result file.")
+    return report
+
+
+def compare(baseline, current, threshold, min_delta_ms):
+    rows = []
+    for name, stats in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            rows.append({"stage": name, "status": "new", "current_ms": stats["median_ms"]})
+            continue
+        delta_ms = stats["median_ms"] - before["median_ms"]
+        change = delta_ms / before["median_ms"] if before["median_ms"] else 0.0
+        if change > threshold and delta_ms > min_delta_ms:
+            status = "regression"
+        elif change < -threshold and -delta_ms > min_delta_ms:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append(
+            {
+                "stage": name,
+                "status": status,
+                "baseline_ms": before["median_ms"],
+                "current_ms": stats["median_ms"],
+                "change": round(change, 4),
+            }
+        )
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            rows.append({"stage": name, "status": "missing"})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)."
+    )
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON.")
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    mismatched = [
+        key
+        for key in COMPARABLE_META
+        if baseline["meta"].get(key) != current["meta"].get(key)
+    ]
+    rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+    regressions = [row for row in rows if row["status"] == "regression"]
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "baseline": baseline["meta"].get("commit"),
+                    "current": current["meta"].get("commit"),
+                    "threshold": args.threshold,
+                    "mismatched_settings": mismatched,
+                    "stages": rows,
+                    "regressions": len(regressions),
+                },
+                indent=2,
+            )
+        )
+    else:
+        print(
+            f"{baseline['meta'].get('commit') or 'baseline'} -> "
+            f"{current['meta'].get('commit') or 'current'} (threshold {args.threshold:.0%})"
+        )
+        if mismatched:
+            print(f"  warning: runs differ in {', '.join(mismatched)}; timings may not compare")
+        for row in rows:
+            if "change" in row:
+                print(
+                    f"  {row['stage']:<26} {row['baseline_ms']:>10.3f} -> "
+                    f"{row['current_ms']:>10.3f} ms  {row['change']:>+7.1%}  {row['status']}"
+                )
+            else:
+                print(f"  {row['stage']:<26} {row['status']}")
+        print(f"{len(regressions)} regression(s).")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
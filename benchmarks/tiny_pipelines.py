@@ -0,0 +1,319 @@
+"""Tiny randomly initialised pipelines and checkpoint headers for the benchmark suite.
+
+Everything is built from in-code configs (shaped like the diffusers test
+fixtures) with a fixed seed, so the suite needs no downloads and gives the
+same weights on every run. The models are far too small to draw anything;
+they exercise the same code paths as the real ones at a cost CI can afford.
+"""
+import json
+import struct
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers, processors
+from transformers import (
+    CLIPTextConfig,
+    CLIPTextModel,
+    CLIPTextModelWithProjection,
+    PreTrainedTokenizerFast,
+    T5Config,
+    T5EncoderModel,
+)
+from diffusers import (
+    AutoencoderKL,
+    EulerDiscreteScheduler,
+    FlowMatchEulerDiscreteScheduler,
+    FluxPipeline,
+    FluxTransformer2DModel,
+    SD3Transformer2DModel,
+    StableDiffusion3Pipeline,
+    StableDiffusionPipeline,
+    StableDiffusionXLPipeline,
+    UNet2DConditionModel,
+)
+
+FAMILIES = ("sd15", "sdxl", "sd3", "flux")
+SEED = 0
+VOCAB_SIZE = 1000
+CLIP_MAX_LENGTH = 77
+T5_MAX_LENGTH = 512
+PROMPT = "a watercolor painting of a lighthouse on a cliff at dawn, soft light"
+NEGATIVE_PROMPT = "blurry, low quality"
+
+# Key patterns of each single-file layout, repeated up to the requested key
+# count so header parsing sees a realistically sized JSON blob.
+CHECKPOINT_LAYOUTS = {
+    "sd15": (
+        "SD 1.5",
+        [
+            "model.diffusion_model.input_blocks.{i}.0.in_layers.0.weight",
+            "model.diffusion_model.output_blocks.{i}.0.out_layers.3.weight",
+            "cond_stage_model.transformer.text_model.encoder.layers.{i}.mlp.fc1.weight",
+            "first_stage_model.decoder.up.{i}.block.0.conv1.weight",
+        ],
+    ),
+    "sd2": (
+        "SD 2.x",
+        [
+            "model.diffusion_model.input_blocks.8.1.transformer_blocks.0.attn2.to_k.weight",
+            "model.diffusion_model.input_blocks.{i}.0.in_layers.0.weight",
+            "model.diffusion_model.output_blocks.{i}.0.out_layers.3.weight",
+            "cond_stage_model.model.transformer.resblocks.{i}.mlp.c_fc.weight",
+            "first_stage_model.decoder.up.{i}.block.0.conv1.weight",
+        ],
+    ),
+    "sdxl": (
+        "SDXL",
+        [
+            "model.diffusion_model.input_blocks.{i}.1.transformer_blocks.0.attn1.to_q.weight",
+            "model.diffusion_model.output_blocks.{i}.1.transformer_blocks.0.ff.net.2.weight",
+            "conditioner.embedders.0.transformer.text_model.encoder.layers.{i}.mlp.fc1.weight",
+            "conditioner.embedders.1.model.transformer.resblocks.{i}.attn.in_proj_weight",
+            "first_stage_model.decoder.up.{i}.block.0.conv1.weight",
+        ],
+    ),
+    "sd3": (
+        "SD3",
+        [
+            "model.diffusion_model.joint_blocks.{i}.x_block.attn.qkv.weight",
+            "model.diffusion_model.joint_blocks.{i}.context_block.mlp.fc1.weight",
+            "text_encoders.clip_l.transformer.text_model.encoder.layers.{i}.mlp.fc1.weight",
+            "text_encoders.t5xxl.transformer.encoder.block.{i}.layer.0.SelfAttention.q.weight",
+            "first_stage_model.decoder.up.{i}.block.0.conv1.weight",
+        ],
+    ),
+    "flux": (
+        "FLUX Schnell",
+        [
+            "double_blocks.{i}.img_attn.qkv.weight",
+            "double_blocks.{i}.txt_mlp.0.weight",
+            "single_blocks.{i}.linear1.weight",
+            "single_blocks.{i}.modulation.lin.weight",
+        ],
+    ),
+}
+
+
+def checkpoint_name(layout):
+    # Detection keys the FLUX variant off the filename.
+    return f"tiny-{layout}-schnell" if layout == "flux" else f"tiny-{layout}"
+
+
+def write_checkpoint(path, layout, key_count):
+    """Write a valid .safetensors file whose keys follow a single-file layout.
+
+    Returns the architecture inspect_model should report for it.
+    """
+    architecture, patterns = CHECKPOINT_LAYOUTS[layout]
+    keys = set()
+    i = 0
+    while len(keys) < key_count:
+        keys.update(pattern.format(i=i) for pattern in patterns)
+        i += 1
+    keys = sorted(keys)
+
+    tensor_bytes = 4 * 4 * 2
+    header = {"__metadata__": {"format": "pt"}}
+    for n, key in enumerate(keys):
+        header[key] = {
+            "dtype": "F16",
+            "shape": [4, 4],
+            "data_offsets": [n * tensor_bytes, (n + 1) * tensor_bytes],
+        }
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    encoded += b" " * (-len(encoded) % 8)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        f.write(bytes(tensor_bytes * len(keys)))
+    return architecture
+
+
+def _tokenizer(max_length):
+    vocab = {"<pad>": 0, "<unk>": 1, "<s>": 2, "</s>": 3}
+    for word in sorted(set((PROMPT + " " + NEGATIVE_PROMPT).replace(",", " ").split())):
+        vocab[word] = len(vocab)
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 2), ("</s>", 3)]
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        bos_token="<s>",
+        eos_token="</s>",
+        unk_token="<unk>",
+        pad_token="<pad>",
+        model_max_length=max_length,
+    )
+
+
+def _clip_config(**overrides):
+    return CLIPTextConfig(
+        bos_token_id=2,
+        eos_token_id=3,
+        pad_token_id=0,
+        hidden_size=32,
+        intermediate_size=37,
+        num_attention_heads=4,
+        num_hidden_layers=5,
+        max_position_embeddings=CLIP_MAX_LENGTH,
+        vocab_size=VOCAB_SIZE,
+        **overrides,
+    )
+
+
+def _sd_vae():
+    return AutoencoderKL(
+        block_out_channels=(32, 64),
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D",) * 2,
+        up_block_types=("UpDecoderBlock2D",) * 2,
+        latent_channels=4,
+        sample_size=64,
+    )
+
+
+def _flow_vae(latent_channels):
+    return AutoencoderKL(
+        block_out_channels=(4,),
+        in_channels=3,
+        out_channels=3,
+        layers_per_block=1,
+        latent_channels=latent_channels,
+        norm_num_groups=1,
+        sample_size=32,
+        use_quant_conv=False,
+        use_post_quant_conv=False,
+        shift_factor=0.0609,
+        scaling_factor=1.5035,
+    )
+
+
+def _ldm_scheduler():
+    return EulerDiscreteScheduler(
+        beta_start=0.00085, beta_end=0.012, beta_schedule="scaled_linear"
+    )
+
+
+def build_sd15():
+    return StableDiffusionPipeline(
+        vae=_sd_vae(),
+        text_encoder=CLIPTextModel(_clip_config()),
+        tokenizer=_tokenizer(CLIP_MAX_LENGTH),
+        unet=UNet2DConditionModel(
+            block_out_channels=(32, 64),
+            layers_per_block=2,
+            sample_size=32,
+            in_channels=4,
+            out_channels=4,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+            cross_attention_dim=32,
+        ),
+        scheduler=_ldm_scheduler(),
+        safety_checker=None,
+        feature_extractor=None,
+        requires_safety_checker=False,
+    )
+
+
+def build_sdxl():
+    return StableDiffusionXLPipeline(
+        vae=_sd_vae(),
+        text_encoder=CLIPTextModel(_clip_config()),
+        text_encoder_2=CLIPTextModelWithProjection(_clip_config(projection_dim=32)),
+        tokenizer=_tokenizer(CLIP_MAX_LENGTH),
+        tokenizer_2=_tokenizer(CLIP_MAX_LENGTH),
+        unet=UNet2DConditionModel(
+            block_out_channels=(32, 64),
+            layers_per_block=2,
+            sample_size=32,
+            in_channels=4,
+            out_channels=4,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+            attention_head_dim=(2, 4),
+            use_linear_projection=True,
+            addition_embed_type="text_time",
+            addition_time_embed_dim=8,
+            transformer_layers_per_block=(1, 2),
+            # Six time ids of 8 dims each plus the 32-dim pooled text embedding.
+            projection_class_embeddings_input_dim=80,
+            cross_attention_dim=64,
+        ),
+        scheduler=_ldm_scheduler(),
+        add_watermarker=False,
+    )
+
+
+def build_sd3():
+    # The T5 encoder is optional in SD3; without it the pipeline feeds zeros.
+    return StableDiffusion3Pipeline(
+        transformer=SD3Transformer2DModel(
+            sample_size=32,
+            patch_size=1,
+            in_channels=4,
+            num_layers=1,
+            attention_head_dim=8,
+            num_attention_heads=4,
+            caption_projection_dim=32,
+            joint_attention_dim=32,
+            pooled_projection_dim=64,
+            out_channels=4,
+        ),
+        scheduler=FlowMatchEulerDiscreteScheduler(),
+        vae=_flow_vae(latent_channels=4),
+        text_encoder=CLIPTextModelWithProjection(_clip_config(projection_dim=32)),
+        tokenizer=_tokenizer(CLIP_MAX_LENGTH),
+        text_encoder_2=CLIPTextModelWithProjection(_clip_config(projection_dim=32)),
+        tokenizer_2=_tokenizer(CLIP_MAX_LENGTH),
+        text_encoder_3=None,
+        tokenizer_3=None,
+    )
+
+
+def build_flux():
+    return FluxPipeline(
+        transformer=FluxTransformer2DModel(
+            patch_size=1,
+            # Latents are packed 2x2, so four channels per latent channel.
+            in_channels=4,
+            num_layers=1,
+            num_single_layers=1,
+            attention_head_dim=16,
+            num_attention_heads=2,
+            joint_attention_dim=32,
+            pooled_projection_dim=32,
+            axes_dims_rope=[4, 4, 8],
+        ),
+        scheduler=FlowMatchEulerDiscreteScheduler(),
+        vae=_flow_vae(latent_channels=1),
+        text_encoder=CLIPTextModel(_clip_config()),
+        tokenizer=_tokenizer(CLIP_MAX_LENGTH),
+        text_encoder_2=T5EncoderModel(
+            T5Config(
+                vocab_size=VOCAB_SIZE,
+                d_model=32,
+                d_kv=8,
+                d_ff=37,
+                num_layers=2,
+                num_heads=4,
+                relative_attention_num_buckets=8,
+                pad_token_id=0,
+                eos_token_id=3,
+                decoder_start_token_id=0,
+            )
+        ),
+        tokenizer_2=_tokenizer(T5_MAX_LENGTH),
+    )
+
+
+BUILDERS = {"sd15": build_sd15, "sdxl": build_sdxl, "sd3": build_sd3, "flux": build_flux}
+
+
+def build_pipeline(family):
+    """A freshly initialised tiny pipeline; the same weights on every call."""
+    torch.manual_seed(SEED)
+    pipe = BUILDERS[family]()
+    pipe.set_progress_bar_config(disable=True)
+    return pipe
@@ -0,0 +1,258 @@
+# core/batch.py
+import os
+import json
+import time
+import hashlib
+import logging
+from . import logic
+from .prompt_book import PromptBook
+
+logger = logging.getLogger("arttic_lab")
+
+JOB_DEFAULTS = {
+    "negative_prompt": "",
+    "seed": None,
+    "width": None,
+    "height": None,
+    "steps": 30,
+    "guidance": 7.0,
+    "num_images": 1,
+    "model": None,
+    "scheduler": None,
+    "loras": [],
+    "cpu_offload": False,
+    "vae_tiling": True,
+}
+JOB_FIELDS = set(JOB_DEFAULTS) | {"id", "prompt", "title", "lora", "lora_weight"}
+
+
+def _normalize_job(raw, defaults, prompt_book, where):
+    unknown = set(raw) - JOB_FIELDS
+    if unknown:
+        raise ValueError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}.")
+    job = {**JOB_DEFAULTS, **defaults, **raw}
+
+    if not job.get("prompt") and job.get("title"):
+        entry = next(
+            (p for p in prompt_book.get_all_prompts() if p.get("title") == job["title"]),
+            None,
+        )
+        if entry is None:
+            raise ValueError(f"{where}: no prompt titled '{job['title']}' in the prompt book.")
+        job["prompt"] = entry.get("prompt", "")
+        if not raw.get("negative_prompt"):
+            job["negative_prompt"] = entry.get("negative_prompt", "")
+    if not job.get("prompt"):
+        raise ValueError(f"{where}: a job needs a prompt (or the title of a saved prompt).")
+    if not job.get("model"):
+        raise ValueError(f"{where}: no model given (set it in the job or with --model).")
+
+    lora = job.pop("lora", None)
+    lora_weight = job.pop("lora_weight", None)
+    if lora and not raw.get("loras"):
+        job["loras"] = [{"name": lora, "weight": 1.0 if lora_weight is None else lora_weight}]
+    job["loras"] = [
+        {"name": l["name"], "weight": float(l.get("weight", 1.0))} for l in job["loras"]
+    ]
+    job.pop("title", None)
+    # Jobs are identified by their content unless they carry an id, so
+    # reordering or extending the job file keeps the checkpoint valid.
+    if job.get("id") is None:
+        digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()
+        job["id"] = digest[:16]
+    job["id"] = str(job["id"])
+    return job
+
+
+def load_job_file(path, defaults=None, prompt_book=None):
+    """Jobs from a JSONL file, one JSON object per line; blank and # lines are skipped."""
+    prompt_book = prompt_book or PromptBook()
+    jobs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e}).") from None
+            jobs.append(_normalize_job(raw, defaults or {}, prompt_book, f"{path}:{line_number}"))
+    return jobs
+
+
+def jobs_from_prompt_book(titles=None, defaults=None, prompt_book=None):
+    """One job per saved prompt, or only the ones with the given titles."""
+    prompt_book = prompt_book or PromptBook()
+    entries = prompt_book.get_all_prompts()
+    if titles:
+        known = {p.get("title") for p in entries}
+        missing = [t for t in titles if t not in known]
+        if missing:
+            raise ValueError(f"No prompt titled {', '.join(repr(t) for t in missing)}.")
+        entries = [p for p in entries if p.get("title") in titles]
+    return [
+        _normalize_job(
+            {"prompt": p.get("prompt", ""), "negative_prompt": p.get("negative_prompt", "")},
+            defaults or {},
+            prompt_book,
+            f"prompt '{p.get('title')}'",
+        )
+        for p in entries
+    ]
+
+
+def group_jobs(jobs):
+    """Order jobs so each model (and LoRA set within it) is loaded once.
+
+    Groups keep the order in which they first appear in the job list.
+    """
+    groups = {}
+    for job in jobs:
+        key = (
+            job["model"],
+            job["cpu_offload"],
+            job["vae_tiling"],
+            tuple(sorted(l["name"] for l in job["loras"])),
+        )
+        groups.setdefault(key, []).append(job)
+    by_model = {}
+    for key, group in groups.items():
+        by_model.setdefault(key[:3], []).append(group)
+    return [group for model_groups in by_model.values() for group in model_groups]
+
+
+class BatchCheckpoint:
+    """Append-only JSONL record of finished jobs, so a crashed batch resumes where it stopped.
+
+    Failed jobs are recorded with an "error" and are retried on the next run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write leaves at most one torn line at the end.
+                        continue
+                    if "error" not in record:
+                        self.done[record["id"]] = record
+
+    def _append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, job_id, images, seconds):
+        record = {"id": job_id, "images": images, "seconds": round(seconds, 3)}
+        self._append(record)
+        self.done[job_id] = record
+
+    def record_error(self, job_id, error):
+        self._append({"id": job_id, "error": str(error)})
+
+
+def run_batch(jobs, checkpoint, progress=None, trace=False, profile=False):
+    """Render every job not yet in the checkpoint and return throughput stats.
+
+    trace/profile are passed to generate_image for every job.
+    """
+    report = progress or (lambda message: logger.info(message))
+    pending = [job for job in jobs if job["id"] not in checkpoint.done]
+    if len(pending) < len(jobs):
+        report(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} jobs already done.")
+
+    stats = {
+        "jobs": len(jobs),
+        "skipped": len(jobs) - len(pending),
+        "rendered": 0,
+        "failed": 0,
+        "images": 0,
+        "steps": 0,
+        "model_loads": 0,
+        "load_seconds": 0.0,
+        "render_seconds": 0.0,
+    }
+    start = time.perf_counter()
+    position = 0
+    loaded = None
+    failed_models = {}
+    for group in group_jobs(pending):
+        first = group[0]
+        model = (first["model"], first["cpu_offload"], first["vae_tiling"])
+        if model in failed_models:
+            # Later LoRA groups of a model that failed to load would only fail again.
+            for job in group:
+                checkpoint.record_error(job["id"], failed_models[model])
+            stats["failed"] += len(group)
+            position += len(group)
+            continue
+        # LoRA sets within a model are switched as adapters by generate_image.
+        if model != loaded:
+            load_start = time.perf_counter()
+            try:
+                logic.load_model(
+                    first["model"],
+                    first["scheduler"],
+                    first["vae_tiling"],
+                    first["cpu_offload"],
+                    "",
+                )
+            except Exception as e:
+                failed_models[model] = f"Could not load '{first['model']}': {e}"
+                logger.error(failed_models[model])
+                for job in group:
+                    checkpoint.record_error(job["id"], failed_models[model])
+                stats["failed"] += len(group)
+                position += len(group)
+                loaded = None
+                continue
+            loaded = model
+            stats["model_loads"] += 1
+            stats["load_seconds"] += time.perf_counter() - load_start
+
+        for job in group:
+            position += 1
+            report(f"[{position}/{len(pending)}] {job['model']}: {job['prompt'][:60]}")
+            default_res = logic.app_state["default_width"]
+            job_start = time.perf_counter()
+            try:
+                result = logic.generate_image(
+                    prompt=job["prompt"],
+                    negative_prompt=job["negative_prompt"],
+                    steps=job["steps"],
+                    guidance=job["guidance"],
+                    seed=job["seed"],
+                    width=job["width"] or default_res,
+                    height=job["height"] or default_res,
+                    lora_weight=None,
+                    num_images=job["num_images"],
+                    scheduler_name=job["scheduler"],
+                    loras=job["loras"],
+                    trace=trace,
+                    profile=profile,
+                )
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                checkpoint.record_error(job["id"], e)
+                stats["failed"] += 1
+                continue
+            seconds = time.perf_counter() - job_start
+            checkpoint.record(job["id"], result["images"], seconds)
+            stats["rendered"] += 1
+            stats["images"] += len(result["images"])
+            stats["steps"] += int(job["steps"]) * len(result["images"])
+            stats["render_seconds"] += seconds
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    minutes = stats["elapsed_seconds"] / 60
+    stats["images_per_minute"] = stats["images"] / minutes if minutes else 0.0
+    stats["seconds_per_step"] = (
+        stats["render_seconds"] / stats["steps"] if stats["steps"] else 0.0
+    )
+    return stats
@@ -0,0 +1,85 @@
+# core/embedding_cache.py
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("arttic_lab")
+
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+def _tensor_bytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, (list, tuple)):
+        return sum(_tensor_bytes(v) for v in value)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+    return 0
+
+
+class EmbeddingCache:
+    """LRU cache of encoded prompts, bounded by the memory their tensors use.
+
+    Values are the keyword arguments a pipeline call accepts instead of text
+    prompts (prompt_embeds, pooled_prompt_embeds, ...), so a hit skips the
+    text encoders entirely.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_encode(self, key, encode):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = encode()
+        size = sum(_tensor_bytes(v) for v in value.values())
+        if size > self.max_bytes:
+            return value
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._sizes[key] = size
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                logger.info(f"Prompt embedding cache cleared ({len(self._entries)} entries).")
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+embedding_cache = EmbeddingCache()
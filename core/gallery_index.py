@@ -0,0 +1,346 @@
+# core/gallery_index.py
+import os
+import json
+import base64
+import bisect
+import sqlite3
+import logging
+import threading
+from collections import deque
+from .metadata_handler import metadata_handler
+
+logger = logging.getLogger("arttic_lab")
+
+OUTPUTS_DIR = "./outputs"
+INDEX_FILENAME = ".gallery_index.db"
+PROMPT_PREVIEW_LENGTH = 50
+# Changes kept in memory for clients catching up; older gaps need a full reload.
+CHANGE_LOG_SIZE = 256
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_key):
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        neg_mtime, filename = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (float(neg_mtime), str(filename))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid gallery cursor.") from None
+
+
+def merge_changes(older, newer):
+    """One delta covering two consecutive changes_since() results."""
+    if (
+        older.get("resync")
+        or newer.get("resync")
+        or older["version"] != newer["from_version"]
+    ):
+        return {"version": newer["version"], "resync": True}
+    touched = set(newer["removed"]) | {image["filename"] for image in newer["added"]}
+    return {
+        "from_version": older["from_version"],
+        "version": newer["version"],
+        "added": newer["added"]
+        + [image for image in older["added"] if image["filename"] not in touched],
+        "removed": older["removed"]
+        + [filename for filename in newer["removed"] if filename not in older["removed"]],
+    }
+
+
+class GalleryIndex:
+    """Persistent index of the images in the outputs folder.
+
+    Entries are stored in SQLite next to the images so a restart only has to
+    stat the folder, and the listing itself is served from memory. Every
+    change bumps a persisted version, and recent changes are kept so clients
+    can catch up with a delta instead of reloading the whole gallery.
+    """
+
+    def __init__(self, outputs_dir=OUTPUTS_DIR):
+        self.outputs_dir = outputs_dir
+        self.db_path = os.path.join(outputs_dir, INDEX_FILENAME)
+        self._lock = threading.RLock()
+        self._conn = None
+        self._entries = {}
+        # Sort keys (-mtime, filename) kept in ascending order, i.e. newest first.
+        self._order = []
+        self._loaded = False
+        self.version = 0
+        # (version, filename, image info or None when removed)
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(self.outputs_dir, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    filename TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    has_metadata INTEGER NOT NULL,
+                    prompt_preview TEXT,
+                    model_name TEXT,
+                    timestamp_generation TEXT
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+            )
+        return self._conn
+
+    @staticmethod
+    def _entry_from_metadata(filename, mtime, size, metadata):
+        entry = {
+            "filename": filename,
+            "mtime": mtime,
+            "size": size,
+            "has_metadata": metadata is not None,
+            "prompt_preview": "",
+            "model_name": "",
+            "timestamp_generation": "",
+        }
+        if metadata:
+            prompt = metadata.get("prompt", "") or ""
+            entry.update(
+                {
+                    "prompt_preview": (
+                        prompt[:PROMPT_PREVIEW_LENGTH] + "..."
+                        if len(prompt) > PROMPT_PREVIEW_LENGTH
+                        else prompt
+                    ),
+                    "model_name": metadata.get("model_name", ""),
+                    "timestamp_generation": metadata.get("timestamp_generation", ""),
+                }
+            )
+        return entry
+
+    @staticmethod
+    def _sort_key(entry):
+        return (-entry["mtime"], entry["filename"])
+
+    def _upsert_row(self, entry):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry["filename"],
+                entry["mtime"],
+                entry["size"],
+                int(entry["has_metadata"]),
+                entry["prompt_preview"],
+                entry["model_name"],
+                entry["timestamp_generation"],
+            ),
+        )
+
+    def _bump_version(self):
+        # Caller commits, so the version moves together with the rows.
+        self.version += 1
+        self._connect().execute(
+            "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,)
+        )
+
+    def _insert_memory(self, entry):
+        existing = self._entries.get(entry["filename"])
+        if existing:
+            self._remove_memory(existing)
+        self._entries[entry["filename"]] = entry
+        bisect.insort(self._order, self._sort_key(entry))
+
+    def _remove_memory(self, entry):
+        key = self._sort_key(entry)
+        i = bisect.bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+        self._entries.pop(entry["filename"], None)
+
+    def reconcile(self):
+        """Sync the index with the outputs folder, decoding only new or changed files."""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT filename, mtime, size, has_metadata, prompt_preview, "
+                "model_name, timestamp_generation FROM images"
+            ).fetchall()
+            indexed = {
+                row[0]: {
+                    "filename": row[0],
+                    "mtime": row[1],
+                    "size": row[2],
+                    "has_metadata": bool(row[3]),
+                    "prompt_preview": row[4] or "",
+                    "model_name": row[5] or "",
+                    "timestamp_generation": row[6] or "",
+                }
+                for row in rows
+            }
+
+            on_disk = {}
+            with os.scandir(self.outputs_dir) as it:
+                for dir_entry in it:
+                    if not dir_entry.name.endswith(".png") or not dir_entry.is_file():
+                        continue
+                    stat = dir_entry.stat()
+                    # Zero-byte files are reserved names whose image was never written.
+                    if stat.st_size == 0:
+                        continue
+                    on_disk[dir_entry.name] = (stat.st_mtime, stat.st_size)
+
+            entries = {}
+            changed = []
+            for filename, (mtime, size) in on_disk.items():
+                entry = indexed.get(filename)
+                if entry and entry["mtime"] == mtime and entry["size"] == size:
+                    entries[filename] = entry
+                else:
+                    changed.append((filename, mtime, size))
+
+            metadata_by_path = metadata_handler.extract_metadata_batch(
+                os.path.join(self.outputs_dir, filename) for filename, _, _ in changed
+            )
+            for filename, mtime, size in changed:
+                metadata = metadata_by_path[os.path.join(self.outputs_dir, filename)]
+                entry = self._entry_from_metadata(filename, mtime, size, metadata)
+                entries[filename] = entry
+                self._upsert_row(entry)
+
+            stale = [name for name in indexed if name not in on_disk]
+            conn.executemany(
+                "DELETE FROM images WHERE filename = ?", [(n,) for n in stale]
+            )
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            self.version = max(self.version, row[0] if row else 0)
+            if changed or stale:
+                # Changes made behind our back are not in the log: clients reload.
+                self._bump_version()
+                self._changes.clear()
+            conn.commit()
+
+            self._entries = entries
+            self._order = sorted(self._sort_key(e) for e in entries.values())
+            self._loaded = True
+
+            if changed or stale:
+                logger.info(
+                    f"Gallery index updated: {len(changed)} indexed, {len(stale)} removed."
+                )
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reconcile()
+
+    def add(self, filename, metadata=None):
+        """Index a freshly written image. Pass its metadata to avoid re-reading the file."""
+        with self._lock:
+            self._ensure_loaded()
+            filepath = os.path.join(self.outputs_dir, filename)
+            stat = os.stat(filepath)
+            if metadata is None:
+                metadata = metadata_handler.extract_metadata_from_image(filepath)
+            entry = self._entry_from_metadata(
+                filename, stat.st_mtime, stat.st_size, metadata
+            )
+            self._upsert_row(entry)
+            self._bump_version()
+            self._connect().commit()
+            self._insert_memory(entry)
+            self._changes.append((self.version, filename, self.to_image_info(entry)))
+            return entry
+
+    def remove(self, filename):
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(filename)
+            if entry:
+                self._remove_memory(entry)
+            conn = self._connect()
+            conn.execute("DELETE FROM images WHERE filename = ?", (filename,))
+            self._bump_version()
+            conn.commit()
+            self._changes.append((self.version, filename, None))
+
+    def count(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._order)
+
+    def list_images(self, offset=0, limit=None):
+        with self._lock:
+            self._ensure_loaded()
+            end = None if limit is None else offset + limit
+            keys = self._order[offset:end]
+            return [self.to_image_info(self._entries[name]) for _, name in keys]
+
+    def page(self, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """One page of the listing, newest first, after an opaque cursor.
+
+        Cursors are sort keys rather than offsets, so images added while a
+        client is paging do not shift the pages it has yet to fetch.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        with self._lock:
+            self._ensure_loaded()
+            start = bisect.bisect_right(self._order, decode_cursor(cursor)) if cursor else 0
+            keys = self._order[start : start + limit]
+            return {
+                "images": [self.to_image_info(self._entries[name]) for _, name in keys],
+                "next_cursor": (
+                    encode_cursor(keys[-1]) if start + limit < len(self._order) else None
+                ),
+                "version": self.version,
+                "total": len(self._order),
+            }
+
+    def changes_since(self, version):
+        """Net changes after `version`, or None if they are no longer in the log."""
+        with self._lock:
+            self._ensure_loaded()
+            if version > self.version:
+                return None
+            if version < self.version and (
+                not self._changes or self._changes[0][0] > version + 1
+            ):
+                return None
+            added, removed = {}, []
+            for change_version, filename, image_info in self._changes:
+                if change_version <= version:
+                    continue
+                added.pop(filename, None)
+                if image_info is None:
+                    removed.append(filename)
+                else:
+                    added[filename] = image_info
+            return {
+                "from_version": version,
+                "version": self.version,
+                # Later additions are newer, and the listing is newest first.
+                "added": list(reversed(added.values())),
+                "removed": removed,
+            }
+
+    @staticmethod
+    def to_image_info(entry):
+        image_info = {
+            "filename": entry["filename"],
+            "has_metadata": entry["has_metadata"],
+        }
+        if entry["has_metadata"]:
+            image_info.update(
+                {
+                    "prompt_preview": entry["prompt_preview"],
+                    "model_name": entry["model_name"],
+                    "timestamp_generation": entry["timestamp_generation"],
+                }
+            )
+        return image_info
+
+
+gallery_index = GalleryIndex()
@@ -0,0 +1,258 @@
+# core/job_queue.py
+import time
+import logging
+import itertools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+logger = logging.getLogger("arttic_lab")
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_PER_CLIENT = 16
+# Initial duration guesses (seconds) used for ETAs until real jobs have been timed.
+DEFAULT_DURATIONS = {"generate_image": 20.0, "load_model": 30.0}
+DURATION_SMOOTHING = 0.3
+# Cancelling without a job id only drops these; model loads and cache changes still run.
+BULK_CANCEL_KINDS = ("generate_image",)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, client_id, kind, fn, kwargs):
+        self.id = next(self._ids)
+        self.client_id = client_id
+        self.kind = kind
+        self.fn = fn
+        self.kwargs = kwargs
+        self.future = Future()
+        self.cancel_event = threading.Event()
+        # Only cancellable jobs watch cancel_event; others run to completion once started.
+        self.cancellable = False
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+
+
+class JobQueue:
+    """Runs every device-bound job on a single worker thread.
+
+    Each client has its own FIFO and the worker serves clients round-robin, so
+    one tab submitting a burst of jobs cannot starve another. Model loads and
+    unloads go through the same worker, which serializes them against
+    in-flight generations.
+    """
+
+    def __init__(
+        self,
+        max_pending=DEFAULT_MAX_PENDING,
+        max_per_client=DEFAULT_MAX_PER_CLIENT,
+        on_change=None,
+    ):
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.on_change = on_change
+        self._clients = OrderedDict()
+        self._pending = 0
+        self._current = None
+        self._durations = dict(DEFAULT_DURATIONS)
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+        self.completed = 0
+
+    def start(self):
+        with self._cond:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stopping = False
+            self._worker = threading.Thread(
+                target=self._run, name="arttic-device-worker", daemon=True
+            )
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._worker:
+            self._worker.join(timeout)
+
+    def _notify_change(self):
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.error(f"Job queue change listener failed: {e}", exc_info=True)
+
+    def submit(self, client_id, kind, fn, cancellable=False, **kwargs):
+        """Queue fn(**kwargs). Cancellable jobs also receive the job's cancel_event."""
+        with self._cond:
+            if self._pending >= self.max_pending:
+                raise QueueFullError("The job queue is full. Please try again later.")
+            client_jobs = self._clients.setdefault(client_id, deque())
+            if len(client_jobs) >= self.max_per_client:
+                raise QueueFullError(
+                    f"You already have {len(client_jobs)} jobs queued. Wait for some to finish."
+                )
+            job = Job(client_id, kind, fn, kwargs)
+            job.cancellable = cancellable
+            if cancellable:
+                job.kwargs["cancel_event"] = job.cancel_event
+            client_jobs.append(job)
+            self._pending += 1
+            self._cond.notify()
+        self._notify_change()
+        return job
+
+    def drop_client(self, client_id):
+        """Cancel every queued (not yet started) job of a client."""
+        with self._cond:
+            jobs = self._clients.pop(client_id, deque())
+            self._pending -= len(jobs)
+        for job in jobs:
+            job.future.set_exception(JobCancelledError("Job cancelled."))
+        if jobs:
+            self._notify_change()
+        return len(jobs)
+
+    def cancel(self, client_id, job_id=None):
+        """Cancel one job of a client (or all its generations when job_id is None).
+
+        Queued jobs are removed immediately; a running job is only signalled
+        through its cancel_event and stops at its next checkpoint, so running
+        jobs that were not submitted as cancellable are left alone.
+        """
+        removed = []
+        signalled = []
+
+        def matches(job):
+            if job_id is None:
+                return job.kind in BULK_CANCEL_KINDS
+            return job.id == job_id
+
+        with self._cond:
+            client_jobs = self._clients.get(client_id, deque())
+            for job in list(client_jobs):
+                if matches(job):
+                    client_jobs.remove(job)
+                    removed.append(job)
+            self._pending -= len(removed)
+            if client_id in self._clients and not client_jobs:
+                del self._clients[client_id]
+
+            current = self._current
+            if (
+                current
+                and current.cancellable
+                and current.client_id == client_id
+                and matches(current)
+            ):
+                current.cancel_event.set()
+                signalled.append(current)
+
+        for job in removed:
+            job.future.set_exception(JobCancelledError("Job cancelled."))
+        if removed:
+            self._notify_change()
+        return [job.id for job in removed + signalled]
+
+    def _pop_next(self):
+        # Caller holds the lock. The served client moves to the back of the rotation.
+        for client_id in list(self._clients):
+            client_jobs = self._clients[client_id]
+            if client_jobs:
+                job = client_jobs.popleft()
+                self._pending -= 1
+                self._clients.move_to_end(client_id)
+                if not client_jobs:
+                    del self._clients[client_id]
+                return job
+            del self._clients[client_id]
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                job = self._pop_next()
+                job.started_at = time.monotonic()
+                self._current = job
+            self._notify_change()
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result(job.fn(**job.kwargs))
+                except BaseException as e:
+                    job.future.set_exception(e)
+
+            with self._cond:
+                if not job.cancel_event.is_set():
+                    elapsed = time.monotonic() - job.started_at
+                    previous = self._durations.get(job.kind, elapsed)
+                    self._durations[job.kind] = previous + DURATION_SMOOTHING * (
+                        elapsed - previous
+                    )
+                self._current = None
+                self.completed += 1
+            self._notify_change()
+
+    def _estimate(self, kind):
+        return self._durations.get(kind, 1.0)
+
+    def snapshot(self):
+        """Current job plus every pending job in the order the worker will run them."""
+        with self._cond:
+            now = time.monotonic()
+            eta = 0.0
+            running = None
+            if self._current:
+                job = self._current
+                eta = max(0.0, self._estimate(job.kind) - (now - job.started_at))
+                running = {"job_id": job.id, "client_id": job.client_id, "kind": job.kind}
+
+            order = []
+            rotation = [(client_id, list(jobs)) for client_id, jobs in self._clients.items()]
+            depth = 0
+            while True:
+                added = False
+                for client_id, jobs in rotation:
+                    if depth < len(jobs):
+                        order.append(jobs[depth])
+                        added = True
+                if not added:
+                    break
+                depth += 1
+
+            pending = []
+            for position, job in enumerate(order, start=1):
+                pending.append(
+                    {
+                        "job_id": job.id,
+                        "client_id": job.client_id,
+                        "kind": job.kind,
+                        "position": position,
+                        "eta_seconds": round(eta, 1),
+                    }
+                )
+                eta += self._estimate(job.kind)
+
+            return {"running": running, "pending": pending}
+
+    def pending_count(self):
+        with self._cond:
+            return self._pending
+
+
+job_queue = JobQueue()
@@ -0,0 +1,191 @@
+# core/latent_preview.py
+import io
+import time
+import struct
+import logging
+import torch
+from PIL import Image
+
+logger = logging.getLogger("arttic_lab")
+
+PREVIEW_FRAME_TYPE = 1
+# Binary frame header: frame type, step, total steps; the JPEG follows.
+PREVIEW_HEADER = struct.Struct(">BHH")
+
+# Linear latent -> RGB projections per model family (one row per latent channel),
+# fitted against VAE decodes. Good enough to show composition and colour.
+LATENT_RGB_FACTORS = {
+    "SD 1.5": [
+        [0.3512, 0.2297, 0.3227],
+        [0.3250, 0.4974, 0.2350],
+        [-0.2829, 0.1762, 0.2721],
+        [-0.2120, -0.2616, -0.7177],
+    ],
+    "SDXL": [
+        [0.3651, 0.4232, 0.4341],
+        [-0.2533, -0.0042, 0.1068],
+        [0.1076, 0.1111, -0.0362],
+        [-0.3165, -0.2492, -0.2188],
+    ],
+    "SD3": [
+        [-0.0645, 0.0177, 0.1052],
+        [0.0028, 0.0312, 0.0650],
+        [0.1848, 0.0762, 0.0360],
+        [0.0944, 0.0360, 0.0889],
+        [0.0897, 0.0506, -0.0364],
+        [-0.0020, 0.1203, 0.0284],
+        [0.0855, 0.0118, 0.0283],
+        [-0.0539, 0.0658, 0.1047],
+        [-0.0057, 0.0116, 0.0700],
+        [-0.0412, 0.0281, -0.0039],
+        [0.1106, 0.1171, 0.1220],
+        [-0.0248, 0.0682, -0.0481],
+        [0.0815, 0.0846, 0.1207],
+        [-0.0120, -0.0055, -0.0867],
+        [-0.0749, -0.0634, -0.0456],
+        [-0.1418, -0.1457, -0.1259],
+    ],
+    "FLUX": [
+        [-0.0346, 0.0244, 0.0681],
+        [0.0034, 0.0210, 0.0687],
+        [0.0275, -0.0668, -0.0433],
+        [-0.0174, 0.0160, 0.0617],
+        [0.0859, 0.0721, 0.0329],
+        [0.0004, 0.0383, 0.0115],
+        [0.0405, 0.0861, 0.0915],
+        [-0.0236, -0.0185, -0.0259],
+        [-0.0245, 0.0250, 0.1180],
+        [0.1008, 0.0755, -0.0421],
+        [-0.0515, 0.0201, 0.0011],
+        [0.0428, -0.0012, -0.0036],
+        [0.0817, 0.0765, 0.0749],
+        [-0.1264, -0.0522, -0.1103],
+        [-0.0280, -0.0881, -0.0499],
+        [-0.1262, -0.0982, -0.0778],
+    ],
+}
+LATENT_RGB_BIAS = {
+    "SDXL": [0.1084, -0.0175, -0.0011],
+    "SD3": [0.2394, 0.2135, 0.1925],
+    "FLUX": [-0.0329, -0.0718, -0.0851],
+}
+FAMILY_FOR_MODEL_TYPE = {
+    "SD 1.5": "SD 1.5",
+    "SD 2.x": "SD 1.5",
+    "SDXL": "SDXL",
+    "SD3": "SD3",
+    "FLUX Dev": "FLUX",
+    "FLUX Schnell": "FLUX",
+}
+
+
+def latents_to_image(latents, family, width, height, max_size):
+    """Project the first latent of a batch to a small RGB PIL image."""
+    latent = latents[0].detach()
+    if family == "FLUX":
+        # FLUX packs 2x2 patches of 16 channels into 64-wide tokens; average each patch.
+        rows, cols = int(height) // 16, int(width) // 16
+        latent = latent.reshape(rows, cols, 16, 4).mean(-1).permute(2, 0, 1)
+
+    factors = torch.tensor(LATENT_RGB_FACTORS[family], dtype=torch.float32, device=latent.device)
+    rgb = torch.einsum("chw,cr->hwr", latent.float(), factors)
+    bias = LATENT_RGB_BIAS.get(family)
+    if bias is not None:
+        rgb = rgb + torch.tensor(bias, dtype=torch.float32, device=latent.device)
+    rgb = ((rgb + 1) * 127.5).clamp(0, 255).to(torch.uint8).cpu().numpy()
+
+    image = Image.fromarray(rgb)
+    scale = max_size / max(image.size)
+    if scale < 1:
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.BILINEAR,
+        )
+    elif scale > 1:
+        # Latents are 1/8 of the image; nearest keeps the upscale nearly free.
+        image = image.resize(
+            (round(image.width * scale), round(image.height * scale)), Image.NEAREST
+        )
+    return image
+
+
+class PreviewSession:
+    """Per-generation preview state that keeps preview cost under a share of sampling time."""
+
+    def __init__(self, previewer, family, width, height):
+        self.previewer = previewer
+        self.family = family
+        self.width = width
+        self.height = height
+        self.started = time.perf_counter()
+        self.preview_seconds = 0.0
+        self.last_cost = 0.0
+        self.count = 0
+        self.skipped = 0
+
+    def maybe_preview(self, step, total_steps, latents):
+        """Return an encoded preview frame for this step, or None when throttled."""
+        if step % self.previewer.every_n_steps != 0:
+            return None
+        elapsed = time.perf_counter() - self.started
+        budget = self.previewer.max_overhead * (elapsed - self.preview_seconds)
+        if self.preview_seconds + self.last_cost > budget:
+            self.skipped += 1
+            return None
+
+        start = time.perf_counter()
+        image = latents_to_image(
+            latents, self.family, self.width, self.height, self.previewer.max_size
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.previewer.quality)
+        frame = (
+            PREVIEW_HEADER.pack(PREVIEW_FRAME_TYPE, step + 1, total_steps)
+            + buffer.getvalue()
+        )
+        self.last_cost = time.perf_counter() - start
+        self.preview_seconds += self.last_cost
+        self.count += 1
+        return frame
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "previews": self.count,
+            "skipped": self.skipped,
+            "preview_seconds": round(self.preview_seconds, 4),
+            "overhead": round(self.preview_seconds / elapsed, 4) if elapsed else 0.0,
+        }
+
+
+class LatentPreviewer:
+    """Settings for live previews; start() creates the state for one generation."""
+
+    def __init__(self, every_n_steps=1, max_overhead=0.05, max_size=256, quality=70):
+        self.every_n_steps = every_n_steps
+        self.max_overhead = max_overhead
+        self.max_size = max_size
+        self.quality = quality
+
+    def configure(self, every_n_steps=None, max_overhead=None, max_size=None, quality=None):
+        if every_n_steps is not None:
+            if every_n_steps < 1:
+                raise ValueError("Preview interval must be at least 1 step.")
+            self.every_n_steps = every_n_steps
+        if max_overhead is not None:
+            if not 0 < max_overhead <= 1:
+                raise ValueError("Preview overhead must be between 0 and 1.")
+            self.max_overhead = max_overhead
+        if max_size is not None:
+            self.max_size = max_size
+        if quality is not None:
+            self.quality = quality
+
+    def start(self, model_type, width, height):
+        family = FAMILY_FOR_MODEL_TYPE.get(model_type)
+        if family is None:
+            return None
+        return PreviewSession(self, family, width, height)
+
+
+latent_previewer = LatentPreviewer()
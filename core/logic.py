@@ -4,8 +4,7 @@ import time
 import random
 import logging
 import math
-import re
-import asyncio
+import gc
 import sys
 import subprocess
 from glob import glob
@@ -17,10 +16,27 @@ from diffusers import (
     DDIMScheduler,
     UniPCMultistepScheduler,
 )
-from pipelines import get_pipeline_for_model
+from pipelines import get_pipeline_for_model, inspect_model
+from pipelines.component_dedup import component_dedup
+from pipelines.converted_cache import converted_cache
+from pipelines.devices import get_backend
 from pipelines.sdxl_pipeline import SDXLPipeline
 from .prompt_book import prompt_book
 from .metadata_handler import metadata_handler
+from .gallery_index import gallery_index, DEFAULT_PAGE_SIZE
+from .output_counter import output_counter
+from .embedding_cache import embedding_cache
+from .lora_manager import lora_manager
+from .model_cache import (
+    model_cache,
+    available_host_bytes,
+    total_host_bytes,
+    HOST_RESERVE_BYTES,
+)
+from .model_preloader import model_preloader
+from .latent_preview import latent_previewer
+from .metrics import metrics
+from .tracing import DenoiseProfiler, trace_filename, write_trace
 from pipelines.sd2_pipeline import SD2Pipeline
 from pipelines.sd3_pipeline import SD3Pipeline
 from pipelines.flux_pipeline import ArtTicFLUXPipeline
@@ -30,15 +46,21 @@ class OOMError(Exception):
     pass
 
 
+class GenerationCancelledError(Exception):
+    pass
+
+
 app_state = {
     "current_pipe": None,
     "current_model_name": "",
     "current_lora_name": "",
+    "active_loras": [],
     "is_model_loaded": False,
     "status_message": "No model loaded.",
     "current_cpu_offload_state": False,
     "current_vae_tiling_state": True,
     "current_model_type": "",
+    "current_scheduler_name": "",
     "default_width": 512,
     "default_height": 512,
 }
@@ -60,15 +82,18 @@ def get_app_status():
     return {
         "is_model_loaded": app_state["is_model_loaded"],
         "status_message": app_state["status_message"],
+        "model_name": app_state["current_model_name"],
     }
 
 
 def get_config():
+    models = get_available_models()
     return {
-        "models": get_available_models(),
+        "models": models,
+        "model_info": get_model_info(models),
         "loras": get_available_loras(),
         "schedulers": list(SCHEDULER_MAP.keys()),
-        "gallery_images": [img for img in get_output_images()],
+        "gallery": get_gallery_page(),
         "prompts": prompt_book.get_all_prompts(),
     }
 
@@ -80,6 +105,17 @@ def get_available_models():
     )
 
 
+def get_model_info(models=None):
+    info = {}
+    for model_name in models if models is not None else get_available_models():
+        try:
+            info[model_name] = inspect_model(model_name)
+        except Exception as e:
+            logger.warning(f"Could not read the header of model '{model_name}': {e}")
+            info[model_name] = {"architecture": None, "error": str(e)}
+    return info
+
+
 def get_available_loras():
     os.makedirs("./loras", exist_ok=True)
     loras_path = os.path.join("./loras", "*.safetensors")
@@ -88,34 +124,25 @@ def get_available_loras():
     )
 
 
-def get_output_images():
-    outputs_path = os.path.join("./outputs", "*.png")
-    image_files = []
+def reconcile_gallery():
+    gallery_index.reconcile()
+    logger.info(f"Gallery index ready with {gallery_index.count()} images.")
 
-    for f in sorted(glob(outputs_path), key=os.path.getmtime, reverse=True):
-        filename = os.path.basename(f)
-        filepath = os.path.join("./outputs", filename)
 
-        metadata = metadata_handler.extract_metadata_from_image(filepath)
+def get_output_images(offset=0, limit=None):
+    return gallery_index.list_images(offset, limit)
 
-        image_info = {"filename": filename, "has_metadata": metadata is not None}
 
-        if metadata:
-            image_info.update(
-                {
-                    "prompt_preview": (
-                        metadata.get("prompt", "")[:50] + "..."
-                        if len(metadata.get("prompt", "")) > 50
-                        else metadata.get("prompt", "")
-                    ),
-                    "model_name": metadata.get("model_name", ""),
-                    "timestamp_generation": metadata.get("timestamp_generation", ""),
-                }
-            )
+def get_gallery_page(cursor=None, limit=DEFAULT_PAGE_SIZE):
+    return gallery_index.page(cursor, limit)
 
-        image_files.append(image_info)
 
-    return image_files
+def get_gallery_changes(since):
+    return gallery_index.changes_since(since)
+
+
+def get_gallery_version():
+    return gallery_index.version
 
 
 def get_model_files():
@@ -182,22 +209,6 @@ def delete_lora_file(filename):
         raise IOError(f"Could not delete file '{filename}'.")
 
 
-def _get_next_image_number():
-    files = get_output_images()
-    if not files:
-        return 1
-
-    highest_num = 0
-    pattern = re.compile(r"ArtTic-LAB_(\d+)\.png")
-    for f in files:
-        match = pattern.match(f["filename"])
-        if match:
-            num = int(match.group(1))
-            if num > highest_num:
-                highest_num = num
-    return highest_num + 1
-
-
 def delete_image(filename):
     if not filename:
         raise ValueError("Filename cannot be empty.")
@@ -217,6 +228,10 @@ def delete_image(filename):
 
     try:
         os.remove(file_path)
+        trace_path = os.path.join(outputs_dir, trace_filename(os.path.basename(file_path)))
+        if os.path.exists(trace_path):
+            os.remove(trace_path)
+        gallery_index.remove(os.path.basename(file_path))
         logger.info(f"Successfully deleted image: {filename}")
         return {"status": "success", "message": f"Deleted '{filename}'."}
     except Exception as e:
@@ -230,50 +245,87 @@ def unload_model():
         return {"status_message": "No model loaded."}
 
     logger.info(f"Unloading model '{app_state['current_model_name']}' from VRAM...")
+    embedding_cache.clear()
     pipe_to_delete = app_state["current_pipe"]
 
     if hasattr(pipe_to_delete, "pipe"):
         del pipe_to_delete.pipe
     del pipe_to_delete
 
+    _reset_app_state()
+    get_backend().empty_cache()
+
+    logger.info("Model unloaded and VRAM cache cleared.")
+    return {"status_message": app_state["status_message"]}
+
+
+def _reset_app_state():
     app_state.update(
         {
             "current_pipe": None,
             "current_model_name": "",
             "current_lora_name": "",
+            "active_loras": [],
             "is_model_loaded": False,
             "status_message": "No model loaded.",
             "current_cpu_offload_state": False,
             "current_vae_tiling_state": True,
             "current_model_type": "",
+            "current_scheduler_name": "",
             "default_width": 512,
             "default_height": 512,
         }
     )
 
-    torch.xpu.empty_cache()
 
-    logger.info("Model unloaded and VRAM cache cleared.")
-    return {"status_message": app_state["status_message"]}
+def _park_current_model():
+    """Hand the active pipeline to the model cache (or free it) before a switch."""
+    pipe = app_state["current_pipe"]
+    key = (app_state["current_model_name"], app_state["current_cpu_offload_state"])
+    info = {
+        "model_type": app_state["current_model_type"],
+        "default_res": app_state["default_width"],
+    }
+    embedding_cache.clear()
+    _reset_app_state()
+    if not model_cache.park(key, pipe, info):
+        del pipe.pipe
+    get_backend().empty_cache()
+
+
+def _make_room_on_device(needed_bytes):
+    # Pipelines parked on the device give way to the one being activated.
+    if not model_cache.device_bytes():
+        return
+    free_mem = _free_vram_gb()
+    if free_mem is not None and free_mem * 1024**3 < needed_bytes:
+        logger.info("Moving parked models to host RAM to free VRAM.")
+        model_cache.move_device_entries_to_host()
+
+
+VRAM_PER_MEGAPIXEL = {
+    "SD 1.5": 0.9,
+    "SD 2.x": 1.2,
+    "SDXL": 2.5,
+    "SD3": 3.0,
+    "FLUX Dev": 3.2,
+    "FLUX Schnell": 2.8,
+}
+MAX_BATCH_SIZE = 8
+# Images one generate request may ask for; the UI slider stops at 8.
+MAX_IMAGES_PER_REQUEST = 16
+
+
+def _free_vram_gb():
+    return get_backend().free_memory_gb()
 
 
 def _calculate_max_resolution(model_type):
-    if not torch.xpu.is_available():
+    free_mem = _free_vram_gb()
+    if free_mem is None:
         return 1024
 
-    GB = 1024**3
-    total_mem = torch.xpu.get_device_properties(0).total_memory / GB
-    reserved_mem = torch.xpu.memory_reserved(0) / GB
-    free_mem = total_mem - reserved_mem
-
-    vram_per_megapixel = {
-        "SD 1.5": 0.9,
-        "SD 2.x": 1.2,
-        "SDXL": 2.5,
-        "SD3": 3.0,
-        "FLUX Dev": 3.2,
-        "FLUX Schnell": 2.8,
-    }.get(model_type, 1.5)
+    vram_per_megapixel = VRAM_PER_MEGAPIXEL.get(model_type, 1.5)
 
     base_res_mp = {
         "SD 1.5": 0.26,
@@ -291,6 +343,73 @@ def _calculate_max_resolution(model_type):
         return 1024
 
 
+def _calculate_batch_size(model_type, width, height, num_images):
+    """How many images to denoise together, from the same VRAM heuristic."""
+    free_mem = _free_vram_gb()
+    if free_mem is None or app_state["current_cpu_offload_state"]:
+        return 1
+
+    megapixels = (int(width) * int(height)) / (1024 * 1024)
+    per_image = VRAM_PER_MEGAPIXEL.get(model_type, 1.5) * megapixels
+    fits = int(max(0, free_mem - 0.25) // per_image) if per_image > 0 else 1
+    return max(1, min(num_images, fits, MAX_BATCH_SIZE))
+
+
+def _apply_scheduler(pipe, scheduler_name):
+    # SD3 and FLUX use their own flow-matching schedulers.
+    if not scheduler_name or isinstance(pipe, (SD3Pipeline, ArtTicFLUXPipeline)):
+        return
+    if scheduler_name not in SCHEDULER_MAP:
+        raise ValueError(f"Unknown scheduler '{scheduler_name}'.")
+    if pipe.scheduler_name != scheduler_name:
+        logger.info(f"Setting scheduler to: {scheduler_name}")
+        pipe.set_scheduler(scheduler_name, SCHEDULER_MAP[scheduler_name])
+    app_state["current_scheduler_name"] = scheduler_name
+
+
+def _status_message():
+    status_suffix = "(CPU Offload)" if app_state["current_cpu_offload_state"] else ""
+    lora_suffix = "".join(f" + {name}" for name, _ in app_state["active_loras"])
+    return f"Ready: {app_state['current_model_name']} ({app_state['current_model_type']}){lora_suffix} {status_suffix}"
+
+
+def _apply_loras(pipe, loras, fuse=False):
+    """Switch the pipeline's active LoRA set; missing files are skipped with a warning."""
+    available = []
+    for name, weight in loras:
+        if not name or name == "None":
+            continue
+        if not os.path.exists(lora_manager.lora_path(name)):
+            logger.warning(f"LoRA file not found: {lora_manager.lora_path(name)}. Skipping.")
+            continue
+        available.append((name, float(weight)))
+
+    elapsed = lora_manager.apply(pipe, available, fuse=fuse)
+    app_state["active_loras"] = available
+    app_state["current_lora_name"] = available[0][0] if len(available) == 1 else ""
+    if app_state["is_model_loaded"]:
+        app_state["status_message"] = _status_message()
+    return elapsed
+
+
+def set_loras(loras, fuse=False):
+    """Apply a stack of LoRAs ([{"name", "weight"}, ...]) to the loaded model."""
+    if not app_state["is_model_loaded"]:
+        raise ConnectionAbortedError("Cannot apply LoRAs, no model is loaded.")
+    elapsed = _apply_loras(
+        app_state["current_pipe"],
+        [(lora.get("name"), lora.get("weight", 1.0)) for lora in loras or []],
+        fuse=bool(fuse),
+    )
+    return {
+        "status_message": app_state["status_message"],
+        "loras": [{"name": n, "weight": w} for n, w in app_state["active_loras"]],
+        "fused": app_state["current_pipe"].lora_fused,
+        "switch_seconds": round(elapsed, 3),
+    }
+
+
+@metrics.timed_job("load_model")
 def load_model(
     model_name,
     scheduler_name,
@@ -298,7 +417,6 @@ def load_model(
     cpu_offload,
     lora_name,
     progress_callback=None,
-    loop=None,
 ):
     if not model_name:
         raise ValueError("Please select a model from the dropdown.")
@@ -308,15 +426,19 @@ def load_model(
     if (
         app_state["is_model_loaded"]
         and app_state["current_model_name"] == model_name
-        and app_state["current_lora_name"] == lora_name
         and app_state["current_cpu_offload_state"] == cpu_offload
         and app_state["current_vae_tiling_state"] == vae_tiling
     ):
         logger.info(
             f"Model '{model_name}' with the same configuration is already loaded. Skipping."
         )
+        _apply_scheduler(app_state["current_pipe"], scheduler_name)
+        # LoRAs are adapters on the loaded pipe, so changing them never reloads the model.
+        if [name for name, _ in app_state["active_loras"]] != ([lora_name] if lora_name else []):
+            _apply_loras(app_state["current_pipe"], [(lora_name, 1.0)])
         max_res_vram = _calculate_max_resolution(app_state["current_model_type"])
         return {
+            "model_name": model_name,
             "status_message": app_state["status_message"],
             "model_type": app_state["current_model_type"],
             "width": app_state["default_width"],
@@ -326,39 +448,49 @@ def load_model(
         }
 
     def update_progress(progress, desc):
-        if progress_callback and loop:
-            asyncio.run_coroutine_threadsafe(progress_callback(progress, desc), loop)
+        if progress_callback:
+            progress_callback(progress, desc)
 
     try:
         if app_state["is_model_loaded"]:
-            unload_model()
-
-        logger.info(f"Loading model: {model_name}...")
-        update_progress(0, f"Getting pipeline for {model_name}...")
+            _park_current_model()
+        embedding_cache.clear()
+
+        cached = model_cache.take((model_name, cpu_offload))
+        preloaded = None if cached else model_preloader.take(model_name, cpu_offload)
+        if cached:
+            logger.info(
+                f"Restoring model '{model_name}' from the model cache ({cached['location']})..."
+            )
+            update_progress(0.2, f"Restoring {model_name} from cache...")
+            pipe = cached["pipe"]
+            if cached["location"] == "host":
+                _make_room_on_device(cached["bytes"])
+            # Also for device-parked pipelines: components they share may have moved.
+            pipe.move_to_device()
+        elif preloaded:
+            logger.info(f"Swapping in preloaded model '{model_name}'...")
+            update_progress(0.5, f"Moving preloaded {model_name} to the device...")
+            pipe = preloaded
+            _make_room_on_device(os.path.getsize(pipe.model_path))
+            pipe.place_on_device(use_cpu_offload=cpu_offload)
+        else:
+            logger.info(f"Loading model: {model_name}...")
+            update_progress(0, f"Getting pipeline for {model_name}...")
 
-        pipe = get_pipeline_for_model(model_name)
-        pipe.load_pipeline(update_progress)
-        pipe.place_on_device(use_cpu_offload=cpu_offload)
+            pipe = get_pipeline_for_model(model_name)
+            pipe.share_components = not cpu_offload
+            _make_room_on_device(os.path.getsize(pipe.model_path))
+            pipe.load_pipeline(update_progress)
+            pipe.place_on_device(use_cpu_offload=cpu_offload)
 
         if lora_name:
-            lora_path = os.path.join("./loras", f"{lora_name}.safetensors")
-            if os.path.exists(lora_path):
-                logger.info(f"Loading LoRA: {lora_name}")
-                update_progress(0.7, f"Loading LoRA: {lora_name}")
-                pipe.pipe.load_lora_weights(lora_path)
-                app_state["current_lora_name"] = lora_name
-            else:
-                logger.warning(f"LoRA file not found: {lora_path}. Skipping.")
-                app_state["current_lora_name"] = ""
-        else:
-            app_state["current_lora_name"] = ""
+            update_progress(0.7, f"Loading LoRA: {lora_name}")
+        _apply_loras(pipe, [(lora_name, 1.0)])
 
-        pipe.optimize_with_ipex(update_progress)
+        pipe.optimize_for_device(update_progress)
 
-        if not isinstance(pipe, (SD3Pipeline, ArtTicFLUXPipeline)):
-            logger.info(f"Setting scheduler to: {scheduler_name}")
-            SchedulerClass = SCHEDULER_MAP[scheduler_name]
-            pipe.pipe.scheduler = SchedulerClass.from_config(pipe.pipe.scheduler.config)
+        _apply_scheduler(pipe, scheduler_name)
 
         if not isinstance(pipe, ArtTicFLUXPipeline):
             if vae_tiling:
@@ -394,24 +526,16 @@ def load_model(
             default_res = 512
 
         status_suffix = "(CPU Offload)" if cpu_offload else ""
-        lora_suffix = (
-            f" + {app_state['current_lora_name']}"
-            if app_state["current_lora_name"]
-            else ""
-        )
-        status_message = (
-            f"Ready: {model_name} ({model_type}){lora_suffix} {status_suffix}"
-        )
-
         app_state.update(
             {
-                "status_message": status_message,
                 "is_model_loaded": True,
                 "current_model_type": model_type,
                 "default_width": default_res,
                 "default_height": default_res,
             }
         )
+        status_message = _status_message()
+        app_state["status_message"] = status_message
 
         logger.info(
             f"Model '{model_name}' is ready! Type: {model_type} {status_suffix}."
@@ -421,6 +545,7 @@ def load_model(
         max_res_vram = _calculate_max_resolution(model_type)
 
         return {
+            "model_name": model_name,
             "status_message": status_message,
             "model_type": model_type,
             "width": default_res,
@@ -438,6 +563,63 @@ def load_model(
         )
 
 
+GB = 1024**3
+# Approximate bf16 size of the base components SD3 and FLUX fetch from Hugging Face.
+BASE_COMPONENT_BYTES = {"SD3": 10 * GB, "FLUX Dev": 10 * GB, "FLUX Schnell": 10 * GB}
+
+
+def _estimate_host_bytes(model_name):
+    info = inspect_model(model_name)
+    return info["parameters"] * 2 + BASE_COMPONENT_BYTES.get(info["architecture"], 0)
+
+
+def preload_model(
+    model_name,
+    scheduler_name=None,
+    vae_tiling=True,
+    cpu_offload=False,
+    lora_name=None,
+    progress_callback=None,
+):
+    """Load a model into host RAM off the device worker, ready for load_model to swap in.
+
+    Runs on its own thread while queued jobs keep using the current model.
+    """
+    if not model_name:
+        raise ValueError("Please select a model from the dropdown.")
+
+    def update_progress(progress, desc):
+        if progress_callback:
+            progress_callback(progress, desc)
+
+    if app_state["is_model_loaded"] and app_state["current_model_name"] == model_name:
+        return {"model_name": model_name, "source": "active"}
+    if model_cache.contains((model_name, cpu_offload)):
+        return {"model_name": model_name, "source": "model_cache"}
+
+    needed = _estimate_host_bytes(model_name)
+    available = available_host_bytes()
+    if available is not None and available - needed < HOST_RESERVE_BYTES:
+        raise MemoryError(
+            f"Not enough free RAM to preload '{model_name}' "
+            f"(needs about {needed / GB:.1f} GB, {available / GB:.1f} GB available). "
+            "Load it normally instead."
+        )
+
+    def build(progress):
+        pipe = get_pipeline_for_model(model_name)
+        pipe.share_components = not cpu_offload
+        pipe.load_pipeline(progress)
+        return pipe
+
+    logger.info(f"Preloading model '{model_name}' in the background...")
+    update_progress(0, f"Preloading {model_name}...")
+    model_preloader.preload(model_name, build, update_progress, cpu_offload=cpu_offload)
+    update_progress(1, f"{model_name} preloaded.")
+    return {"model_name": model_name, "source": "preload"}
+
+
+@metrics.timed_job("generate")
 def generate_image(
     prompt,
     negative_prompt,
@@ -447,24 +629,96 @@ def generate_image(
     width,
     height,
     lora_weight,
+    num_images=1,
+    seeds=None,
+    scheduler_name=None,
+    loras=None,
+    preview=False,
+    trace=False,
+    profile=False,
     progress_callback=None,
-    loop=None,
+    preview_callback=None,
+    cancel_event=None,
 ):
+    """Render images with the loaded model and save them to ./outputs.
+
+    With trace=True a Chrome trace of the job's stages and sampling steps is
+    written next to the first image; profile=True also records torch.profiler
+    events for the sampling loop into it.
+    """
     if not app_state["is_model_loaded"]:
         raise ConnectionAbortedError("Cannot generate, no model is loaded.")
 
-    logger.info("Starting image generation...")
+    with metrics.span("prepare"):
+        _apply_scheduler(app_state["current_pipe"], scheduler_name)
+        if loras is not None:
+            _apply_loras(
+                app_state["current_pipe"],
+                [(lora.get("name"), lora.get("weight", 1.0)) for lora in loras],
+            )
+        elif len(app_state["active_loras"]) == 1 and lora_weight is not None:
+            # The single-LoRA weight slider maps onto that adapter's weight.
+            _apply_loras(
+                app_state["current_pipe"],
+                [(app_state["active_loras"][0][0], lora_weight)],
+                fuse=app_state["current_pipe"].lora_fused,
+            )
+    active_loras = list(app_state["active_loras"])
+
+    if seeds:
+        seeds = [int(s) for s in seeds]
+    else:
+        base_seed = int(seed if seed is not None else random.randint(0, 2**32 - 1))
+        seeds = [(base_seed + i) % 2**32 for i in range(max(1, int(num_images or 1)))]
+    num_images = len(seeds)
+    if num_images > MAX_IMAGES_PER_REQUEST:
+        raise ValueError(
+            f"At most {MAX_IMAGES_PER_REQUEST} images can be generated per request."
+        )
+
+    batch_size = _calculate_batch_size(
+        app_state["current_model_type"], width, height, num_images
+    )
+    logger.info(
+        f"Starting generation of {num_images} image(s) in batches of {batch_size}..."
+    )
     start_time = time.time()
-    seed = int(seed if seed is not None else random.randint(0, 2**32 - 1))
-    generator = torch.Generator("xpu").manual_seed(seed)
+    done = 0
+    batch_len = batch_size
+    preview_session = (
+        latent_previewer.start(app_state["current_model_type"], width, height)
+        if preview and preview_callback
+        else None
+    )
+
+    # Each step callback closes a step; what runs after the last one is the VAE decode.
+    step_clock = [0.0]
 
     def pipeline_progress_callback(pipe, step, timestep, callback_kwargs):
-        progress = step / int(steps)
-        if progress_callback and loop:
-            asyncio.run_coroutine_threadsafe(
-                progress_callback(progress, f"Sampling... {step + 1}/{int(steps)}"),
-                loop,
-            )
+        now = time.perf_counter()
+        metrics.observe(
+            "denoise_step",
+            now - step_clock[0],
+            start=step_clock[0],
+            step=step + 1,
+            timestep=float(timestep),
+        )
+        step_clock[0] = now
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelledError("Generation cancelled.")
+        progress = (done + batch_len * step / int(steps)) / num_images
+        if progress_callback:
+            desc = f"Sampling... {step + 1}/{int(steps)}"
+            if num_images > 1:
+                desc += f" (images {done + 1}-{done + batch_len} of {num_images})"
+            progress_callback(progress, desc)
+        if preview_session and "latents" in callback_kwargs:
+            with metrics.span("latent_preview"):
+                frame = preview_session.maybe_preview(
+                    step, int(steps), callback_kwargs["latents"]
+                )
+            if frame:
+                preview_callback(frame)
         return callback_kwargs
 
     gen_kwargs = {
@@ -473,59 +727,177 @@ def generate_image(
         "guidance_scale": float(guidance),
         "width": int(width),
         "height": int(height),
-        "generator": generator,
         "callback_on_step_end": pipeline_progress_callback,
     }
 
-    if app_state["current_lora_name"] and float(lora_weight) > 0:
-        gen_kwargs["cross_attention_kwargs"] = {"scale": float(lora_weight)}
-        logger.info(
-            f"Applying LoRA '{app_state['current_lora_name']}' with weight {lora_weight}"
-        )
-
     if negative_prompt and negative_prompt.strip():
         gen_kwargs["negative_prompt"] = negative_prompt
 
+    pipe = app_state["current_pipe"]
+    do_cfg = float(guidance) > 1 and not isinstance(pipe, ArtTicFLUXPipeline)
+    embed_key = (
+        app_state["current_model_name"],
+        id(pipe),
+        pipe.lora_state,
+        prompt,
+        gen_kwargs.get("negative_prompt"),
+        do_cfg,
+    )
+
+    images = []
+    cancelled = False
+    profiler = DenoiseProfiler() if trace and profile else None
     try:
-        image = app_state["current_pipe"].generate(**gen_kwargs).images[0]
-    except torch.OutOfMemoryError as e:
-        torch.xpu.empty_cache()
-        logger.error(f"XPU Out of Memory during generation: {e}")
-        raise OOMError(
-            "Your GPU ran out of memory while generating the image. Try reducing the resolution or steps."
-        )
+        with metrics.span("prompt_embeds"):
+            embeds = embedding_cache.get_or_encode(
+                embed_key,
+                lambda: pipe.encode_prompt_embeds(
+                    prompt, gen_kwargs.get("negative_prompt"), do_cfg
+                ),
+            )
+        gen_kwargs.pop("prompt")
+        if "negative_prompt_embeds" in embeds:
+            gen_kwargs.pop("negative_prompt", None)
+        gen_kwargs.update(embeds)
+
+        if profiler:
+            profiler.start()
+        while done < num_images:
+            batch_seeds = seeds[done : done + batch_size]
+            batch_len = len(batch_seeds)
+            # One generator per image so each result matches a single run with its seed.
+            generators = [pipe.backend.generator(s) for s in batch_seeds]
+            try:
+                with metrics.span("pipeline_call", images=batch_len):
+                    step_clock[0] = time.perf_counter()
+                    batch_images = pipe.generate(
+                        **gen_kwargs,
+                        num_images_per_prompt=batch_len,
+                        generator=generators,
+                    ).images
+                    metrics.observe(
+                        "vae_decode",
+                        time.perf_counter() - step_clock[0],
+                        start=step_clock[0],
+                        tiling=bool(app_state["current_vae_tiling_state"]),
+                    )
+            except torch.OutOfMemoryError as e:
+                pipe.backend.empty_cache()
+                if batch_size == 1:
+                    logger.error(f"Out of memory during generation: {e}")
+                    raise OOMError(
+                        "The device ran out of memory while generating the image. Try reducing the resolution or steps."
+                    )
+                batch_size = max(1, batch_size // 2)
+                logger.warning(
+                    f"Out of memory with a batch of {batch_len}, retrying in batches of {batch_size}."
+                )
+                continue
+            images.extend(batch_images)
+            done += batch_len
+    except GenerationCancelledError:
+        cancelled = True
+    finally:
+        if profiler:
+            profiler.stop()
+
+    if cancelled:
+        job = metrics.current_job()
+        if job is not None:
+            job.outcome = "cancelled"
+        # The traceback held the pipeline frames and their latents; now they can go.
+        images.clear()
+        gc.collect()
+        pipe.backend.empty_cache()
+        logger.info(f"Generation cancelled after {time.time() - start_time:.2f} seconds.")
+        raise GenerationCancelledError("Generation cancelled.")
 
     generation_time = time.time() - start_time
     logger.info(f"Generation completed in {generation_time:.2f} seconds.")
+    if preview_session:
+        stats = preview_session.stats()
+        logger.info(
+            f"Sent {stats['previews']} previews ({stats['skipped']} throttled), {stats['overhead']:.1%} of generation time."
+        )
 
-    os.makedirs("./outputs", exist_ok=True)
-    filename = f"ArtTic-LAB_{_get_next_image_number()}.png"
-    filepath = os.path.join("./outputs", filename)
-    image.save(filepath)
-
-    lora_info = None
-    if app_state["current_lora_name"]:
-        lora_info = {"name": app_state["current_lora_name"], "weight": lora_weight}
-
-    metadata = metadata_handler.create_metadata(
-        prompt=prompt,
-        negative_prompt=negative_prompt,
-        model_name=app_state["current_model_name"],
-        seed=seed,
-        width=width,
-        height=height,
-        steps=steps,
-        cfg_scale=guidance,
-        lora_info=lora_info,
-    )
+    lora_info = [{"name": name, "weight": weight} for name, weight in active_loras]
+    if len(lora_info) <= 1:
+        lora_info = lora_info[0] if lora_info else None
+
+    filenames = []
+    for image, image_seed in zip(images, seeds):
+        metadata = metadata_handler.create_metadata(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            model_name=app_state["current_model_name"],
+            seed=image_seed,
+            width=width,
+            height=height,
+            steps=steps,
+            cfg_scale=guidance,
+            lora_info=lora_info,
+            scheduler=app_state["current_scheduler_name"] or None,
+        )
 
-    metadata_handler.embed_metadata_to_image(filepath, metadata)
+        filename, filepath = output_counter.reserve()
+        try:
+            with metrics.stage("image_encode"):
+                metadata_handler.save_image_with_metadata(image, filepath, metadata)
+        except Exception:
+            os.remove(filepath)
+            raise
+        with metrics.stage("metadata_write"):
+            gallery_index.add(filename, metadata)
+        filenames.append(filename)
+
+    if num_images == 1:
+        info_text = f"Generated in {generation_time:.2f}s on '{app_state['current_model_name']}' with seed {seeds[0]}."
+    else:
+        info_text = f"Generated {num_images} images in {generation_time:.2f}s on '{app_state['current_model_name']}' with seeds {', '.join(map(str, seeds))}."
+    if active_loras:
+        info_text += f" LoRA: {', '.join(f'{n} @ {w}' for n, w in active_loras)}."
+
+    result = {
+        "image_filename": filenames[0],
+        "images": filenames,
+        "seeds": seeds,
+        "info": info_text,
+    }
+    job = metrics.current_job()
+    if trace and job is not None:
+        trace_name = trace_filename(filenames[0])
+        try:
+            write_trace(
+                os.path.join(gallery_index.outputs_dir, trace_name),
+                job,
+                metadata={
+                    "model_name": app_state["current_model_name"],
+                    "model_type": app_state["current_model_type"],
+                    "backend": pipe.backend.describe(),
+                    "scheduler": app_state["current_scheduler_name"],
+                    "steps": int(steps),
+                    "width": int(width),
+                    "height": int(height),
+                    "images": filenames,
+                    "batch_size": batch_size,
+                    "vae_tiling": app_state["current_vae_tiling_state"],
+                    "cpu_offload": app_state["current_cpu_offload_state"],
+                },
+                profiler=profiler,
+            )
+            result["trace"] = trace_name
+        except Exception as e:
+            logger.warning(f"Could not write the trace for {filenames[0]}: {e}")
+    return result
 
-    info_text = f"Generated in {generation_time:.2f}s on '{app_state['current_model_name']}' with seed {seed}."
-    if app_state["current_lora_name"]:
-        info_text += f" LoRA: {app_state['current_lora_name']} @ {lora_weight}."
 
-    return {"image_filename": filename, "info": info_text}
+def get_trace_path(filename):
+    """Path of the trace recorded with an image, or None if it has none."""
+    outputs_dir = os.path.abspath(gallery_index.outputs_dir)
+    trace_path = os.path.abspath(os.path.join(outputs_dir, trace_filename(filename)))
+    if os.path.commonpath([trace_path, outputs_dir]) != outputs_dir:
+        raise PermissionError("Cannot read files outside of the outputs directory.")
+    return trace_path if os.path.isfile(trace_path) else None
 
 
 def get_prompts():
@@ -559,6 +931,85 @@ def get_image_metadata(filename: str):
         return {"success": False, "error": "No metadata found"}
 
 
+def get_cache_stats():
+    return {
+        "prompt_embeddings": embedding_cache.stats(),
+        "loras": lora_manager.stats(),
+        "models": model_cache.stats(),
+        "shared_components": component_dedup.report(),
+    }
+
+
+def get_model_cache_stats():
+    return model_cache.stats()
+
+
+def runtime_metrics():
+    """Memory and cache gauges for the /metrics endpoint."""
+    memory = get_backend().memory()
+    if memory:
+        yield (
+            "arttic_device_memory_bytes",
+            "gauge",
+            "Device memory of the active backend.",
+            [({"kind": kind}, value) for kind, value in memory.items()],
+        )
+    host = {"total": total_host_bytes(), "available": available_host_bytes()}
+    yield (
+        "arttic_host_memory_bytes",
+        "gauge",
+        "Host RAM of this machine.",
+        [({"kind": kind}, value) for kind, value in host.items() if value is not None],
+    )
+    models = model_cache.stats()
+    yield (
+        "arttic_model_cache_bytes",
+        "gauge",
+        "Bytes held by parked pipelines by location.",
+        [
+            ({"location": "host"}, models["host_bytes"]),
+            ({"location": "device"}, models["device_bytes"]),
+        ],
+    )
+
+    caches = {
+        "models": models,
+        "prompt_embeddings": embedding_cache.stats(),
+        "loras": lora_manager.stats(),
+        "converted": converted_cache.stats(),
+    }
+    yield (
+        "arttic_cache_hits_total",
+        "counter",
+        "Cache lookups that were hits.",
+        [({"cache": name}, stats["hits"]) for name, stats in caches.items()],
+    )
+    yield (
+        "arttic_cache_misses_total",
+        "counter",
+        "Cache lookups that were misses.",
+        [({"cache": name}, stats["misses"]) for name, stats in caches.items()],
+    )
+    yield (
+        "arttic_cache_hit_ratio",
+        "gauge",
+        "Hits over lookups since start.",
+        [
+            ({"cache": name}, stats["hits"] / (stats["hits"] + stats["misses"]))
+            for name, stats in caches.items()
+            if stats["hits"] + stats["misses"]
+        ],
+    )
+
+
+metrics.add_collector(runtime_metrics)
+
+
+def get_job_timings():
+    """Per-stage timings of the most recent jobs, newest first."""
+    return list(reversed(metrics.recent_jobs))
+
+
 def restart_backend():
     logger.info("Restart command received. Exiting with restart code...")
     sys.exit(RESTART_EXIT_CODE)
@@ -566,9 +1017,11 @@ def restart_backend():
 
 def clear_cache():
     try:
-        if hasattr(torch, "xpu") and torch.xpu.is_available():
-            torch.xpu.empty_cache()
-            torch.xpu.synchronize()
+        model_cache.clear()
+        model_preloader.discard()
+        backend = get_backend()
+        backend.empty_cache()
+        backend.synchronize()
         logger.info("VRAM cache cleared.")
         return {"status": "success", "message": "VRAM cache cleared"}
     except Exception as e:
@@ -0,0 +1,165 @@
+# core/lora_manager.py
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from safetensors.torch import load_file
+from pipelines.component_dedup import component_dedup
+
+logger = logging.getLogger("arttic_lab")
+
+LORAS_DIR = "./loras"
+DEFAULT_HOST_CACHE_BYTES = 2 * 1024**3
+MAX_LOADED_ADAPTERS = 4
+
+
+def adapter_name_for(lora_name):
+    # PEFT adapter names end up as module keys, which cannot contain dots.
+    return "lora_" + re.sub(r"\W", "_", lora_name)
+
+
+class LoraManager:
+    """Applies LoRAs to a loaded pipeline as named PEFT adapters.
+
+    Switching or re-weighting LoRAs only changes which adapters are active;
+    the base checkpoint is never reloaded. Recently used LoRA state dicts are
+    kept in host RAM so re-adding an evicted adapter skips the disk read.
+    """
+
+    def __init__(
+        self,
+        loras_dir=LORAS_DIR,
+        max_host_bytes=DEFAULT_HOST_CACHE_BYTES,
+        max_loaded_adapters=MAX_LOADED_ADAPTERS,
+    ):
+        self.loras_dir = loras_dir
+        self.max_host_bytes = max_host_bytes
+        self.max_loaded_adapters = max_loaded_adapters
+        self._host_cache = OrderedDict()
+        self._host_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lora_path(self, lora_name):
+        return os.path.join(self.loras_dir, f"{lora_name}.safetensors")
+
+    def _state_dict(self, lora_name):
+        path = self.lora_path(lora_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"LoRA file not found: {path}")
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            cached = self._host_cache.get(path)
+            if cached and cached[0] == mtime:
+                self._host_cache.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        state_dict = load_file(path, device="cpu")
+        nbytes = sum(t.numel() * t.element_size() for t in state_dict.values())
+
+        with self._lock:
+            previous = self._host_cache.pop(path, None)
+            if previous:
+                self._host_bytes -= previous[2]
+            self._host_cache[path] = (mtime, state_dict, nbytes)
+            self._host_bytes += nbytes
+            while self._host_bytes > self.max_host_bytes and len(self._host_cache) > 1:
+                _, (_, _, evicted_bytes) = self._host_cache.popitem(last=False)
+                self._host_bytes -= evicted_bytes
+        return state_dict
+
+    @staticmethod
+    def _base_adapters(pipe):
+        # Adapters the pipeline loaded itself (e.g. SD3 weight injection) stay active.
+        if pipe.base_lora_adapters is None:
+            try:
+                listed = pipe.pipe.get_list_adapters()
+            except Exception:
+                listed = {}
+            pipe.base_lora_adapters = sorted(
+                {name for names in listed.values() for name in names}
+            )
+        return pipe.base_lora_adapters
+
+    def apply(self, pipe, loras, fuse=False):
+        """Make exactly `loras` ([(name, weight), ...]) active on the pipeline.
+
+        Returns the seconds the switch took (0 when nothing changed).
+        """
+        wanted = [(name, float(weight)) for name, weight in loras if name]
+        state = (tuple(wanted), bool(fuse and wanted))
+        if pipe.lora_state == state or (pipe.lora_state is None and not wanted):
+            return 0.0
+
+        start = time.perf_counter()
+        diffusers_pipe = pipe.pipe
+        base = self._base_adapters(pipe)
+
+        if pipe.lora_fused:
+            diffusers_pipe.unfuse_lora()
+            pipe.lora_fused = False
+
+        active = [adapter_name_for(name) for name, _ in wanted]
+        for (name, _), adapter in zip(wanted, active):
+            if adapter in pipe.lora_adapters:
+                pipe.lora_adapters.move_to_end(adapter)
+                continue
+            logger.info(f"Loading LoRA adapter: {name}")
+            component_dedup.make_private(pipe)
+            # load_lora_weights may pop keys, so hand it a shallow copy.
+            diffusers_pipe.load_lora_weights(
+                dict(self._state_dict(name)), adapter_name=adapter
+            )
+            pipe.lora_adapters[adapter] = name
+
+        for adapter in list(pipe.lora_adapters):
+            if len(pipe.lora_adapters) <= self.max_loaded_adapters:
+                break
+            if adapter not in active:
+                diffusers_pipe.delete_adapters(adapter)
+                del pipe.lora_adapters[adapter]
+
+        if active or base:
+            if pipe.lora_disabled:
+                diffusers_pipe.enable_lora()
+                pipe.lora_disabled = False
+            diffusers_pipe.set_adapters(
+                base + active,
+                adapter_weights=[1.0] * len(base) + [w for _, w in wanted],
+            )
+        elif pipe.lora_adapters and not pipe.lora_disabled:
+            diffusers_pipe.disable_lora()
+            pipe.lora_disabled = True
+
+        if fuse and active:
+            diffusers_pipe.fuse_lora(adapter_names=active, lora_scale=1.0)
+            pipe.lora_fused = True
+
+        pipe.lora_state = state
+        elapsed = time.perf_counter() - start
+        description = ", ".join(f"{n} @ {w}" for n, w in wanted) or "none"
+        logger.info(
+            f"LoRA set switched to [{description}]{' (fused)' if pipe.lora_fused else ''} in {elapsed:.2f}s."
+        )
+        return elapsed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached_loras": len(self._host_cache),
+                "bytes": self._host_bytes,
+                "max_bytes": self.max_host_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+lora_manager = LoraManager()
@@ -1,16 +1,79 @@
 # core/metadata_handler.py
 import json
+import zlib
+import struct
 import hashlib
 import base64
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 import os
 
+# Pillow's default zlib level; 1 is the "fast" lossless mode, 0 stores uncompressed.
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+FAST_PNG_COMPRESS_LEVEL = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+METADATA_KEYWORD = "parameters"
+
+
+def read_png_text(image_path, keyword=METADATA_KEYWORD):
+    """Return the text of a tEXt/zTXt/iTXt chunk by walking chunk headers only.
+
+    Stops at the first IDAT, so pixel data is never read. Returns None if the
+    file is not a PNG or the keyword does not appear before the image data.
+    """
+    wanted = keyword.encode("latin-1")
+    with open(image_path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type in (b"IDAT", b"IEND"):
+                return None
+            if chunk_type not in (b"tEXt", b"zTXt", b"iTXt"):
+                f.seek(length + 4, os.SEEK_CUR)
+                continue
+
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)  # CRC
+            name, sep, rest = data.partition(b"\0")
+            if not sep or name != wanted:
+                continue
+
+            if chunk_type == b"tEXt":
+                return rest.decode("latin-1")
+            if chunk_type == b"zTXt":
+                return zlib.decompress(rest[1:]).decode("latin-1")
+
+            # iTXt: compression flag, method, language tag, translated keyword, text
+            compressed = rest[:1] == b"\1"
+            _, _, rest = rest[2:].partition(b"\0")
+            _, _, text = rest.partition(b"\0")
+            if compressed:
+                text = zlib.decompress(text)
+            return text.decode("utf-8")
+
 
 class MetadataHandler:
     def __init__(self):
-        pass
+        self.png_compress_level = DEFAULT_PNG_COMPRESS_LEVEL
+
+    def set_png_compress_level(self, level):
+        """Set the zlib level (0-9) used when writing generated images"""
+        level = int(level)
+        if not 0 <= level <= 9:
+            raise ValueError("PNG compression level must be between 0 and 9.")
+        self.png_compress_level = level
+
+    def _build_pnginfo(self, metadata):
+        pnginfo = PngInfo()
+        pnginfo.add_text("parameters", json.dumps(metadata))
+        return pnginfo
 
     def create_metadata(
         self,
@@ -23,6 +86,7 @@ class MetadataHandler:
         steps,
         cfg_scale,
         lora_info=None,
+        scheduler=None,
     ):
         """Create metadata for an image"""
         metadata = {
@@ -43,6 +107,9 @@ class MetadataHandler:
         if lora_info:
             metadata["lora_info"] = lora_info
 
+        if scheduler:
+            metadata["scheduler"] = scheduler
+
         # Create a hash of the metadata to ensure integrity
         metadata_str = json.dumps(metadata, sort_keys=True)
         metadata["hash"] = hashlib.sha256(metadata_str.encode()).hexdigest()
@@ -55,53 +122,68 @@ class MetadataHandler:
             # Open the image
             image = Image.open(image_path)
 
-            # Create PngInfo object to store metadata
-            pnginfo = PngInfo()
-
-            # Add our metadata as a JSON string
-            metadata_json = json.dumps(metadata)
-            pnginfo.add_text("parameters", metadata_json)
-
             # Save image with metadata
-            image.save(image_path, pnginfo=pnginfo, format="PNG")
+            image.save(
+                image_path,
+                pnginfo=self._build_pnginfo(metadata),
+                format="PNG",
+                compress_level=self.png_compress_level,
+            )
 
             return True
         except Exception as e:
             print(f"Error embedding metadata: {e}")
             return False
 
+    def save_image_with_metadata(self, image, image_path, metadata, compress_level=None):
+        """Write a new image and its metadata in a single PNG encode"""
+        if compress_level is None:
+            compress_level = self.png_compress_level
+        image.save(
+            image_path,
+            pnginfo=self._build_pnginfo(metadata),
+            format="PNG",
+            compress_level=compress_level,
+        )
+
     def extract_metadata_from_image(self, image_path):
         """Extract metadata from an image file"""
         try:
-            image = Image.open(image_path)
-
-            # Check for our metadata in the image
-            if hasattr(image, "text") and "parameters" in image.text:
-                metadata_json = image.text["parameters"]
-                metadata = json.loads(metadata_json)
-
-                # Verify the hash to ensure metadata integrity
-                original_hash = metadata.get("hash")
-                if original_hash:
-                    # Create a copy without the hash for verification
-                    metadata_copy = metadata.copy()
-                    del metadata_copy["hash"]
-                    metadata_str = json.dumps(metadata_copy, sort_keys=True)
-                    calculated_hash = hashlib.sha256(metadata_str.encode()).hexdigest()
-
-                    if original_hash != calculated_hash:
-                        print(
-                            "Warning: Metadata hash mismatch - metadata may have been tampered with"
-                        )
-                        return None
-
-                return metadata
-            else:
+            metadata_json = read_png_text(image_path, METADATA_KEYWORD)
+            if metadata_json is None:
                 return None
+
+            metadata = json.loads(metadata_json)
+
+            # Verify the hash to ensure metadata integrity
+            original_hash = metadata.get("hash")
+            if original_hash:
+                # Create a copy without the hash for verification
+                metadata_copy = metadata.copy()
+                del metadata_copy["hash"]
+                metadata_str = json.dumps(metadata_copy, sort_keys=True)
+                calculated_hash = hashlib.sha256(metadata_str.encode()).hexdigest()
+
+                if original_hash != calculated_hash:
+                    print(
+                        "Warning: Metadata hash mismatch - metadata may have been tampered with"
+                    )
+                    return None
+
+            return metadata
         except Exception as e:
             print(f"Error extracting metadata: {e}")
             return None
 
+    def extract_metadata_batch(self, image_paths, max_workers=8):
+        """Extract metadata for many files in parallel, returns {path: metadata}"""
+        image_paths = list(image_paths)
+        if len(image_paths) <= 1:
+            return {p: self.extract_metadata_from_image(p) for p in image_paths}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self.extract_metadata_from_image, image_paths)
+            return dict(zip(image_paths, results))
+
     def update_modification_timestamp(self, image_path):
         """Update the modification timestamp in the metadata"""
         try:
@@ -0,0 +1,258 @@
+# core/metrics.py
+import time
+import bisect
+import functools
+import logging
+import threading
+import contextlib
+from collections import deque
+
+logger = logging.getLogger("arttic_lab")
+
+# Upper bounds in seconds, from a cached text encode up to a cold FLUX load.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+RECENT_JOBS = 50
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class JobTimings:
+    """Stage durations of one job, in the order the stages finished.
+
+    Entries are (name, start, seconds, args, thread id) with perf_counter()
+    starts. `spans` holds trace-only spans that feed no histogram.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.seconds = None
+        self.outcome = None
+        self.stages = []
+        self.spans = []
+
+    def totals(self):
+        totals = {}
+        for stage, _, seconds, _, _ in self.stages:
+            entry = totals.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+        return {
+            stage: {"seconds": round(e["seconds"], 4), "count": e["count"]}
+            for stage, e in totals.items()
+        }
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "seconds": None if self.seconds is None else round(self.seconds, 4),
+            "outcome": self.outcome,
+            "stages": self.totals(),
+        }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Stage and job timings aggregated into histograms, rendered for Prometheus.
+
+    Code on the generation path wraps its stages in stage(); while a job()
+    block is open on the same thread, those stages are also collected into
+    that job's record. Gauges that live elsewhere (queue depth, memory, cache
+    counters) are read at scrape time from registered collectors.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages = {}
+        self._jobs = {}
+        self._outcomes = {}
+        self._collectors = []
+        self.recent_jobs = deque(maxlen=RECENT_JOBS)
+
+    def observe(self, stage, seconds, start=None, **args):
+        """Record a finished stage; args only show up in traces."""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram()
+            histogram.observe(seconds)
+        job = getattr(self._local, "job", None)
+        if job is not None:
+            if start is None:
+                start = time.perf_counter() - seconds
+            job.stages.append((stage, start, seconds, args, threading.get_native_id()))
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, start=start, **args)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """A trace-only span around work that is not a stage of its own."""
+        job = getattr(self._local, "job", None)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if job is not None:
+                job.spans.append(
+                    (name, start, time.perf_counter() - start, args, threading.get_native_id())
+                )
+
+    @contextlib.contextmanager
+    def job(self, kind):
+        """Record the stages run on this thread until the block exits as one job."""
+        outer = getattr(self._local, "job", None)
+        if outer is not None:
+            # A job started from inside another (batch loading a model) joins it.
+            yield outer
+            return
+        timings = JobTimings(kind)
+        self._local.job = timings
+        start = time.perf_counter()
+        # The body may set a more specific outcome (e.g. "cancelled") before raising.
+        timings.outcome = "error"
+        try:
+            yield timings
+            timings.outcome = "ok"
+        finally:
+            self._local.job = None
+            timings.seconds = time.perf_counter() - start
+            with self._lock:
+                histogram = self._jobs.get(kind)
+                if histogram is None:
+                    histogram = self._jobs[kind] = Histogram()
+                histogram.observe(timings.seconds)
+                key = (kind, timings.outcome)
+                self._outcomes[key] = self._outcomes.get(key, 0) + 1
+                self.recent_jobs.append(timings.to_dict())
+            summary = ", ".join(
+                f"{stage}={entry['seconds']:.3f}s"
+                + (f" x{entry['count']}" if entry["count"] > 1 else "")
+                for stage, entry in timings.totals().items()
+            )
+            logger.info(f"{kind} job took {timings.seconds:.2f}s ({summary or 'no stages'}).")
+
+    def current_job(self):
+        """The JobTimings being recorded on this thread, if any."""
+        return getattr(self._local, "job", None)
+
+    def timed_job(self, kind):
+        """Decorator form of job()."""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.job(kind):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def add_collector(self, collector):
+        """Register a callable returning (name, type, help, [(labels, value), ...]) tuples."""
+        self._collectors.append(collector)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        def histogram_samples(name, label, histograms):
+            for key, histogram in sorted(histograms.items()):
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    yield f"{name}_bucket", {label: key, "le": le}, count
+                yield f"{name}_sum", {label: key}, histogram.sum
+                yield f"{name}_count", {label: key}, histogram.count
+
+        with self._lock:
+            family(
+                "arttic_stage_seconds",
+                "histogram",
+                "Time spent in each generation and model loading stage.",
+                list(histogram_samples("arttic_stage_seconds", "stage", self._stages)),
+            )
+            family(
+                "arttic_job_seconds",
+                "histogram",
+                "Wall time of whole jobs by kind.",
+                list(histogram_samples("arttic_job_seconds", "kind", self._jobs)),
+            )
+            family(
+                "arttic_jobs_total",
+                "counter",
+                "Jobs finished by kind and outcome.",
+                [
+                    ("arttic_jobs_total", {"kind": kind, "outcome": outcome}, count)
+                    for (kind, outcome), count in sorted(self._outcomes.items())
+                ],
+            )
+
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+                continue
+            for name, metric_type, help_text, samples in collected:
+                family(
+                    name,
+                    metric_type,
+                    help_text,
+                    [(name, labels, value) for labels, value in samples],
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
@@ -0,0 +1,243 @@
+# core/model_cache.py
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("arttic_lab")
+
+# Share of physical RAM used for parked pipelines when no budget is configured.
+DEFAULT_HOST_FRACTION = 0.5
+# Host RAM that must stay free after parking a pipeline.
+HOST_RESERVE_BYTES = 2 * 1024**3
+
+
+def total_host_bytes():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def available_host_bytes():
+    """RAM the OS can hand out without swapping, or None when unknown."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def pipeline_bytes(pipe):
+    """Bytes held by the parameters and buffers of every module in a diffusers pipeline."""
+    seen = set()
+    total = 0
+    for component in pipe.pipe.components.values():
+        if not hasattr(component, "parameters"):
+            continue
+        for tensor in list(component.parameters()) + list(component.buffers()):
+            key = tensor.data_ptr()
+            if key in seen:
+                continue
+            seen.add(key)
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelCache:
+    """LRU cache of loaded pipelines that are not currently active.
+
+    A parked pipeline keeps its weights, IPEX optimization, schedulers and LoRA
+    adapters, so switching back to it is a device transfer instead of a
+    checkpoint parse. Pipelines stay on the device while they fit in
+    max_device_bytes and are moved to host RAM otherwise.
+    """
+
+    def __init__(self, max_host_bytes=None, max_device_bytes=0):
+        if max_host_bytes is None:
+            total = total_host_bytes()
+            max_host_bytes = int(total * DEFAULT_HOST_FRACTION) if total else 0
+        self.max_host_bytes = max_host_bytes
+        self.max_device_bytes = max_device_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_host_bytes=None, max_device_bytes=None):
+        with self._lock:
+            if max_host_bytes is not None:
+                self.max_host_bytes = max_host_bytes
+            if max_device_bytes is not None:
+                self.max_device_bytes = max_device_bytes
+            self._evict()
+
+    def _bytes_on(self, location):
+        return sum(e["bytes"] for e in self._entries.values() if e["location"] == location)
+
+    def contains(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def take(self, key):
+        """Remove and return the parked entry for key (still wherever it was parked)."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["hits"] += 1
+            return entry
+
+    def park(self, key, pipe, info):
+        """Keep a pipeline that is being switched away from. Returns True if cached."""
+        if self.max_host_bytes <= 0 and self.max_device_bytes <= 0:
+            return False
+        size = pipeline_bytes(pipe)
+
+        with self._lock:
+            # The new pipeline replaces any copy cached under the same key.
+            old = self._entries.pop(key, None)
+            location = self._placement(key, pipe, size)
+            if location is None:
+                if old:
+                    self._entries[key] = old
+                return False
+            if location == "host":
+                self._evict(incoming_host_bytes=size)
+
+            start = time.perf_counter()
+            if location == "host":
+                pipe.move_to_host()
+            self._entries[key] = {
+                "pipe": pipe,
+                "bytes": size,
+                "location": location,
+                "info": info,
+                "hits": old["hits"] if old else 0,
+                "parked_at": time.time(),
+            }
+            logger.info(
+                f"Parked '{key[0]}' on {location} ({size / 1024**3:.2f} GB) in {time.perf_counter() - start:.2f}s."
+            )
+            self._evict()
+            return True
+
+    def _placement(self, key, pipe, size):
+        # Caller holds the lock. Where the pipeline would be parked, or None to refuse it.
+        if (
+            not pipe.is_offloaded
+            and self._bytes_on("device") + size <= self.max_device_bytes
+        ):
+            return "device"
+        if size > self.max_host_bytes:
+            logger.info(f"Not caching '{key[0]}': it is larger than the model cache.")
+            return None
+        # Offloaded pipelines, and everything on a CPU backend, already live in host RAM.
+        if not pipe.is_offloaded and pipe.backend.device != "cpu":
+            available = available_host_bytes()
+            if (
+                available is not None
+                and available + self._host_bytes_freed_for(size) - size
+                < HOST_RESERVE_BYTES
+            ):
+                logger.warning(
+                    f"Not caching '{key[0]}': only {available / 1024**3:.1f} GB of RAM available."
+                )
+                return None
+        return "host"
+
+    def _evict(self, incoming_host_bytes=0):
+        # Caller holds the lock. Drops the least recently parked entry of whichever
+        # location is over budget.
+        while True:
+            if self._bytes_on("device") > self.max_device_bytes:
+                location = "device"
+            elif self._bytes_on("host") + incoming_host_bytes > self.max_host_bytes:
+                location = "host"
+            else:
+                return
+            key = next(k for k, e in self._entries.items() if e["location"] == location)
+            self._drop(key)
+            self.evictions += 1
+
+    def _host_bytes_freed_for(self, incoming_host_bytes):
+        # Caller holds the lock. What _evict() would release from host RAM to make room.
+        excess = self._bytes_on("host") + incoming_host_bytes - self.max_host_bytes
+        freed = 0
+        for entry in self._entries.values():
+            if freed >= excess:
+                break
+            if entry["location"] == "host":
+                freed += entry["bytes"]
+        return freed
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        logger.info(f"Evicted '{key[0]}' from the model cache.")
+        del entry["pipe"].pipe
+
+    def move_device_entries_to_host(self):
+        """Free VRAM held by parked pipelines, keeping them cached in host RAM if they fit."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry["location"] != "device":
+                    continue
+                if self._bytes_on("host") + entry["bytes"] <= self.max_host_bytes:
+                    entry["pipe"].move_to_host()
+                    entry["location"] = "host"
+                else:
+                    self._drop(key)
+                    self.evictions += 1
+
+    def remove(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def device_bytes(self):
+        with self._lock:
+            return self._bytes_on("device")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "models": [
+                    {
+                        "model_name": key[0],
+                        "cpu_offload": key[1],
+                        "model_type": entry["info"].get("model_type"),
+                        "location": entry["location"],
+                        "bytes": entry["bytes"],
+                        "hits": entry["hits"],
+                        "parked_at": entry["parked_at"],
+                    }
+                    for key, entry in reversed(self._entries.items())
+                ],
+                "host_bytes": self._bytes_on("host"),
+                "device_bytes": self._bytes_on("device"),
+                "max_host_bytes": self.max_host_bytes,
+                "max_device_bytes": self.max_device_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+model_cache = ModelCache()
@@ -0,0 +1,102 @@
+# core/model_preloader.py
+import time
+import logging
+import threading
+
+logger = logging.getLogger("arttic_lab")
+
+
+class PreloadInProgressError(Exception):
+    pass
+
+
+class ModelPreloader:
+    """Builds the next model's pipeline in host RAM while the current one keeps serving.
+
+    Only one preload runs at a time and only one finished pipeline is held,
+    so at most two models (active + next) are resident. The device worker
+    picks the finished pipeline up with take() when it runs the swap job.
+    A pipeline is only handed over for the CPU offload mode it was built for,
+    since only pipelines without offload hooks share components.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loading = None
+        self._loaded = threading.Event()
+        self._ready_name = None
+        self._ready_offload = None
+        self._ready_pipe = None
+
+    def preload(self, model_name, build, progress=None, cpu_offload=False):
+        """Run build() (which returns a pipeline in host RAM) and hold the result for model_name."""
+        with self._lock:
+            if self._loading:
+                raise PreloadInProgressError(
+                    f"Model '{self._loading}' is already being preloaded."
+                )
+            if self._ready_name == model_name and self._ready_offload == cpu_offload:
+                return
+            self._loading = model_name
+            self._loaded.clear()
+            self._drop_ready()
+
+        start = time.perf_counter()
+        try:
+            pipe = build(progress)
+        finally:
+            with self._lock:
+                self._loading = None
+                self._loaded.set()
+
+        with self._lock:
+            self._drop_ready()
+            self._ready_name = model_name
+            self._ready_offload = cpu_offload
+            self._ready_pipe = pipe
+        logger.info(
+            f"Model '{model_name}' preloaded into host RAM in {time.perf_counter() - start:.2f}s."
+        )
+
+    def take(self, model_name, cpu_offload=False):
+        """Hand over the preloaded pipeline for model_name, waiting if it is still loading.
+
+        A pipeline preloaded for the other offload mode is discarded.
+        """
+        with self._lock:
+            loading = self._loading == model_name
+        if loading:
+            logger.info(f"Waiting for the preload of '{model_name}' to finish...")
+            self._loaded.wait()
+
+        with self._lock:
+            if self._ready_name != model_name:
+                return None
+            if self._ready_offload != cpu_offload:
+                self._drop_ready()
+                return None
+            pipe = self._ready_pipe
+            self._ready_name = None
+            self._ready_offload = None
+            self._ready_pipe = None
+            return pipe
+
+    def _drop_ready(self):
+        # Caller holds the lock.
+        if self._ready_pipe is not None:
+            logger.info(f"Discarding preloaded model '{self._ready_name}'.")
+            del self._ready_pipe.pipe
+        self._ready_name = None
+        self._ready_offload = None
+        self._ready_pipe = None
+
+    def discard(self):
+        with self._lock:
+            self._drop_ready()
+
+    def status(self):
+        with self._lock:
+            return {"loading": self._loading, "ready": self._ready_name}
+
+
+model_preloader = ModelPreloader()
@@ -0,0 +1,81 @@
+# core/output_counter.py
+import os
+import re
+import logging
+import threading
+
+logger = logging.getLogger("arttic_lab")
+
+OUTPUTS_DIR = "./outputs"
+COUNTER_FILENAME = ".next_image_number"
+FILENAME_PREFIX = "ArtTic-LAB_"
+
+
+class OutputCounter:
+    """Hands out unique ArtTic-LAB_N.png names without listing the outputs folder.
+
+    The next number is persisted next to the outputs and each name is claimed
+    with an exclusive create, so a stale counter (e.g. after a crash) or a
+    second process can only cause a skip, never an overwrite.
+    """
+
+    def __init__(self, outputs_dir=OUTPUTS_DIR, prefix=FILENAME_PREFIX):
+        self.outputs_dir = outputs_dir
+        self.prefix = prefix
+        self.counter_path = os.path.join(outputs_dir, COUNTER_FILENAME)
+        self._pattern = re.compile(rf"{re.escape(prefix)}(\d+)\.png$")
+        self._lock = threading.Lock()
+        self._next = None
+
+    def _recover_from_listing(self):
+        highest_num = 0
+        with os.scandir(self.outputs_dir) as it:
+            for dir_entry in it:
+                match = self._pattern.match(dir_entry.name)
+                if match:
+                    highest_num = max(highest_num, int(match.group(1)))
+        logger.info(f"Output counter recovered from folder listing: {highest_num + 1}")
+        return highest_num + 1
+
+    def _load(self):
+        try:
+            with open(self.counter_path, "r", encoding="utf-8") as f:
+                value = int(f.read().strip())
+            if value >= 1:
+                return value
+        except (FileNotFoundError, ValueError):
+            pass
+        return self._recover_from_listing()
+
+    def _persist(self, value):
+        # A stale counter only costs a few skipped names, so a failed write is not fatal.
+        tmp_path = f"{self.counter_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(str(value))
+            os.replace(tmp_path, self.counter_path)
+        except OSError as e:
+            logger.warning(f"Could not persist output counter: {e}")
+
+    def reserve(self):
+        """Claim the next free output name. Returns (filename, filepath) of an empty file."""
+        with self._lock:
+            os.makedirs(self.outputs_dir, exist_ok=True)
+            if self._next is None:
+                self._next = self._load()
+
+            while True:
+                number = self._next
+                self._next += 1
+                filename = f"{self.prefix}{number}.png"
+                filepath = os.path.join(self.outputs_dir, filename)
+                try:
+                    fd = os.open(filepath, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                except FileExistsError:
+                    continue
+                os.close(fd)
+                self._persist(self._next)
+                return filename, filepath
+
+
+output_counter = OutputCounter()
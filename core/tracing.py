@@ -0,0 +1,120 @@
+# core/tracing.py
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+import torch
+from pipelines.devices import get_backend
+
+logger = logging.getLogger("arttic_lab")
+
+TRACE_SUFFIX = ".trace.json"
+# Stage spans get their own process row so profiler events never interleave with them.
+STAGES_PID = 0
+PROFILER_ANCHOR = "arttic::profiler_start"
+
+
+def trace_filename(image_filename):
+    return os.path.splitext(image_filename)[0] + TRACE_SUFFIX
+
+
+class DenoiseProfiler:
+    """torch.profiler around the sampling loop, exported into the job's trace."""
+
+    def __init__(self):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        xpu_activity = getattr(torch.profiler.ProfilerActivity, "XPU", None)
+        if xpu_activity is not None and get_backend().name == "xpu":
+            activities.append(xpu_activity)
+        self._profiler = torch.profiler.profile(activities=activities)
+        self._anchor = None
+        self.running = False
+
+    def start(self):
+        self._profiler.start()
+        self.running = True
+        # A marker with a known perf_counter() time, to align the profiler's clock with ours.
+        with torch.profiler.record_function(PROFILER_ANCHOR):
+            self._anchor = time.perf_counter()
+
+    def stop(self):
+        if self.running:
+            self._profiler.stop()
+            self.running = False
+
+    def events(self, origin):
+        """Profiler events shifted onto the job's timeline (microseconds since origin)."""
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            self._profiler.export_chrome_trace(path)
+            with open(path, "r", encoding="utf-8") as f:
+                events = json.load(f).get("traceEvents", [])
+        finally:
+            os.remove(path)
+
+        timed = [e for e in events if "ts" in e]
+        if not timed:
+            return events
+        anchor = next((e for e in timed if e.get("name") == PROFILER_ANCHOR), None)
+        anchor_ts = float(anchor["ts"]) if anchor else min(float(e["ts"]) for e in timed)
+        shift = (self._anchor - origin) * 1e6 - anchor_ts
+        for event in timed:
+            event["ts"] = float(event["ts"]) + shift
+        return events
+
+
+def _complete_event(name, category, start, seconds, origin, tid, args):
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": round((start - origin) * 1e6, 3),
+        "dur": round(seconds * 1e6, 3),
+        "pid": STAGES_PID,
+        "tid": tid,
+    }
+    if args:
+        event["args"] = args
+    return event
+
+
+def build_trace(timings, metadata=None, profiler_events=()):
+    """Chrome trace-event JSON for one job record, loadable in Perfetto or chrome://tracing."""
+    end = time.perf_counter()
+    origin = timings.origin
+    events = [
+        {"name": "process_name", "ph": "M", "pid": STAGES_PID, "args": {"name": "ArtTic-LAB"}},
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": STAGES_PID,
+            "tid": threading.get_native_id(),
+            "args": {"name": "device worker"},
+        },
+        _complete_event(
+            timings.kind, "job", origin, end - origin, origin, threading.get_native_id(), None
+        ),
+    ]
+    for name, start, seconds, args, tid in timings.spans:
+        events.append(_complete_event(name, "span", start, seconds, origin, tid, args))
+    for name, start, seconds, args, tid in timings.stages:
+        events.append(_complete_event(name, "stage", start, seconds, origin, tid, args))
+    events.extend(profiler_events)
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": dict(metadata or {}, started_at=timings.started_at),
+    }
+
+
+def write_trace(path, timings, metadata=None, profiler=None):
+    profiler_events = profiler.events(timings.origin) if profiler else ()
+    trace = build_trace(timings, metadata, profiler_events)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    os.replace(tmp_path, path)
+    logger.info(f"Trace written to {path} ({len(trace['traceEvents'])} events).")
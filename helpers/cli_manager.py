@@ -2,9 +2,13 @@ import logging
 import sys
 import http
 import torch
-import intel_extension_for_pytorch as ipex
 import diffusers
 
+try:
+    import intel_extension_for_pytorch as ipex
+except ImportError:
+    ipex = None
+
 APP_LOGGER_NAME = "arttic_lab"
 APP_VERSION = "3.2.0"
 
@@ -62,7 +66,7 @@ class UvicornAccessFormatter(logging.Formatter):
         )
 
 
-def log_system_info():
+def log_system_info(backend=None):
     logger = logging.getLogger(APP_LOGGER_NAME)
 
     art = f"""
@@ -85,10 +89,14 @@ def log_system_info():
         f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
     )
     logger.info(
-        f"  Python: {py_version}, Torch: {torch.__version__}, IPEX: {ipex.__version__}, Diffusers: {diffusers.__version__}"
+        f"  Python: {py_version}, Torch: {torch.__version__}, IPEX: {ipex.__version__ if ipex else 'not installed'}, Diffusers: {diffusers.__version__}"
     )
 
-    if torch.xpu.is_available():
+    if backend is not None and backend.name != "xpu":
+        logger.info(
+            f"  Device: {CustomFormatter.MINT_2}{backend.describe()}{CustomFormatter.RESET}"
+        )
+    elif hasattr(torch, "xpu") and torch.xpu.is_available():
         gpu_name = torch.xpu.get_device_name(0)
         logger.info(
             f"  Intel GPU: {CustomFormatter.MINT_2}{gpu_name}{CustomFormatter.RESET} (Detected)"
@@ -1,5 +1,8 @@
 import os
-from safetensors import safe_open
+import json
+import math
+import struct
+import threading
 from .sd15_pipeline import SD15Pipeline
 from .sd2_pipeline import SD2Pipeline
 from .sdxl_pipeline import SDXLPipeline
@@ -11,62 +14,146 @@ logger = logging.getLogger("arttic_lab")
 
 MODELS_DIR = "./models"
 
+SD2_SIGNATURE_KEY = (
+    "model.diffusion_model.input_blocks.8.1.transformer_blocks.0.attn2.to_k.weight"
+)
+# Refuse absurd header lengths from corrupt files before allocating for them.
+MAX_HEADER_BYTES = 100 * 1024**2
 
-def _is_flux(keys):
-    has_flux_signature = any("transformer." in k for k in keys) or any(
-        "double_blocks." in k for k in keys
-    )
-    has_unet_signature = any("input_blocks" in k for k in keys) or any(
-        "output_blocks" in k for k in keys
-    )
-    return has_flux_signature and not has_unet_signature
+_model_info_cache = {}
+_model_info_lock = threading.Lock()
 
 
-def _is_sd3(keys):
-    return any(k.startswith("text_encoders.") for k in keys)
+def read_safetensors_header(model_path):
+    """Return the JSON header of a .safetensors file without touching tensor data."""
+    with open(model_path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError("File is too short to be a safetensors checkpoint.")
+        (header_len,) = struct.unpack("<Q", prefix)
+        if header_len > MAX_HEADER_BYTES:
+            raise ValueError(f"Safetensors header is implausibly large ({header_len} bytes).")
+        return json.loads(f.read(header_len))
 
 
-def _is_xl(keys):
-    return any(k.startswith("conditioner.embedders.1") for k in keys)
+def _classify_header(header, model_name):
+    is_sd3 = is_xl = is_v2 = False
+    has_flux_signature = has_unet_signature = False
+    parameters = 0
+    dtype_counts = {}
 
+    for key, info in header.items():
+        if key == "__metadata__":
+            continue
+        if key.startswith("text_encoders."):
+            is_sd3 = True
+        elif key.startswith("conditioner.embedders.1"):
+            is_xl = True
+        if "transformer." in key or "double_blocks." in key:
+            has_flux_signature = True
+        if "input_blocks" in key or "output_blocks" in key:
+            has_unet_signature = True
+        if key == SD2_SIGNATURE_KEY:
+            is_v2 = True
 
-def _is_v2(keys):
-    return (
-        "model.diffusion_model.input_blocks.8.1.transformer_blocks.0.attn2.to_k.weight"
-        in keys
-    )
+        count = math.prod(info.get("shape", ()))
+        parameters += count
+        dtype = info.get("dtype")
+        dtype_counts[dtype] = dtype_counts.get(dtype, 0) + count
+
+    if is_sd3:
+        architecture = "SD3"
+    elif is_xl:
+        architecture = "SDXL"
+    elif has_flux_signature and not has_unet_signature:
+        architecture = "FLUX Schnell" if "schnell" in model_name.lower() else "FLUX Dev"
+    elif is_v2:
+        architecture = "SD 2.x"
+    else:
+        architecture = "SD 1.5"
+
+    return {
+        "architecture": architecture,
+        "parameters": parameters,
+        "dtype": max(dtype_counts, key=dtype_counts.get) if dtype_counts else None,
+    }
+
+
+def inspect_model(model_name):
+    """Architecture, parameter count and dominant dtype of a checkpoint, from its header.
+
+    Results are cached per (path, size, mtime), so repeated calls are free.
+    """
+    model_path = os.path.join(MODELS_DIR, f"{model_name}.safetensors")
+    stat = os.stat(model_path)
+    cache_key = (os.path.abspath(model_path), stat.st_size, stat.st_mtime)
+
+    with _model_info_lock:
+        info = _model_info_cache.get(cache_key)
+    if info is None:
+        info = _classify_header(read_safetensors_header(model_path), model_name)
+        info["size_bytes"] = stat.st_size
+        with _model_info_lock:
+            _model_info_cache[cache_key] = info
+    return dict(info)
 
 
 def get_pipeline_for_model(model_name):
     model_path = os.path.join(MODELS_DIR, f"{model_name}.safetensors")
-    model_name_lower = model_name.lower()
 
     try:
-        with safe_open(model_path, framework="pt", device="cpu") as f:
-            keys = list(f.keys())
+        architecture = inspect_model(model_name)["architecture"]
     except Exception as e:
         logger.error(
             f"Could not inspect model '{model_name}': {e}. Assuming SD 1.5 as fallback."
         )
         return SD15Pipeline(model_path)
 
-    if _is_sd3(keys):
+    if architecture == "SD3":
         logger.info(f"Model '{model_name}' detected as SD3.")
         return SD3Pipeline(model_path)
-    elif _is_xl(keys):
+    elif architecture == "SDXL":
         logger.info(f"Model '{model_name}' detected as SDXL.")
         return SDXLPipeline(model_path)
-    elif _is_flux(keys):
+    elif architecture.startswith("FLUX"):
         logger.info(f"Model '{model_name}' detected as FLUX based on tensor keys.")
-        if "schnell" in model_name_lower:
+        if architecture == "FLUX Schnell":
             logger.info("FLUX model identified as 'Schnell' variant from filename.")
             return ArtTicFLUXPipeline(model_path, is_schnell=True)
         else:
             logger.info("FLUX model identified as 'DEV' variant.")
             return ArtTicFLUXPipeline(model_path, is_schnell=False)
-    elif _is_v2(keys):
+    elif architecture == "SD 2.x":
         logger.info(f"Model '{model_name}' detected as SD 2.x.")
         return SD2Pipeline(model_path)
     else:
         logger.info(f"Model '{model_name}' detected as SD 1.5.")
         return SD15Pipeline(model_path)
+
+
+def warm_converted_cache(progress=None):
+    """Convert every single-file checkpoint in ./models into the converted-model cache."""
+    from glob import glob
+    from .converted_cache import converted_cache
+
+    report = progress or (lambda value, desc: None)
+    results = []
+    if converted_cache.max_bytes <= 0:
+        logger.warning("The converted model cache is disabled; nothing to warm.")
+        return results
+    for model_path in sorted(glob(os.path.join(MODELS_DIR, "*.safetensors"))):
+        model_name = os.path.basename(model_path)[: -len(".safetensors")]
+        pipe = get_pipeline_for_model(model_name)
+        if not isinstance(pipe, (SD15Pipeline, SD2Pipeline, SDXLPipeline)):
+            logger.info(f"Skipping '{model_name}': it is not loaded from a single file.")
+            continue
+        name = converted_cache.entry_name(model_path, pipe.dtype)
+        if os.path.isdir(os.path.join(converted_cache.cache_dir, name)):
+            logger.info(f"'{model_name}' is already in the converted cache.")
+            results.append((model_name, "cached"))
+            continue
+        logger.info(f"Converting '{model_name}'...")
+        pipe.load_pipeline(report)
+        del pipe.pipe
+        results.append((model_name, "converted"))
+    return results
@@ -1,101 +1,192 @@
 # pipelines/base_pipeline.py
 import torch
-import intel_extension_for_pytorch as ipex
 import logging
+from collections import OrderedDict
+from .converted_cache import converted_cache
+from .component_dedup import component_dedup
+from .devices import get_backend
+from core.metrics import metrics
 
 logger = logging.getLogger("arttic_lab")
 
 
 class ArtTicPipeline:
-    def __init__(self, model_path, dtype=torch.bfloat16):
-        if not torch.xpu.is_available():
-            raise RuntimeError("Intel ARC GPU (XPU) not detected.")
+    def __init__(self, model_path, dtype=None):
+        self.backend = get_backend()
         self.pipe = None
         self.model_path = model_path
-        self.dtype = dtype
+        self.dtype = dtype or self.backend.dtype
         self.is_optimized = False
         self.is_offloaded = False
+        self.scheduler_name = None
+        self._base_scheduler_config = None
+        self._schedulers = {}
+        # Bookkeeping for core.lora_manager: adapter name -> LoRA name, in LRU order.
+        self.lora_adapters = OrderedDict()
+        self.lora_state = None
+        self.lora_fused = False
+        self.lora_disabled = False
+        self.base_lora_adapters = None
+        # Offloaded pipelines get hooks on their modules, so they never share them.
+        self.share_components = True
+        self.component_keys = {}
 
     def load_pipeline(self, progress):
         raise NotImplementedError("Subclasses must implement load_pipeline")
 
+    def _load_single_file(self, pipeline_class, progress, **kwargs):
+        """Load a single-file checkpoint, reusing identical components of live pipelines."""
+        shared = (
+            component_dedup.shared_components(self, pipeline_class)
+            if self.share_components
+            else {}
+        )
+        self.pipe = converted_cache.load(
+            pipeline_class, self.model_path, self.dtype, progress, **shared, **kwargs
+        )
+        if self.share_components:
+            component_dedup.register(self)
+
+    def set_scheduler(self, name, scheduler_class, **options):
+        """Swap the sampler without touching the weights.
+
+        Instances are built from the scheduler config the checkpoint shipped with
+        and memoized per (name, options), so switching back and forth is free.
+        """
+        if not self.pipe:
+            raise RuntimeError("Pipeline must be loaded before setting a scheduler.")
+        if self._base_scheduler_config is None:
+            self._base_scheduler_config = self.pipe.scheduler.config
+
+        key = (name, tuple(sorted(options.items())))
+        scheduler = self._schedulers.get(key)
+        if scheduler is None:
+            scheduler = scheduler_class.from_config(
+                self._base_scheduler_config, **options
+            )
+            self._schedulers[key] = scheduler
+        self.pipe.scheduler = scheduler
+        self.scheduler_name = name
+
     def place_on_device(self, use_cpu_offload=False):
         if not self.pipe:
             raise RuntimeError("Pipeline must be loaded before placing on device.")
 
-        if use_cpu_offload:
-            logger.info("Enabling Model CPU Offload for low VRAM usage.")
-            self.pipe.enable_model_cpu_offload()
-            self.is_offloaded = True
+        if use_cpu_offload and not self.backend.supports_cpu_offload:
+            logger.info("CPU Offload has no effect on the CPU backend; ignoring it.")
+            use_cpu_offload = False
+
+        with metrics.stage("device_move"):
+            if use_cpu_offload:
+                logger.info("Enabling Model CPU Offload for low VRAM usage.")
+                self.pipe.enable_model_cpu_offload(device=self.backend.device)
+                self.is_offloaded = True
+            else:
+                logger.info(f"Moving model to {self.backend.describe()}.")
+                self.pipe.to(self.backend.device)
+                self.is_offloaded = False
+
+    def move_to_host(self):
+        """Park the weights in host RAM, keeping everything else about the pipeline."""
+        if self.is_offloaded:
+            self.pipe.maybe_free_model_hooks()
         else:
-            logger.info("Moving model to XPU (ARC GPU) for maximum performance.")
-            self.pipe.to("xpu")
-            self.is_offloaded = False
+            self.pipe.to("cpu")
+        self.backend.empty_cache()
 
-    def optimize_with_ipex(self, progress):
+    def move_to_device(self):
+        """Undo move_to_host. Offloaded pipelines move their modules on demand."""
+        if not self.is_offloaded:
+            with metrics.stage("device_move"):
+                self.pipe.to(self.backend.device)
+
+    def optimize_for_device(self, progress):
         if self.is_optimized:
             logger.info("Model is already optimized.")
             return
         if self.is_offloaded:
-            logger.warning("IPEX optimization is not available in CPU Offload mode.")
+            logger.warning("Model optimization is not available in CPU Offload mode.")
             return
         if not self.pipe:
             raise RuntimeError("Pipeline must be loaded before optimization.")
 
-        progress(0.8, "Optimizing model with IPEX...")
+        progress(0.8, f"Optimizing model for {self.backend.name.upper()}...")
+        with metrics.stage("optimize"):
+            self._optimize_components()
+        self.is_optimized = True
 
+    def _optimize_components(self):
         # Optimize Text Encoders
         if hasattr(self.pipe, "text_encoder"):
-            self.pipe.text_encoder = ipex.optimize(
-                self.pipe.text_encoder.eval(), dtype=self.dtype, inplace=True
-            )
-            logger.info("Text Encoder optimized with IPEX.")
+            self.pipe.text_encoder = self._optimize_module(self.pipe.text_encoder)
+            logger.info("Text Encoder optimized.")
 
         if hasattr(self.pipe, "text_encoder_2"):
-            self.pipe.text_encoder_2 = ipex.optimize(
-                self.pipe.text_encoder_2.eval(), dtype=self.dtype, inplace=True
-            )
-            logger.info("Text Encoder 2 optimized with IPEX.")
+            self.pipe.text_encoder_2 = self._optimize_module(self.pipe.text_encoder_2)
+            logger.info("Text Encoder 2 optimized.")
 
         if hasattr(self.pipe, "text_encoder_3"):
-            self.pipe.text_encoder_3 = ipex.optimize(
-                self.pipe.text_encoder_3.eval(), dtype=self.dtype, inplace=True
-            )
-            logger.info("Text Encoder 3 optimized with IPEX.")
+            self.pipe.text_encoder_3 = self._optimize_module(self.pipe.text_encoder_3)
+            logger.info("Text Encoder 3 optimized.")
 
         # Optimize U-Net / Transformer
         if hasattr(self.pipe, "unet"):
             # Suggest Channels Last memory format for Conv2d layers
-            self.pipe.unet = self.pipe.unet.to(memory_format=torch.channels_last)
-            self.pipe.unet = ipex.optimize(
-                self.pipe.unet.eval(),
-                dtype=self.dtype,
-                inplace=True,
-                weights_prepack=True,
+            self.pipe.unet = self._optimize_module(
+                self.pipe.unet, channels_last=True, weights_prepack=True
             )
-            logger.info("U-Net optimized with IPEX (Channels Last).")
+            logger.info("U-Net optimized (Channels Last).")
 
         elif hasattr(self.pipe, "transformer"):
-            self.pipe.transformer = ipex.optimize(
-                self.pipe.transformer.eval(), dtype=self.dtype, inplace=True
-            )
-            logger.info("Transformer optimized with IPEX.")
+            self.pipe.transformer = self._optimize_module(self.pipe.transformer)
+            logger.info("Transformer optimized.")
 
         # Optimize VAE
         if hasattr(self.pipe, "vae"):
-            self.pipe.vae = self.pipe.vae.to(memory_format=torch.channels_last)
-            self.pipe.vae = ipex.optimize(
-                self.pipe.vae.eval(),
-                dtype=self.dtype,
-                inplace=True,
-                weights_prepack=True,
+            self.pipe.vae = self._optimize_module(
+                self.pipe.vae, channels_last=True, weights_prepack=True
+            )
+            logger.info("VAE optimized (Channels Last).")
+
+    def _optimize_module(self, module, channels_last=False, **options):
+        # Components shared with another pipeline may already be optimized.
+        if getattr(module, "_arttic_optimized", False):
+            return module
+        module = self.backend.optimize_module(
+            module, self.dtype, channels_last=channels_last, **options
+        )
+        module._arttic_optimized = True
+        return module
+
+    def encode_prompt_embeds(self, prompt, negative_prompt, do_cfg, lora_scale=None):
+        """Run the text encoders once and return the embedding kwargs for generate()."""
+        if not self.pipe:
+            raise RuntimeError("Pipeline not loaded.")
+        with (
+            metrics.stage("text_encode"),
+            torch.no_grad(),
+            self.backend.autocast(self.dtype),
+        ):
+            return self._encode_prompt_embeds(
+                prompt, negative_prompt, do_cfg, lora_scale
             )
-            logger.info("VAE optimized with IPEX (Channels Last).")
 
-        self.is_optimized = True
+    def _encode_prompt_embeds(self, prompt, negative_prompt, do_cfg, lora_scale):
+        prompt_embeds, negative_prompt_embeds = self.pipe.encode_prompt(
+            prompt,
+            self.pipe._execution_device,
+            1,
+            do_cfg,
+            negative_prompt=negative_prompt,
+            lora_scale=lora_scale,
+        )
+        return {
+            "prompt_embeds": prompt_embeds,
+            "negative_prompt_embeds": negative_prompt_embeds,
+        }
 
     def generate(self, *args, **kwargs):
         if not self.pipe:
             raise RuntimeError("Pipeline not loaded.")
-        with torch.xpu.amp.autocast(enabled=True, dtype=self.dtype):
+        with self.backend.autocast(self.dtype):
             return self.pipe(*args, **kwargs)
@@ -0,0 +1,224 @@
+# pipelines/component_dedup.py
+import os
+import copy
+import json
+import time
+import struct
+import hashlib
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger("arttic_lab")
+
+DIGESTS_PATH = os.path.join("./models", ".component_digests.json")
+READ_BLOCK_SIZE = 8 * 1024**2
+# Key prefixes of each shareable diffusers component in single-file (LDM) checkpoints.
+COMPONENT_PREFIXES = {
+    "vae": ("first_stage_model.",),
+    "text_encoder": ("cond_stage_model.", "conditioner.embedders.0."),
+    "text_encoder_2": ("conditioner.embedders.1.",),
+}
+# Components LoRAs can patch; they are copied before an adapter is loaded into them.
+LORA_TARGETS = ("text_encoder", "text_encoder_2")
+
+
+def _module_bytes(module):
+    return sum(
+        t.numel() * t.element_size()
+        for t in list(module.parameters()) + list(module.buffers())
+    )
+
+
+def component_digests(model_path):
+    """SHA-256 per shareable component, over its tensor names, dtypes, shapes and data.
+
+    Tensor locations come from the safetensors header, so only the bytes of
+    the shareable components are read (the UNet is skipped entirely).
+    """
+    with open(model_path, "rb") as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+        data_start = 8 + header_len
+
+        members = {name: [] for name in COMPONENT_PREFIXES}
+        for key, info in header.items():
+            if key == "__metadata__":
+                continue
+            for name, prefixes in COMPONENT_PREFIXES.items():
+                prefix = next((p for p in prefixes if key.startswith(p)), None)
+                if prefix:
+                    members[name].append((key[len(prefix) :], info))
+                    break
+
+        digests = {}
+        for name, tensors in members.items():
+            if not tensors:
+                continue
+            digest = hashlib.sha256()
+            for rel_key, info in sorted(tensors, key=lambda t: t[0]):
+                digest.update(f"{rel_key}|{info['dtype']}|{info['shape']}\n".encode())
+                begin, end = info["data_offsets"]
+                f.seek(data_start + begin)
+                remaining = end - begin
+                while remaining > 0:
+                    block = f.read(min(READ_BLOCK_SIZE, remaining))
+                    if not block:
+                        raise ValueError(f"Truncated tensor data in {model_path}.")
+                    digest.update(block)
+                    remaining -= len(block)
+            digests[name] = digest.hexdigest()
+        return digests
+
+
+class ComponentDedup:
+    """Shares byte-identical VAEs and text encoders between loaded pipelines.
+
+    Before a single-file checkpoint is loaded, its component digests are
+    looked up among the modules of pipelines that are still alive (active,
+    parked in the model cache or preloaded); matches are handed to diffusers
+    as ready-made components, so they are neither loaded nor stored twice.
+    """
+
+    def __init__(self, digests_path=DIGESTS_PATH):
+        self.digests_path = digests_path
+        self._lock = threading.Lock()
+        self._digests = None
+        self._modules = {}
+        self._users = {}
+        self._bytes = {}
+        self.reused = 0
+
+    def _load_digests(self):
+        if self._digests is None:
+            try:
+                with open(self.digests_path, "r", encoding="utf-8") as f:
+                    self._digests = json.load(f)
+            except (OSError, ValueError):
+                self._digests = {}
+        return self._digests
+
+    def digests_for(self, model_path):
+        stat = os.stat(model_path)
+        abs_path = os.path.abspath(model_path)
+        with self._lock:
+            known = self._load_digests().get(abs_path)
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                return known["components"]
+
+        start = time.perf_counter()
+        components = component_digests(model_path)
+        logger.info(
+            f"Hashed {len(components)} components of '{os.path.basename(model_path)}' in {time.perf_counter() - start:.1f}s."
+        )
+        with self._lock:
+            self._load_digests()[abs_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "components": components,
+            }
+            try:
+                with open(f"{self.digests_path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(self._digests, f, indent=2)
+                os.replace(f"{self.digests_path}.tmp", self.digests_path)
+            except OSError as e:
+                logger.warning(f"Could not save component digests: {e}")
+        return components
+
+    def _keys(self, pipe, pipeline_class):
+        # Configs differ per pipeline class (e.g. VAE scaling), so they are part of the key.
+        try:
+            digests = self.digests_for(pipe.model_path)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            logger.warning(f"Component dedup skipped for '{pipe.model_path}': {e}")
+            return {}
+        return {
+            name: (pipeline_class.__name__, name, digest, str(pipe.dtype))
+            for name, digest in digests.items()
+        }
+
+    def _live_module(self, key):
+        # Caller holds the lock.
+        ref = self._modules.get(key)
+        module = ref() if ref else None
+        if module is None:
+            return None
+        for user in list(self._users.get(key, ())):
+            if getattr(getattr(user, "pipe", None), key[1], None) is module:
+                return module
+        return None
+
+    def shared_components(self, pipe, pipeline_class):
+        """Components already loaded by another live pipeline, as from_pretrained kwargs."""
+        keys = self._keys(pipe, pipeline_class)
+        shared = {}
+        with self._lock:
+            for name, key in keys.items():
+                module = self._live_module(key)
+                if module is not None:
+                    shared[name] = module
+                    self.reused += 1
+        if shared:
+            logger.info(
+                f"Reusing already loaded {', '.join(sorted(shared))} for '{os.path.basename(pipe.model_path)}'."
+            )
+        pipe.component_keys = keys
+        return shared
+
+    def register(self, pipe):
+        """Record a freshly loaded pipeline's components so later loads can share them."""
+        with self._lock:
+            for name, key in pipe.component_keys.items():
+                module = getattr(pipe.pipe, name, None)
+                if module is None:
+                    continue
+                if self._live_module(key) is not module:
+                    self._modules[key] = weakref.ref(module)
+                    self._users[key] = weakref.WeakSet()
+                    self._bytes[key] = _module_bytes(module)
+                self._users[key].add(pipe)
+
+    def make_private(self, pipe, names=LORA_TARGETS):
+        """Give a pipeline its own copy of shared components before they are modified."""
+        with self._lock:
+            for name in names:
+                key = pipe.component_keys.get(name)
+                users = self._users.get(key)
+                if not users or pipe not in users:
+                    continue
+                users.discard(pipe)
+                module = getattr(pipe.pipe, name)
+                if not any(
+                    getattr(getattr(u, "pipe", None), name, None) is module for u in users
+                ):
+                    continue
+                logger.info(f"Copying shared {name} before loading a LoRA into it.")
+                setattr(pipe.pipe, name, copy.deepcopy(module))
+                pipe.component_keys.pop(name)
+
+    def report(self):
+        with self._lock:
+            components = []
+            saved = 0
+            for key, users in self._users.items():
+                module = self._live_module(key)
+                if module is None:
+                    continue
+                count = sum(
+                    1 for u in users if getattr(getattr(u, "pipe", None), key[1], None) is module
+                )
+                saved += self._bytes[key] * (count - 1)
+                components.append(
+                    {
+                        "pipeline": key[0],
+                        "component": key[1],
+                        "digest": key[2][:16],
+                        "dtype": key[3],
+                        "bytes": self._bytes[key],
+                        "pipelines": count,
+                    }
+                )
+            return {"components": components, "bytes_saved": saved, "reused": self.reused}
+
+
+component_dedup = ComponentDedup()
@@ -0,0 +1,169 @@
+# pipelines/component_store.py
+import os
+import json
+import time
+import shutil
+import fnmatch
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger("arttic_lab")
+
+STORE_DIR = os.path.join("./models", ".components")
+SOURCE_ENV_VAR = "ARTTIC_COMPONENT_SOURCE"
+HASH_BLOCK_SIZE = 8 * 1024**2
+# Weight formats we never need; diffusers and transformers load the safetensors.
+EXCLUDED_PATTERNS = ["*.bin", "*.pt", "*.ckpt", "*.msgpack", "*.h5", "*.onnx", "*.onnx_data"]
+
+
+def hub_source(repo_id, allow_patterns):
+    """Download (or reuse the Hugging Face cache for) the files of a repo."""
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(
+        repo_id, allow_patterns=allow_patterns, ignore_patterns=EXCLUDED_PATTERNS
+    )
+
+
+def local_source(root):
+    """A source that serves repos from root/<owner>--<name>, for offline setups and tests."""
+
+    def source(repo_id, allow_patterns):
+        path = os.path.join(root, repo_id.replace("/", "--"))
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No local copy of '{repo_id}' in {root}.")
+        return path
+
+    return source
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _matches(rel_path, patterns):
+    return any(fnmatch.fnmatch(rel_path, p) for p in patterns)
+
+
+class ComponentStore:
+    """Content-addressed local store for the base components SD3 and FLUX share.
+
+    Every file is stored once under blobs/<sha256>; each base repo gets a tree
+    of hard links in diffusers layout that from_pretrained loads with
+    local_files_only=True. A repo is resolved from its source once and every
+    later load, for every checkpoint of that architecture, is fully offline.
+    """
+
+    def __init__(self, store_dir=STORE_DIR, source=None):
+        self.store_dir = store_dir
+        if source is None:
+            source_root = os.environ.get(SOURCE_ENV_VAR)
+            source = local_source(source_root) if source_root else hub_source
+        self.source = source
+        self._lock = threading.Lock()
+
+    def _tree_dir(self, repo_id):
+        return os.path.join(self.store_dir, "trees", repo_id.replace("/", "--"))
+
+    def _manifest_path(self, repo_id):
+        return os.path.join(self.store_dir, "refs", repo_id.replace("/", "--") + ".json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.store_dir, "blobs", digest[:2], digest)
+
+    def _read_manifest(self, repo_id):
+        try:
+            with open(self._manifest_path(repo_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_resolved(self, repo_id, allow_patterns):
+        manifest = self._read_manifest(repo_id)
+        if not manifest or manifest.get("patterns") != list(allow_patterns):
+            return False
+        tree = self._tree_dir(repo_id)
+        return all(
+            os.path.exists(os.path.join(tree, rel)) for rel in manifest["files"]
+        )
+
+    def resolve(self, repo_id, allow_patterns):
+        """Return a local diffusers directory for repo_id, fetching it only the first time."""
+        with self._lock:
+            if self.is_resolved(repo_id, allow_patterns):
+                return self._tree_dir(repo_id)
+
+            start = time.perf_counter()
+            logger.info(f"Resolving base components for '{repo_id}' into the local store...")
+            source_dir = self.source(repo_id, list(allow_patterns))
+            files = self._ingest(repo_id, source_dir, allow_patterns)
+            logger.info(
+                f"Stored {len(files)} component files for '{repo_id}' in {time.perf_counter() - start:.1f}s."
+            )
+            return self._tree_dir(repo_id)
+
+    def _ingest(self, repo_id, source_dir, allow_patterns):
+        files = {}
+        tree = self._tree_dir(repo_id)
+        tmp_tree = f"{tree}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_tree, ignore_errors=True)
+
+        for root, _, names in os.walk(source_dir):
+            for name in names:
+                src = os.path.join(root, name)
+                rel = os.path.relpath(src, source_dir).replace(os.sep, "/")
+                if rel.startswith(".") or not _matches(rel, allow_patterns):
+                    continue
+                if _matches(rel, EXCLUDED_PATTERNS):
+                    continue
+                # Hub snapshots are symlinks into the HF cache; store the real file.
+                src = os.path.realpath(src)
+                digest = _sha256(src)
+                blob = self._blob_path(digest)
+                if not os.path.exists(blob):
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    # Sharing the HF cache's file costs no space; copy across filesystems.
+                    try:
+                        os.link(src, f"{blob}.tmp")
+                    except OSError:
+                        shutil.copyfile(src, f"{blob}.tmp")
+                    os.replace(f"{blob}.tmp", blob)
+                dest = os.path.join(tmp_tree, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                try:
+                    os.link(blob, dest)
+                except OSError:
+                    shutil.copyfile(blob, dest)
+                files[rel] = digest
+
+        if "model_index.json" not in files:
+            shutil.rmtree(tmp_tree, ignore_errors=True)
+            raise FileNotFoundError(f"'{repo_id}' has no model_index.json at {source_dir}.")
+
+        shutil.rmtree(tree, ignore_errors=True)
+        os.makedirs(os.path.dirname(tree), exist_ok=True)
+        os.replace(tmp_tree, tree)
+
+        manifest_path = self._manifest_path(repo_id)
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "repo_id": repo_id,
+                    "patterns": list(allow_patterns),
+                    "files": files,
+                    "resolved_at": time.time(),
+                },
+                f,
+                indent=2,
+            )
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        return files
+
+
+component_store = ComponentStore()
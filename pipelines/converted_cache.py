@@ -0,0 +1,216 @@
+# pipelines/converted_cache.py
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import diffusers
+from core.metrics import metrics
+
+logger = logging.getLogger("arttic_lab")
+
+CACHE_DIR = os.path.join("./models", ".converted")
+DEFAULT_MAX_BYTES = 64 * 1024**3
+MANIFEST_NAME = "manifest.json"
+HASH_BLOCK_SIZE = 8 * 1024**2
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ConvertedCache:
+    """On-disk cache of single-file checkpoints converted to diffusers layout.
+
+    from_single_file re-maps every LDM key to the diffusers layout on each
+    load. The converted pipeline is saved once with save_pretrained and later
+    loads use from_pretrained, which memory-maps the safetensors directly.
+    Entries are keyed by the checkpoint's SHA-256, the diffusers version and
+    the dtype, so an edited checkpoint or a diffusers upgrade never reuses a
+    stale conversion. Checkpoint hashes are remembered per (path, size, mtime).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._manifest = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_NAME)
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self._manifest_path, "r", encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+            self._manifest.setdefault("hashes", {})
+            self._manifest.setdefault("entries", {})
+        return self._manifest
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def checkpoint_hash(self, model_path):
+        stat = os.stat(model_path)
+        abs_path = os.path.abspath(model_path)
+        with self._lock:
+            known = self._load_manifest()["hashes"].get(abs_path)
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+                return known["sha256"]
+
+        start = time.perf_counter()
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        logger.info(
+            f"Hashed '{os.path.basename(model_path)}' in {time.perf_counter() - start:.1f}s."
+        )
+
+        with self._lock:
+            self._load_manifest()["hashes"][abs_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": sha256,
+            }
+            self._save_manifest()
+        return sha256
+
+    def entry_name(self, model_path, dtype):
+        dtype_name = str(dtype).replace("torch.", "")
+        return f"{self.checkpoint_hash(model_path)[:24]}-diffusers{diffusers.__version__}-{dtype_name}"
+
+    def load(self, pipeline_class, model_path, dtype, progress, **kwargs):
+        """Load a pipeline from the converted cache, converting and storing it on a miss."""
+        if self.max_bytes <= 0:
+            # Disabled: skip hashing the checkpoint for a key that is never used.
+            return self._convert(pipeline_class, model_path, dtype, **kwargs)
+        name = self.entry_name(model_path, dtype)
+        entry_dir = os.path.join(self.cache_dir, name)
+
+        if os.path.exists(os.path.join(entry_dir, "model_index.json")):
+            progress(0.3, "Loading converted model from cache...")
+            start = time.perf_counter()
+            kwargs.pop("variant", None)
+            try:
+                with metrics.stage("checkpoint_read"):
+                    pipe = pipeline_class.from_pretrained(
+                        entry_dir, torch_dtype=dtype, **kwargs
+                    )
+            except Exception as e:
+                logger.warning(f"Converted cache entry '{name}' is unusable ({e}). Rebuilding.")
+                self.remove(name)
+            else:
+                self._touch(name)
+                with self._lock:
+                    self.hits += 1
+                logger.info(
+                    f"Loaded converted model from cache in {time.perf_counter() - start:.2f}s."
+                )
+                return pipe
+
+        with self._lock:
+            self.misses += 1
+        pipe = self._convert(pipeline_class, model_path, dtype, **kwargs)
+        progress(0.5, "Saving converted model to cache...")
+        with metrics.stage("cache_store"):
+            self._store(pipe, name, model_path)
+        return pipe
+
+    def _convert(self, pipeline_class, model_path, dtype, **kwargs):
+        start = time.perf_counter()
+        with metrics.stage("conversion"):
+            pipe = pipeline_class.from_single_file(
+                model_path, torch_dtype=dtype, use_safetensors=True, **kwargs
+            )
+        logger.info(f"Converted single-file checkpoint in {time.perf_counter() - start:.2f}s.")
+        return pipe
+
+    def _store(self, pipe, name, model_path):
+        entry_dir = os.path.join(self.cache_dir, name)
+        # A preload thread may convert while the device worker does too.
+        tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pipe.save_pretrained(tmp_dir, safe_serialization=True)
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            logger.warning(f"Could not write converted model cache entry: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        with self._lock:
+            self._load_manifest()["entries"][name] = {
+                "source": os.path.basename(model_path),
+                "bytes": _dir_bytes(entry_dir),
+                "last_used": time.time(),
+            }
+            self._evict(keep=name)
+            self._save_manifest()
+
+    def _touch(self, name):
+        with self._lock:
+            entries = self._load_manifest()["entries"]
+            entry = entries.setdefault(
+                name,
+                {"source": None, "bytes": _dir_bytes(os.path.join(self.cache_dir, name))},
+            )
+            entry["last_used"] = time.time()
+            self._save_manifest()
+
+    def _evict(self, keep=None):
+        # Caller holds the lock. Least recently used entries go first.
+        entries = self._manifest["entries"]
+        total = sum(e["bytes"] for e in entries.values())
+        for name in sorted(entries, key=lambda n: entries[n]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            total -= entries[name]["bytes"]
+            self._remove_locked(name)
+
+    def _remove_locked(self, name):
+        shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        self._manifest["entries"].pop(name, None)
+        logger.info(f"Removed converted model cache entry '{name}'.")
+
+    def remove(self, name):
+        with self._lock:
+            self._load_manifest()
+            self._remove_locked(name)
+            self._save_manifest()
+
+    def stats(self):
+        with self._lock:
+            entries = self._load_manifest()["entries"]
+            return {
+                "entries": [dict(e, name=n) for n, e in entries.items()],
+                "bytes": sum(e["bytes"] for e in entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+converted_cache = ConvertedCache()
@@ -0,0 +1,251 @@
+# pipelines/devices.py
+import os
+import logging
+import contextlib
+import torch
+
+logger = logging.getLogger("arttic_lab")
+
+GB = 1024**3
+
+
+def _cpu_flags():
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def physical_core_count():
+    """Physical cores this process may run on (hyper-threads slow down oneDNN kernels)."""
+    try:
+        allowed = len(os.sched_getaffinity(0))
+    except AttributeError:
+        allowed = os.cpu_count() or 1
+    cores = set()
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            physical_id = core_id = None
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not key and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+    except OSError:
+        pass
+    return max(1, min(allowed, len(cores) or allowed))
+
+
+class DeviceBackend:
+    """Where tensors live and how they are computed: placement, RNG, caches, dtype, memory."""
+
+    name = None
+    device = None
+    supports_cpu_offload = False
+
+    def __init__(self, native_rng=False):
+        # Initial noise is drawn on the CPU by default so a seed gives the same
+        # image on every backend; native_rng draws it on the device instead.
+        self.native_rng = native_rng
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    @property
+    def dtype(self):
+        return torch.float32
+
+    def configure(self):
+        """One-time process setup for this backend."""
+
+    def autocast(self, dtype):
+        return contextlib.nullcontext()
+
+    def generator(self, seed):
+        return torch.Generator(self.device if self.native_rng else "cpu").manual_seed(seed)
+
+    def empty_cache(self):
+        pass
+
+    def synchronize(self):
+        pass
+
+    def memory(self):
+        """{"total": bytes, "reserved": bytes} of device memory, or None when unknown."""
+        return None
+
+    def free_memory_gb(self):
+        memory = self.memory()
+        if memory is None:
+            return None
+        return (memory["total"] - memory["reserved"]) / GB
+
+    def optimize_module(self, module, dtype, channels_last=False, **options):
+        if channels_last:
+            module = module.to(memory_format=torch.channels_last)
+        return module.eval()
+
+    def describe(self):
+        return self.name
+
+
+class XPUBackend(DeviceBackend):
+    name = "xpu"
+    device = "xpu"
+    supports_cpu_offload = True
+
+    @classmethod
+    def is_available(cls):
+        return hasattr(torch, "xpu") and torch.xpu.is_available()
+
+    @property
+    def dtype(self):
+        return torch.bfloat16
+
+    def autocast(self, dtype):
+        return torch.xpu.amp.autocast(enabled=True, dtype=dtype)
+
+    def empty_cache(self):
+        torch.xpu.empty_cache()
+
+    def synchronize(self):
+        torch.xpu.synchronize()
+
+    def memory(self):
+        return {
+            "total": torch.xpu.get_device_properties(0).total_memory,
+            "reserved": torch.xpu.memory_reserved(0),
+        }
+
+    def optimize_module(self, module, dtype, channels_last=False, **options):
+        import intel_extension_for_pytorch as ipex
+
+        if channels_last:
+            module = module.to(memory_format=torch.channels_last)
+        return ipex.optimize(module.eval(), dtype=dtype, inplace=True, **options)
+
+    def describe(self):
+        return f"Intel GPU ({torch.xpu.get_device_name(0)})"
+
+
+class CPUBackend(DeviceBackend):
+    name = "cpu"
+    device = "cpu"
+
+    def __init__(self, native_rng=False, threads=None):
+        super().__init__(native_rng)
+        self.threads = threads
+        self.flags = _cpu_flags()
+
+    @property
+    def has_fast_bf16(self):
+        # Without AVX512-BF16 or AMX, bf16 matmuls are emulated and slower than fp32.
+        return bool(self.flags & {"avx512_bf16", "amx_bf16"})
+
+    @property
+    def dtype(self):
+        return torch.bfloat16 if self.has_fast_bf16 else torch.float32
+
+    def configure(self):
+        threads = self.threads or physical_core_count()
+        torch.set_num_threads(threads)
+        # Inter-op parallelism only oversubscribes the cores for diffusion workloads.
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+        logger.info(
+            f"CPU backend: {threads} threads, {'bfloat16' if self.has_fast_bf16 else 'float32'} compute."
+        )
+
+    def autocast(self, dtype):
+        if dtype == torch.float32:
+            return contextlib.nullcontext()
+        return torch.autocast("cpu", dtype=dtype)
+
+    def memory(self):
+        from core.model_cache import total_host_bytes, available_host_bytes
+
+        total, available = total_host_bytes(), available_host_bytes()
+        if total is None or available is None:
+            return None
+        return {"total": total, "reserved": total - available}
+
+    def optimize_module(self, module, dtype, channels_last=False, **options):
+        if channels_last:
+            module = module.to(memory_format=torch.channels_last)
+        try:
+            import intel_extension_for_pytorch as ipex
+        except ImportError:
+            return module.eval()
+        return ipex.optimize(module.eval(), dtype=dtype, inplace=True, **options)
+
+    def describe(self):
+        return f"CPU ({physical_core_count()} cores, {'bf16' if self.has_fast_bf16 else 'fp32'})"
+
+
+class FakeBackend(DeviceBackend):
+    """CPU execution with no tuning and call counters, for tests and benchmarks."""
+
+    name = "fake"
+    device = "cpu"
+
+    def __init__(self, native_rng=False, total_memory=16 * GB):
+        super().__init__(native_rng)
+        self.total_memory = total_memory
+        self.reserved_memory = 0
+        self.calls = {"empty_cache": 0, "synchronize": 0, "optimize_module": 0}
+
+    def empty_cache(self):
+        self.calls["empty_cache"] += 1
+
+    def synchronize(self):
+        self.calls["synchronize"] += 1
+
+    def memory(self):
+        return {"total": self.total_memory, "reserved": self.reserved_memory}
+
+    def optimize_module(self, module, dtype, channels_last=False, **options):
+        self.calls["optimize_module"] += 1
+        return module.eval()
+
+
+BACKENDS = {"xpu": XPUBackend, "cpu": CPUBackend, "fake": FakeBackend}
+_backend = None
+
+
+def set_backend(name="auto", **options):
+    """Select the device backend for this process; "auto" prefers the Intel GPU."""
+    global _backend
+    if name == "auto":
+        name = "xpu" if XPUBackend.is_available() else "cpu"
+        if name == "cpu":
+            logger.warning("Intel ARC GPU (XPU) not detected. Running on the CPU.")
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        raise ValueError(f"Unknown device backend '{name}'.")
+    if not backend_class.is_available():
+        raise RuntimeError(f"Device backend '{name}' is not available on this machine.")
+    if name != "cpu":
+        options.pop("threads", None)
+    _backend = backend_class(**options)
+    _backend.configure()
+    return _backend
+
+
+def get_backend():
+    if _backend is None:
+        set_backend()
+    return _backend
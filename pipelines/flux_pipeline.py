@@ -1,19 +1,29 @@
-import torch
 import logging
 import os
 import requests
 from diffusers import FluxPipeline, FluxTransformer2DModel
 from huggingface_hub.errors import GatedRepoError
 from .base_pipeline import ArtTicPipeline
+from .component_store import component_store
+from core.metrics import metrics
 
 logger = logging.getLogger("arttic_lab")
 
 FLUX_DEV_BASE_REPO = "black-forest-labs/FLUX.1-dev"
 FLUX_SCHNELL_BASE_REPO = "black-forest-labs/FLUX.1-schnell"
+# The transformer comes from the local checkpoint, so only its config is stored.
+FLUX_COMPONENT_PATTERNS = [
+    "model_index.json",
+    "scheduler/*",
+    "text_encoder*/*",
+    "tokenizer*/*",
+    "transformer/config.json",
+    "vae/*",
+]
 
 
 class ArtTicFLUXPipeline(ArtTicPipeline):
-    def __init__(self, model_path, dtype=torch.bfloat16, is_schnell=False):
+    def __init__(self, model_path, dtype=None, is_schnell=False):
         super().__init__(model_path, dtype)
         self.is_schnell = is_schnell
 
@@ -28,19 +38,23 @@ class ArtTicFLUXPipeline(ArtTicPipeline):
         progress(0.2, desc)
         try:
             logger.info(f"Loading transformer from local file: {self.model_path}")
-            transformer = FluxTransformer2DModel.from_single_file(
-                self.model_path, torch_dtype=self.dtype
-            )
+            with metrics.stage("conversion"):
+                transformer = FluxTransformer2DModel.from_single_file(
+                    self.model_path, torch_dtype=self.dtype
+                )
             logger.info("Local transformer loaded successfully.")
 
             progress(0.4, f"Loading remaining components from {repo_id}...")
-            self.pipe = FluxPipeline.from_pretrained(
-                repo_id,
-                transformer=transformer,
-                torch_dtype=self.dtype,
-                use_safetensors=True,
-                progress_bar_config={"disable": True},
-            )
+            components_dir = component_store.resolve(repo_id, FLUX_COMPONENT_PATTERNS)
+            with metrics.stage("checkpoint_read"):
+                self.pipe = FluxPipeline.from_pretrained(
+                    components_dir,
+                    local_files_only=True,
+                    transformer=transformer,
+                    torch_dtype=self.dtype,
+                    use_safetensors=True,
+                    progress_bar_config={"disable": True},
+                )
             logger.info("Pipeline constructed with local transformer.")
 
         except GatedRepoError as e:
@@ -74,6 +88,20 @@ class ArtTicFLUXPipeline(ArtTicPipeline):
             f"Successfully loaded FLUX {model_type} model '{os.path.basename(self.model_path)}'"
         )
 
+    def _encode_prompt_embeds(self, prompt, negative_prompt, do_cfg, lora_scale):
+        # FLUX is guidance-distilled: only the positive prompt is encoded here.
+        prompt_embeds, pooled_prompt_embeds, _ = self.pipe.encode_prompt(
+            prompt=prompt,
+            prompt_2=None,
+            device=self.pipe._execution_device,
+            num_images_per_prompt=1,
+            lora_scale=lora_scale,
+        )
+        return {
+            "prompt_embeds": prompt_embeds,
+            "pooled_prompt_embeds": pooled_prompt_embeds,
+        }
+
     def generate(self, *args, **kwargs):
         if self.is_schnell and "negative_prompt" in kwargs:
             logger.info(
@@ -6,10 +6,9 @@ from .base_pipeline import ArtTicPipeline
 class SD2Pipeline(ArtTicPipeline):
     def load_pipeline(self, progress):
         progress(0.2, "Loading StableDiffusionPipeline (v2)...")
-        self.pipe = StableDiffusionPipeline.from_single_file(
-            self.model_path,
-            torch_dtype=self.dtype,
-            use_safetensors=True,
+        self._load_single_file(
+            StableDiffusionPipeline,
+            progress,
             safety_checker=None,
             progress_bar_config={"disable": True},
         )
@@ -2,23 +2,39 @@
 import torch
 from diffusers import StableDiffusion3Pipeline
 from .base_pipeline import ArtTicPipeline
+from .component_store import component_store
+from core.metrics import metrics
 import logging
 
 logger = logging.getLogger("arttic_lab")
 
 SD3_BASE_MODEL_REPO = "stabilityai/stable-diffusion-3-medium-diffusers"
+# Diffusers-layout folders only; the repo root also carries single-file checkpoints.
+SD3_COMPONENT_PATTERNS = [
+    "model_index.json",
+    "scheduler/*",
+    "text_encoder*/*",
+    "tokenizer*/*",
+    "transformer/*",
+    "vae/*",
+]
 
 
 class SD3Pipeline(ArtTicPipeline):
     def load_pipeline(self, progress):
-        progress(0.2, "Loading base SD3 components from Hugging Face...")
+        progress(0.2, "Loading base SD3 components...")
         try:
-            self.pipe = StableDiffusion3Pipeline.from_pretrained(
-                SD3_BASE_MODEL_REPO,
-                torch_dtype=self.dtype,
-                use_safetensors=True,
-                progress_bar_config={"disable": True},
+            components_dir = component_store.resolve(
+                SD3_BASE_MODEL_REPO, SD3_COMPONENT_PATTERNS
             )
+            with metrics.stage("checkpoint_read"):
+                self.pipe = StableDiffusion3Pipeline.from_pretrained(
+                    components_dir,
+                    local_files_only=True,
+                    torch_dtype=self.dtype,
+                    use_safetensors=True,
+                    progress_bar_config={"disable": True},
+                )
         except Exception as e:
             logger.error(
                 f"Failed to download SD3 base model. Check internet connection. Error: {e}"
@@ -28,5 +44,29 @@ class SD3Pipeline(ArtTicPipeline):
             )
 
         progress(0.5, "Injecting local model weights...")
-        self.pipe.load_lora_weights(self.model_path)
+        with metrics.stage("conversion"):
+            self.pipe.load_lora_weights(self.model_path)
         logger.info(f"Successfully injected weights from '{self.model_path}'")
+
+    def _encode_prompt_embeds(self, prompt, negative_prompt, do_cfg, lora_scale):
+        (
+            prompt_embeds,
+            negative_prompt_embeds,
+            pooled_prompt_embeds,
+            negative_pooled_prompt_embeds,
+        ) = self.pipe.encode_prompt(
+            prompt=prompt,
+            prompt_2=None,
+            prompt_3=None,
+            device=self.pipe._execution_device,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=do_cfg,
+            negative_prompt=negative_prompt,
+            lora_scale=lora_scale,
+        )
+        return {
+            "prompt_embeds": prompt_embeds,
+            "negative_prompt_embeds": negative_prompt_embeds,
+            "pooled_prompt_embeds": pooled_prompt_embeds,
+            "negative_pooled_prompt_embeds": negative_pooled_prompt_embeds,
+        }
@@ -6,11 +6,31 @@ from .base_pipeline import ArtTicPipeline
 class SDXLPipeline(ArtTicPipeline):
     def load_pipeline(self, progress):
         progress(0.2, "Loading StableDiffusionXLPipeline...")
-        self.pipe = StableDiffusionXLPipeline.from_single_file(
-            self.model_path,
-            torch_dtype=self.dtype,
-            use_safetensors=True,
+        self._load_single_file(
+            StableDiffusionXLPipeline,
+            progress,
             variant="fp16",
             safety_checker=None,
             progress_bar_config={"disable": True},
         )
+
+    def _encode_prompt_embeds(self, prompt, negative_prompt, do_cfg, lora_scale):
+        (
+            prompt_embeds,
+            negative_prompt_embeds,
+            pooled_prompt_embeds,
+            negative_pooled_prompt_embeds,
+        ) = self.pipe.encode_prompt(
+            prompt=prompt,
+            device=self.pipe._execution_device,
+            num_images_per_prompt=1,
+            do_classifier_free_guidance=do_cfg,
+            negative_prompt=negative_prompt,
+            lora_scale=lora_scale,
+        )
+        return {
+            "prompt_embeds": prompt_embeds,
+            "negative_prompt_embeds": negative_prompt_embeds,
+            "pooled_prompt_embeds": pooled_prompt_embeds,
+            "negative_pooled_prompt_embeds": negative_pooled_prompt_embeds,
+        }
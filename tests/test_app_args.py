@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+
+from app import build_parser
+
+
+def test_batch_model_is_not_read_as_a_model_cache_flag():
+    args = build_parser().parse_args(["batch", "jobs.jsonl", "--model", "sdxl_base"])
+    assert args.command == "batch"
+    assert args.jobs_file == "jobs.jsonl"
+    assert args.model == "sdxl_base"
+    assert args.model_cache_gb is None
+
+
+def test_batch_model_with_equals_and_prompts():
+    args = build_parser().parse_args(["batch", "--prompts", "Castle", "--model=sd15"])
+    assert args.prompts == ["Castle"]
+    assert args.model == "sd15"
+
+
+def test_global_flags_still_parse_before_the_subcommand():
+    args = build_parser().parse_args(["--model-cache-gb", "8", "batch", "jobs.jsonl"])
+    assert args.model_cache_gb == 8
+    assert args.model is None
+
+
+def test_abbreviated_flags_are_rejected():
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["--model-cache", "8"])
@@ -0,0 +1,165 @@
+# web/client_connection.py
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger("arttic_lab")
+
+MAX_QUEUE = 64
+# Past this depth a client counts as falling behind and stops getting preview frames.
+DOWNGRADE_DEPTH = 16
+SEND_TIMEOUT = 10
+QUEUE_WAIT_TIMEOUT = 10
+
+
+class ClientConnection:
+    """Bounded outbound queue for one websocket, drained by its own task.
+
+    Handlers and broadcasts only enqueue, so a stalled browser never holds up
+    anyone else. Messages sent with coalesce=True are state snapshots: a newer
+    one replaces a queued one of the same type, or is folded into it by a
+    merge function for messages that are not full snapshots. Binary preview frames are shed
+    once the client falls behind. A client that cannot take a regular message
+    within QUEUE_WAIT_TIMEOUT, or a single send within SEND_TIMEOUT, is cut off.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        max_queue=MAX_QUEUE,
+        downgrade_depth=DOWNGRADE_DEPTH,
+        send_timeout=SEND_TIMEOUT,
+        queue_wait_timeout=QUEUE_WAIT_TIMEOUT,
+    ):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.downgrade_depth = downgrade_depth
+        self.send_timeout = send_timeout
+        self.queue_wait_timeout = queue_wait_timeout
+        self._queue = deque()
+        self._queued_by_key = {}
+        self._has_items = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self.closed = False
+        self.close_reason = None
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.downgraded = False
+        self._closer = None
+        self._task = asyncio.create_task(self._drain())
+
+    async def send_json(self, message, coalesce=False):
+        """Queue a JSON message; waits only while the queue is full."""
+        key = message.get("type") if coalesce else None
+        while not self._offer(message, False, key, None):
+            self._has_room.clear()
+            try:
+                await asyncio.wait_for(self._has_room.wait(), self.queue_wait_timeout)
+            except asyncio.TimeoutError:
+                self.abort("send queue stayed full")
+
+    async def send_bytes(self, data):
+        self._offer(data, True, None, None)
+
+    def offer_json(self, message, merge=None):
+        """Queue a state snapshot without waiting; used for broadcasts.
+
+        merge(queued, message) combines a message with a queued one of its type.
+        """
+        self._offer(message, False, message.get("type"), merge)
+
+    def _offer(self, payload, is_bytes, key, merge):
+        if self.closed:
+            return True
+        if key is not None and key in self._queued_by_key:
+            entry = self._queued_by_key[key]
+            entry[0] = merge(entry[0], payload) if merge else payload
+            self.coalesced += 1
+            return True
+
+        depth = len(self._queue)
+        if depth >= self.downgrade_depth and not self.downgraded:
+            self.downgraded = True
+            logger.warning("A client is falling behind; pausing live previews for it.")
+        if is_bytes and self.downgraded:
+            self.dropped += 1
+            return True
+        if depth >= self.max_queue:
+            if is_bytes or key is not None:
+                self.dropped += 1
+                return True
+            return False
+
+        entry = [payload, is_bytes, key]
+        self._queue.append(entry)
+        if key is not None:
+            self._queued_by_key[key] = entry
+        self.max_depth = max(self.max_depth, depth + 1)
+        self._has_items.set()
+        return True
+
+    async def _drain(self):
+        try:
+            while True:
+                while not self._queue:
+                    if self.downgraded:
+                        self.downgraded = False
+                        logger.info("A client caught up; resuming live previews for it.")
+                    self._has_items.clear()
+                    await self._has_items.wait()
+                entry = self._queue.popleft()
+                payload, is_bytes, key = entry
+                if key is not None and self._queued_by_key.get(key) is entry:
+                    del self._queued_by_key[key]
+                self._has_room.set()
+
+                send = (
+                    self.websocket.send_bytes(payload)
+                    if is_bytes
+                    else self.websocket.send_json(payload)
+                )
+                await asyncio.wait_for(send, self.send_timeout)
+                self.sent += 1
+        except asyncio.TimeoutError:
+            self.abort("send timed out")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.abort(f"send failed: {e}")
+
+    def abort(self, reason):
+        """Stop sending to this client and close its socket."""
+        if self.closed:
+            return
+        logger.warning(f"Disconnecting slow or dead client: {reason}.")
+        self.close_reason = reason
+        self.dropped += len(self._queue)
+        self.close()
+        self._closer = asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+
+    def close(self):
+        self.closed = True
+        self._queue.clear()
+        self._queued_by_key.clear()
+        self._has_room.set()
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "downgraded": self.downgraded,
+        }
@@ -0,0 +1,117 @@
+# web/progress_channel.py
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger("arttic_lab")
+
+DEFAULT_MAX_RATE = 10
+max_rate = DEFAULT_MAX_RATE
+
+
+def set_max_rate(rate):
+    """Set the max progress flushes per second for channels created from now on."""
+    global max_rate
+    if rate <= 0:
+        raise ValueError("Progress rate must be positive.")
+    max_rate = rate
+
+
+class ProgressChannel:
+    """Latest-value progress and preview mailbox for one websocket.
+
+    Worker threads call publish()/publish_preview(), which only overwrite the
+    newest value and wake the event loop if no flush is pending yet, so they
+    never block and never pile up futures. One drain task on the loop sends
+    whatever is newest, at most `rate` times per second.
+    """
+
+    def __init__(self, loop, send_json, send_bytes=None, message_type="progress_update", rate=None):
+        self.loop = loop
+        self.message_type = message_type
+        self._send_json = send_json
+        self._send_bytes = send_bytes
+        self.interval = 1 / (rate or max_rate)
+        self._lock = threading.Lock()
+        self._progress = None
+        self._preview = None
+        self._scheduled = False
+        self._last_flush = 0.0
+        self._task = None
+        self.closed = False
+        self.published = 0
+        self.sent = 0
+        self.wakeups = 0
+
+    def publish(self, progress, desc):
+        self._offer("_progress", {"progress": progress, "description": desc})
+
+    def publish_preview(self, frame):
+        if self._send_bytes is not None:
+            self._offer("_preview", frame)
+
+    def _offer(self, slot, value):
+        with self._lock:
+            if self.closed:
+                return
+            setattr(self, slot, value)
+            self.published += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+            self.wakeups += 1
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # The loop is shutting down; nobody is listening anymore.
+            self.closed = True
+
+    def _wake(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while True:
+            with self._lock:
+                if self.closed or (self._progress is None and self._preview is None):
+                    self._scheduled = False
+                    return
+            delay = self._last_flush + self.interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._flush()
+
+    async def _flush(self):
+        with self._lock:
+            progress, preview = self._progress, self._preview
+            self._progress = self._preview = None
+        self._last_flush = time.perf_counter()
+        try:
+            if progress is not None:
+                await self._send_json({"type": self.message_type, "data": progress})
+                self.sent += 1
+            if preview is not None:
+                await self._send_bytes(preview)
+                self.sent += 1
+        except Exception as e:
+            logger.debug(f"Dropping progress update for a closed connection: {e}")
+            self.close()
+
+    def discard(self):
+        """Drop pending updates, e.g. so they cannot arrive after the job's result."""
+        with self._lock:
+            self._progress = self._preview = None
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._progress = self._preview = None
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "sent": self.sent,
+            "coalesced": max(0, self.published - self.sent),
+            "wakeups": self.wakeups,
+        }
@@ -1,11 +1,16 @@
 import asyncio
 import logging
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from jinja2 import Environment, FileSystemLoader
 from core import logic as core
-from core.logic import OOMError
+from core.logic import OOMError, GenerationCancelledError
+from core.job_queue import job_queue, QueueFullError, JobCancelledError
+from core.gallery_index import DEFAULT_PAGE_SIZE, merge_changes
+from core.metrics import metrics
+from web.progress_channel import ProgressChannel
+from web.client_connection import ClientConnection
 import os
 
 APP_LOGGER_NAME = "arttic_lab"
@@ -22,6 +27,20 @@ env = Environment(loader=FileSystemLoader("web/templates"))
 index_template = env.get_template("index.html")
 
 
+@app.on_event("startup")
+async def reconcile_gallery_index():
+    global gallery_version_sent
+    await asyncio.to_thread(core.reconcile_gallery)
+    gallery_version_sent = core.get_gallery_version()
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    loop = asyncio.get_running_loop()
+    job_queue.on_change = lambda: loop.call_soon_threadsafe(schedule_queue_update)
+    job_queue.start()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     return index_template.render()
@@ -38,8 +57,17 @@ async def get_initial_config():
 
 
 @app.get("/api/gallery")
-async def get_gallery_images():
-    return {"images": core.get_output_images()}
+async def get_gallery_images(cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE):
+    try:
+        return core.get_gallery_page(cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/gallery/changes")
+async def get_gallery_changes(since: int):
+    """Changes after a version; null means the client has to reload the gallery."""
+    return core.get_gallery_changes(since)
 
 
 @app.get("/api/prompts")
@@ -77,6 +105,46 @@ async def delete_prompt(request: Request):
     return core.delete_prompt(title)
 
 
+@app.get("/api/cache_stats")
+async def get_cache_stats():
+    return core.get_cache_stats()
+
+
+@app.get("/api/model_cache")
+async def get_model_cache():
+    return core.get_model_cache_stats()
+
+
+@app.get("/api/connections")
+async def get_connection_stats():
+    return manager.stats()
+
+
+@app.get("/api/job_timings")
+async def get_job_timings():
+    return core.get_job_timings()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/traces/{filename}")
+async def get_trace(filename: str):
+    try:
+        path = core.get_trace_path(filename)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Invalid filename.")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No trace recorded for '{filename}'.")
+    return FileResponse(
+        path, media_type="application/json", filename=os.path.basename(path)
+    )
+
+
 @app.get("/api/image_metadata/{filename}")
 async def get_image_metadata(filename: str):
     return core.get_image_metadata(filename)
@@ -85,113 +153,365 @@ async def get_image_metadata(filename: str):
 class ConnectionManager:
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        self.connections: dict[WebSocket, ClientConnection] = {}
+        self.progress_channels: dict[WebSocket, ProgressChannel] = {}
+        self.closed_stats = {"connections": 0, "slow_disconnects": 0, "sent": 0, "dropped": 0}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        connection = ClientConnection(websocket)
+        self.connections[websocket] = connection
+        self.progress_channels[websocket] = ProgressChannel(
+            asyncio.get_running_loop(),
+            lambda message: connection.send_json(message, coalesce=True),
+            connection.send_bytes,
+        )
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+        channel = self.progress_channels.pop(websocket, None)
+        if channel:
+            channel.close()
+        connection = self.connections.pop(websocket, None)
+        if connection:
+            connection.close()
+            self.closed_stats["connections"] += 1
+            self.closed_stats["slow_disconnects"] += connection.close_reason is not None
+            self.closed_stats["sent"] += connection.sent
+            self.closed_stats["dropped"] += connection.dropped
+
+    async def send(self, websocket: WebSocket, message: dict, coalesce=False):
+        connection = self.connections.get(websocket)
+        if connection:
+            await connection.send_json(message, coalesce=coalesce)
+
+    async def broadcast(self, message: dict, merge=None):
+        """Queue a state snapshot for every client; never waits on any of them."""
+        for connection in list(self.connections.values()):
+            connection.offer_json(message, merge)
+
+    def stats(self):
+        clients = [c.stats() for c in self.connections.values()]
+        return {
+            "clients": clients,
+            "total_depth": sum(c["depth"] for c in clients),
+            "max_depth": max((c["max_depth"] for c in clients), default=0),
+            "sent": self.closed_stats["sent"] + sum(c["sent"] for c in clients),
+            "dropped": self.closed_stats["dropped"] + sum(c["dropped"] for c in clients),
+            "coalesced": sum(c["coalesced"] for c in clients),
+            "closed_connections": self.closed_stats["connections"],
+            "slow_disconnects": self.closed_stats["slow_disconnects"],
+        }
 
 
 manager = ConnectionManager()
+background_tasks = set()
+queue_update_pending = False
+gallery_version_sent = 0
+gallery_broadcast_lock = asyncio.Lock()
+
+
+def server_metrics():
+    snapshot = job_queue.snapshot()
+    yield (
+        "arttic_queue_depth",
+        "gauge",
+        "Jobs waiting for the device worker.",
+        [({}, len(snapshot["pending"]))],
+    )
+    yield (
+        "arttic_queue_running",
+        "gauge",
+        "Jobs running on the device worker, by kind.",
+        [({"kind": snapshot["running"]["kind"]}, 1)] if snapshot["running"] else [],
+    )
+    yield (
+        "arttic_queue_completed_total",
+        "counter",
+        "Jobs the device worker has finished.",
+        [({}, job_queue.completed)],
+    )
+    stats = manager.stats()
+    yield (
+        "arttic_websocket_connections",
+        "gauge",
+        "Open websocket connections.",
+        [({}, len(stats["clients"]))],
+    )
+    yield (
+        "arttic_websocket_send_queue_depth",
+        "gauge",
+        "Messages waiting in websocket send queues.",
+        [({}, stats["total_depth"])],
+    )
+    yield (
+        "arttic_websocket_dropped_total",
+        "counter",
+        "Messages shed because a client fell behind.",
+        [({}, stats["dropped"])],
+    )
+
+
+metrics.add_collector(server_metrics)
+
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+
+async def send_safe(websocket: WebSocket, message: dict):
+    # Goes through the connection's send queue, which handles dead sockets itself.
+    await manager.send(websocket, message)
+
+
+def schedule_queue_update():
+    # Runs on the event loop; many queue changes in a burst become one update.
+    global queue_update_pending
+    if not queue_update_pending:
+        queue_update_pending = True
+        spawn(push_queue_updates())
+
+
+async def push_queue_updates():
+    global queue_update_pending
+    queue_update_pending = False
+    snapshot = job_queue.snapshot()
+    running = snapshot["running"]
+    queue_length = len(snapshot["pending"]) + (1 if running else 0)
+    for connection in list(manager.active_connections):
+        client_id = id(connection)
+        jobs = [
+            {k: v for k, v in job.items() if k != "client_id"}
+            for job in snapshot["pending"]
+            if job["client_id"] == client_id
+        ]
+        await manager.send(
+            connection,
+            {
+                "type": "queue_update",
+                "data": {
+                    "queue_length": queue_length,
+                    "running": (
+                        {"job_id": running["job_id"], "kind": running["kind"]}
+                        if running and running["client_id"] == client_id
+                        else None
+                    ),
+                    "jobs": jobs,
+                },
+            },
+            coalesce=True,
+        )
+
+
+async def broadcast_gallery():
+    """Broadcast what changed since the last broadcast; clients with a gap resync."""
+    global gallery_version_sent
+    async with gallery_broadcast_lock:
+        delta = await asyncio.to_thread(core.get_gallery_changes, gallery_version_sent)
+        if delta is None:
+            delta = {"version": core.get_gallery_version(), "resync": True}
+        elif delta["version"] == gallery_version_sent:
+            return
+        gallery_version_sent = delta["version"]
+    await manager.broadcast({"type": "gallery_delta", "data": delta}, _merge_gallery_deltas)
+
+
+def _merge_gallery_deltas(queued, message):
+    # A delta still waiting in a client's queue is extended, not replaced.
+    return {"type": "gallery_delta", "data": merge_changes(queued["data"], message["data"])}
+
+
+async def deliver_job_result(websocket: WebSocket, job, action, result_type):
+    future = asyncio.wrap_future(job.future)
+    await asyncio.wait([future])
+    # Progress still waiting for its flush must not land after the result.
+    channel = manager.progress_channels.get(websocket)
+    if channel:
+        channel.discard()
+    try:
+        result = future.result()
+    except (JobCancelledError, GenerationCancelledError):
+        cancelled_type = (
+            "generation_cancelled" if action == "generate_image" else "job_cancelled"
+        )
+        await send_safe(
+            websocket,
+            {"type": cancelled_type, "data": {"job_id": job.id, "kind": action}},
+        )
+        return
+    except OOMError as e:
+        await send_safe(
+            websocket, {"type": "generation_failed", "data": {"message": str(e)}}
+        )
+        return
+    except Exception as e:
+        logger.error(f"Error processing action '{action}': {e}", exc_info=True)
+        await send_safe(websocket, {"type": "error", "data": {"message": str(e)}})
+        return
+
+    await send_safe(websocket, {"type": result_type, "data": result})
+    if action == "generate_image":
+        await broadcast_gallery()
+
+
+async def enqueue_job(
+    websocket: WebSocket, action, result_type, fn, cancellable=False, **kwargs
+):
+    try:
+        job = job_queue.submit(
+            id(websocket), action, fn, cancellable=cancellable, **kwargs
+        )
+    except QueueFullError as e:
+        await send_safe(websocket, {"type": "error", "data": {"message": str(e)}})
+        return
+    await send_safe(
+        websocket, {"type": "job_queued", "data": {"job_id": job.id, "kind": action}}
+    )
+    spawn(deliver_job_result(websocket, job, action, result_type))
+
+
+async def preload_and_swap(websocket: WebSocket, payload, progress_callback):
+    """Preload a model off the device worker, then queue the swap like a normal load."""
+    preload_channel = ProgressChannel(
+        asyncio.get_running_loop(),
+        lambda message: manager.send(websocket, message, coalesce=True),
+        message_type="preload_progress",
+    )
+    try:
+        result = await asyncio.to_thread(
+            core.preload_model, **payload, progress_callback=preload_channel.publish
+        )
+    except Exception as e:
+        logger.error(f"Error preloading model: {e}", exc_info=True)
+        await send_safe(websocket, {"type": "preload_failed", "data": {"message": str(e)}})
+        return
+    finally:
+        preload_channel.close()
+    await send_safe(websocket, {"type": "preload_ready", "data": result})
+    await enqueue_job(
+        websocket,
+        "load_model",
+        "model_loaded",
+        core.load_model,
+        **payload,
+        progress_callback=progress_callback,
+    )
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
+    channel = manager.progress_channels[websocket]
     try:
-        loop = asyncio.get_running_loop()
         while True:
             data = await websocket.receive_json()
             action = data.get("action")
             payload = data.get("payload", {})
 
-            async def progress_callback(progress, desc):
-                await websocket.send_json(
-                    {
-                        "type": "progress_update",
-                        "data": {"progress": progress, "description": desc},
-                    }
-                )
-
             try:
                 if action == "load_model":
-                    result = await asyncio.to_thread(
+                    await enqueue_job(
+                        websocket,
+                        action,
+                        "model_loaded",
                         core.load_model,
                         **payload,
-                        progress_callback=progress_callback,
-                        loop=loop,
+                        progress_callback=channel.publish,
                     )
-                    await websocket.send_json({"type": "model_loaded", "data": result})
+
+                elif action == "preload_model":
+                    spawn(preload_and_swap(websocket, payload, channel.publish))
 
                 elif action == "generate_image":
+                    gen_args = {
+                        "prompt": payload.get("prompt"),
+                        "negative_prompt": payload.get("negative_prompt"),
+                        "steps": payload.get("steps"),
+                        "guidance": payload.get("guidance"),
+                        "seed": payload.get("seed"),
+                        "width": payload.get("width"),
+                        "height": payload.get("height"),
+                        "lora_weight": payload.get("lora_weight"),
+                        "num_images": payload.get("num_images", 1),
+                        "seeds": payload.get("seeds"),
+                        "scheduler_name": payload.get("scheduler_name"),
+                        "loras": payload.get("loras"),
+                        "preview": bool(payload.get("preview", False)),
+                        "trace": bool(payload.get("trace", False)),
+                        "profile": bool(payload.get("profile", False)),
+                    }
                     try:
-                        gen_args = {
-                            "prompt": payload.get("prompt"),
-                            "negative_prompt": payload.get("negative_prompt"),
-                            "steps": payload.get("steps"),
-                            "guidance": payload.get("guidance"),
-                            "seed": payload.get("seed"),
-                            "width": payload.get("width"),
-                            "height": payload.get("height"),
-                            "lora_weight": payload.get("lora_weight"),
-                            "init_image": payload.get("init_image"),
-                            "strength": payload.get("strength"),
-                        }
-                        result = await asyncio.to_thread(
-                            core.generate_image,
-                            **gen_args,
-                            progress_callback=progress_callback,
-                            loop=loop,
+                        requested = max(
+                            int(gen_args["num_images"] or 1), len(gen_args["seeds"] or ())
                         )
-                        await websocket.send_json(
-                            {"type": "generation_complete", "data": result}
-                        )
-                        await manager.broadcast(
+                    except (TypeError, ValueError):
+                        requested = None
+                    if requested is None or requested > core.MAX_IMAGES_PER_REQUEST:
+                        await send_safe(
+                            websocket,
                             {
-                                "type": "gallery_updated",
-                                "data": {"images": core.get_output_images()},
-                            }
-                        )
-                    except OOMError as e:
-                        await websocket.send_json(
-                            {"type": "generation_failed", "data": {"message": str(e)}}
+                                "type": "generation_failed",
+                                "data": {
+                                    "message": "Ask for between 1 and "
+                                    f"{core.MAX_IMAGES_PER_REQUEST} images per request."
+                                },
+                            },
                         )
+                        continue
+                    await enqueue_job(
+                        websocket,
+                        action,
+                        "generation_complete",
+                        core.generate_image,
+                        cancellable=True,
+                        **gen_args,
+                        progress_callback=channel.publish,
+                        preview_callback=channel.publish_preview,
+                    )
+
+                elif action == "set_loras":
+                    await enqueue_job(
+                        websocket,
+                        action,
+                        "loras_updated",
+                        core.set_loras,
+                        loras=payload.get("loras", []),
+                        fuse=payload.get("fuse", False),
+                    )
+
+                elif action == "cancel_generation":
+                    job_ids = job_queue.cancel(id(websocket), payload.get("job_id"))
+                    await send_safe(
+                        websocket, {"type": "cancel_requested", "data": {"job_ids": job_ids}}
+                    )
 
                 elif action == "unload_model":
-                    result = await asyncio.to_thread(core.unload_model)
-                    await websocket.send_json(
-                        {"type": "model_unloaded", "data": result}
+                    await enqueue_job(
+                        websocket, action, "model_unloaded", core.unload_model
                     )
 
                 elif action == "delete_image":
                     filename = payload.get("filename")
                     result = await asyncio.to_thread(core.delete_image, filename)
-                    await websocket.send_json({"type": "image_deleted", "data": result})
-                    await manager.broadcast(
-                        {
-                            "type": "gallery_updated",
-                            "data": {"images": core.get_output_images()},
-                        }
-                    )
+                    await send_safe(websocket, {"type": "image_deleted", "data": result})
+                    await broadcast_gallery()
 
                 elif action == "get_settings_data":
                     data = {
                         "models": await asyncio.to_thread(core.get_model_files),
                         "loras": await asyncio.to_thread(core.get_lora_files),
                     }
-                    await websocket.send_json({"type": "settings_data", "data": data})
+                    await send_safe(websocket, {"type": "settings_data", "data": data})
 
                 elif action == "delete_model_file":
                     filename = payload.get("filename")
                     result = await asyncio.to_thread(core.delete_model_file, filename)
-                    await websocket.send_json(
-                        {"type": "model_file_deleted", "data": result}
+                    await send_safe(
+                        websocket, {"type": "model_file_deleted", "data": result}
                     )
                     if result.get("status") == "success":
                         updated_data = {
@@ -205,8 +525,8 @@ async def websocket_endpoint(websocket: WebSocket):
                 elif action == "delete_lora_file":
                     filename = payload.get("filename")
                     result = await asyncio.to_thread(core.delete_lora_file, filename)
-                    await websocket.send_json(
-                        {"type": "lora_file_deleted", "data": result}
+                    await send_safe(
+                        websocket, {"type": "lora_file_deleted", "data": result}
                     )
                     if result.get("status") == "success":
                         updated_data = {
@@ -218,24 +538,25 @@ async def websocket_endpoint(websocket: WebSocket):
                         )
 
                 elif action == "restart_backend":
-                    await websocket.send_json(
-                        {"type": "backend_restarting", "data": {}}
+                    await send_safe(
+                        websocket, {"type": "backend_restarting", "data": {}}
                     )
                     await asyncio.sleep(0.5)
                     core.restart_backend()
                     break
 
                 elif action == "clear_cache":
-                    result = await asyncio.to_thread(core.clear_cache)
-                    await websocket.send_json({"type": "cache_cleared", "data": result})
+                    await enqueue_job(
+                        websocket, action, "cache_cleared", core.clear_cache
+                    )
 
                 else:
                     logger.warning(f"Unknown WebSocket action received: {action}")
 
             except Exception as e:
                 logger.error(f"Error processing action '{action}': {e}", exc_info=True)
-                await websocket.send_json(
-                    {"type": "error", "data": {"message": str(e)}}
+                await send_safe(
+                    websocket, {"type": "error", "data": {"message": str(e)}}
                 )
 
     except WebSocketDisconnect:
@@ -243,5 +564,6 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"An unexpected error occurred in WebSocket: {e}", exc_info=True)
     finally:
+        job_queue.drop_client(id(websocket))
         if websocket in manager.active_connections:
             manager.disconnect(websocket)
@@ -2,9 +2,15 @@ document.addEventListener("DOMContentLoaded", () => {
   const state = {
     socket: null,
     isModelLoaded: false,
+    loadedModelName: null,
     lastGeneratedImage: null,
     maxVramRes: null,
     galleryImages: [],
+    galleryVersion: null,
+    galleryLoadId: 0,
+    galleryCursor: null,
+    galleryLoadingMore: false,
+    galleryItems: new Map(),
     prompts: [],
     settings: { models: [], loras: [] },
     notifications: {},
@@ -33,6 +39,9 @@ document.addEventListener("DOMContentLoaded", () => {
         "ugly, deformed, blurry, noisy, saturated colors, warm colors",
       steps: 50,
       guidance: 5,
+      num_images: 1,
+      preview: true,
+      trace: false,
       seed: -1,
       width: 512,
       height: 512,
@@ -110,6 +119,7 @@ document.addEventListener("DOMContentLoaded", () => {
       dockButtons: document.querySelectorAll("#node-dock .node-dock-button"),
       loadModelBtn: document.getElementById("dock-load-model-btn"),
       generateBtn: document.getElementById("dock-generate-btn"),
+      cancelBtn: document.getElementById("dock-cancel-btn"),
     },
     restartBtn: document.getElementById("restart-backend-btn"),
     clearCacheBtn: document.getElementById("clear-cache-btn"),
@@ -136,12 +146,16 @@ document.addEventListener("DOMContentLoaded", () => {
     const url = `${window.location.protocol === "https:" ? "wss:" : "ws:"}//${window.location.host
       }/ws`;
     state.socket = new WebSocket(url);
+    state.socket.binaryType = "arraybuffer";
     state.socket.onopen = () => {
       updateConnectionStatus("Connected", "connected");
+      // Deltas broadcast while we were disconnected were missed.
+      if (state.galleryVersion !== null) resyncGallery();
       fetch("/api/status")
         .then((r) => r.json())
         .then((status) => {
           state.isModelLoaded = status.is_model_loaded;
+          state.loadedModelName = status.model_name || null;
           updateLoadUnloadButton();
           if (state.isModelLoaded) {
             updateNodeUI("model_sampler", {
@@ -161,11 +175,35 @@ document.addEventListener("DOMContentLoaded", () => {
       state.socket.close();
     };
     state.socket.onmessage = (event) => {
+      if (event.data instanceof ArrayBuffer) {
+        handleBinaryFrame(event.data);
+        return;
+      }
       const { type, data } = JSON.parse(event.data);
       handleWebSocketMessage(type, data);
     };
   }
 
+  const PREVIEW_FRAME_TYPE = 1;
+  const PREVIEW_HEADER_BYTES = 5;
+
+  function handleBinaryFrame(buffer) {
+    const view = new DataView(buffer);
+    if (view.getUint8(0) !== PREVIEW_FRAME_TYPE) return;
+    const node = state.nodes.get("image_preview")?.el;
+    if (!node) return;
+    const blob = new Blob([buffer.slice(PREVIEW_HEADER_BYTES)], {
+      type: "image/jpeg",
+    });
+    const img = node.querySelector(".preview-img");
+    if (img.dataset.previewUrl) URL.revokeObjectURL(img.dataset.previewUrl);
+    img.dataset.previewUrl = URL.createObjectURL(blob);
+    img.src = img.dataset.previewUrl;
+    img.classList.remove("hidden");
+    node.querySelector(".placeholder").classList.add("hidden");
+    node.querySelector("#image-info-text").textContent = `Preview: step ${view.getUint16(1)}/${view.getUint16(3)}`;
+  }
+
   function sendMessage(action, payload = {}) {
     if (state.socket?.readyState === WebSocket.OPEN) {
       state.socket.send(JSON.stringify({ action, payload }));
@@ -177,6 +215,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const handlers = {
       model_loaded: (data) => {
         state.isModelLoaded = true;
+        state.loadedModelName = data.model_name;
         state.maxVramRes = data.max_res_vram;
         updateLoadUnloadButton();
         showNotification("Model loaded successfully", "success", 3000);
@@ -199,7 +238,19 @@ document.addEventListener("DOMContentLoaded", () => {
           image: data.image_filename,
           info: data.info,
         });
-        showNotification("Image generated!", "success", 3000);
+        const count = data.images?.length || 1;
+        showNotification(
+          count > 1 ? `${count} images generated!` : "Image generated!",
+          "success",
+          3000
+        );
+        if (data.trace) {
+          showNotification(
+            `Trace recorded: <a href="/api/traces/${encodeURIComponent(data.image_filename)}" download>${data.trace}</a>`,
+            "info",
+            10000
+          );
+        }
         clearNotification(progressId);
       },
       generation_failed: (data) => {
@@ -217,6 +268,7 @@ document.addEventListener("DOMContentLoaded", () => {
       },
       model_unloaded: (data) => {
         state.isModelLoaded = false;
+        state.loadedModelName = null;
         state.maxVramRes = null;
         updateLoadUnloadButton();
         showNotification("Model unloaded", "info", 3000);
@@ -226,7 +278,35 @@ document.addEventListener("DOMContentLoaded", () => {
         });
         updateNodeUI("parameters", { max_res: null });
       },
-      gallery_updated: (data) => populateGallery(data.images),
+      preload_progress: (data) => {
+        showNotification(
+          data.description,
+          "progress",
+          null,
+          "preload_notification",
+          data.progress
+        );
+      },
+      preload_ready: () => {
+        clearNotification("preload_notification");
+        showNotification("Model preloaded, switching...", "info", 3000);
+      },
+      preload_failed: (data) => {
+        clearNotification("preload_notification");
+        showNotification(data.message, "error", 5000);
+      },
+      loras_updated: (data) => {
+        updateNodeUI("model_sampler", {
+          status: data.status_message,
+          loaded: true,
+        });
+        showNotification(
+          `LoRAs applied in ${data.switch_seconds}s`,
+          "success",
+          3000
+        );
+      },
+      gallery_delta: applyGalleryDelta,
       image_deleted: (data) => {
         if (data.status === "success") {
           closeLightbox();
@@ -270,6 +350,40 @@ document.addEventListener("DOMContentLoaded", () => {
         showNotification("Backend is restarting...", "info"),
       cache_cleared: () =>
         showNotification("VRAM cache has been cleared.", "success", 3000),
+      job_queued: () => {},
+      cancel_requested: (data) => {
+        if (!data.job_ids.length) {
+          showNotification("Nothing to cancel.", "info", 2000);
+        }
+      },
+      generation_cancelled: () => {
+        showNotification("Generation cancelled", "info", 3000);
+        clearNotification(progressId);
+      },
+      job_cancelled: () =>
+        showNotification("Queued task cancelled", "info", 3000),
+      queue_update: (data) => {
+        const queueId = "queue_notification";
+        const generating =
+          data.running?.kind === "generate_image" ||
+          data.jobs.some((job) => job.kind === "generate_image");
+        ui.node.cancelBtn.classList.toggle("hidden", !generating);
+        if (!data.jobs.length) {
+          clearNotification(queueId);
+          return;
+        }
+        const next = data.jobs[0];
+        const waiting =
+          data.jobs.length > 1 ? ` (${data.jobs.length} of yours waiting)` : "";
+        showNotification(
+          `Queued: position ${next.position}, ~${Math.ceil(
+            next.eta_seconds
+          )}s${waiting}`,
+          "info",
+          null,
+          queueId
+        );
+      },
     };
     (handlers[type] || (() => console.warn(`Unhandled message type: ${type}`)))(
       data
@@ -344,7 +458,17 @@ document.addEventListener("DOMContentLoaded", () => {
   function updateLoadUnloadButton() {
     const btn = ui.node.loadModelBtn;
     const generateBtn = ui.node.generateBtn;
-    if (state.isModelLoaded) {
+    const { model_name } = state.generationState;
+    if (
+      state.isModelLoaded &&
+      model_name &&
+      model_name !== state.loadedModelName
+    ) {
+      btn.innerHTML = `<span class="material-symbols-outlined">swap_horiz</span> Switch Model`;
+      btn.classList.add("btn-primary");
+      btn.classList.remove("btn-danger");
+      generateBtn.disabled = false;
+    } else if (state.isModelLoaded) {
       btn.innerHTML = `<span class="material-symbols-outlined">cancel</span> Unload Model`;
       btn.classList.remove("btn-primary");
       btn.classList.add("btn-danger");
@@ -374,24 +498,121 @@ document.addEventListener("DOMContentLoaded", () => {
     ui.dialog.overlay.classList.remove("hidden");
   }
 
+  function createGalleryItem(imageInfo) {
+    const item = document.createElement("div");
+    item.className = "gallery-item";
+    const imageUrl = `/outputs/${imageInfo.filename}`;
+    item.innerHTML = `<img src="${imageUrl}" alt="${imageInfo.filename}" class="gallery-item-image" loading="lazy"><div class="image-actions-overlay"><a href="${imageUrl}" target="_blank" class="image-action-btn" title="Open in New Tab"><span class="material-symbols-outlined">open_in_new</span></a></div>`;
+    item
+      .querySelector(".image-actions-overlay")
+      .addEventListener("click", (e) => e.stopPropagation());
+    // Look the index up on click: deltas shift positions after the item is created.
+    item.addEventListener("click", () =>
+      openLightbox(
+        state.galleryImages.findIndex(
+          (img) => img.filename === imageInfo.filename
+        )
+      )
+    );
+    state.galleryItems.set(imageInfo.filename, item);
+    return item;
+  }
+
+  function updateGalleryPlaceholder() {
+    ui.gallery.placeholder.classList.toggle(
+      "hidden",
+      state.galleryImages.length === 0
+    );
+  }
+
   function populateGallery(images) {
-    state.galleryImages = images || [];
+    state.galleryImages = [];
+    state.galleryItems.clear();
     ui.gallery.grid.innerHTML = "";
-    const hasImages = state.galleryImages.length > 0;
-    ui.gallery.placeholder.classList.toggle("hidden", !hasImages);
-    if (hasImages) {
-      state.galleryImages.forEach((imageInfo, index) => {
-        const item = document.createElement("div");
-        item.className = "gallery-item";
-        const imageUrl = `/outputs/${imageInfo.filename}`;
-        item.innerHTML = `<img src="${imageUrl}" alt="${imageInfo.filename}" class="gallery-item-image" loading="lazy"><div class="image-actions-overlay"><a href="${imageUrl}" target="_blank" class="image-action-btn" title="Open in New Tab"><span class="material-symbols-outlined">open_in_new</span></a></div>`;
-        item
-          .querySelector(".image-actions-overlay")
-          .addEventListener("click", (e) => e.stopPropagation());
-        item.addEventListener("click", () => openLightbox(index));
-        ui.gallery.grid.appendChild(item);
-      });
+    appendGalleryImages(images || []);
+  }
+
+  function appendGalleryImages(images) {
+    const fresh = images.filter((img) => !state.galleryItems.has(img.filename));
+    state.galleryImages = state.galleryImages.concat(fresh);
+    fresh.forEach((imageInfo) =>
+      ui.gallery.grid.appendChild(createGalleryItem(imageInfo))
+    );
+    updateGalleryPlaceholder();
+  }
+
+  async function loadGallery(firstPage = null) {
+    const loadId = ++state.galleryLoadId;
+    const page = firstPage || (await (await fetch("/api/gallery")).json());
+    if (loadId !== state.galleryLoadId) return;
+    state.galleryVersion = page.version;
+    state.galleryCursor = page.next_cursor;
+    populateGallery(page.images);
+    fillGalleryViewport();
+  }
+
+  async function loadMoreGallery() {
+    if (!state.galleryCursor || state.galleryLoadingMore) return false;
+    const loadId = state.galleryLoadId;
+    state.galleryLoadingMore = true;
+    try {
+      const cursor = encodeURIComponent(state.galleryCursor);
+      const page = await (await fetch(`/api/gallery?cursor=${cursor}`)).json();
+      if (loadId !== state.galleryLoadId) return false;
+      state.galleryCursor = page.next_cursor;
+      appendGalleryImages(page.images);
+      return true;
+    } finally {
+      state.galleryLoadingMore = false;
+    }
+  }
+
+  async function fillGalleryViewport() {
+    // Later pages are fetched on scroll, only while the grid is near its end.
+    // A hidden gallery page has no height and loads nothing.
+    const grid = ui.gallery.grid;
+    const nearEnd = () =>
+      grid.clientHeight > 0 &&
+      grid.scrollTop + grid.clientHeight >= grid.scrollHeight - 400;
+    while (nearEnd()) {
+      if (!(await loadMoreGallery())) break;
+    }
+  }
+
+  function applyGalleryChanges(delta) {
+    state.galleryVersion = delta.version;
+    const replaced = new Set([
+      ...delta.removed,
+      ...delta.added.map((img) => img.filename),
+    ]);
+    replaced.forEach((filename) => {
+      state.galleryItems.get(filename)?.remove();
+      state.galleryItems.delete(filename);
+    });
+    state.galleryImages = delta.added.concat(
+      state.galleryImages.filter((img) => !replaced.has(img.filename))
+    );
+    // Added images are newest first, and the grid is newest first too.
+    ui.gallery.grid.prepend(
+      ...delta.added.map((imageInfo) => createGalleryItem(imageInfo))
+    );
+    updateGalleryPlaceholder();
+  }
+
+  function applyGalleryDelta(delta) {
+    if (state.galleryVersion === null) return;
+    if (delta.resync || delta.from_version !== state.galleryVersion) {
+      resyncGallery();
+      return;
     }
+    applyGalleryChanges(delta);
+  }
+
+  async function resyncGallery() {
+    const res = await fetch(`/api/gallery/changes?since=${state.galleryVersion}`);
+    const delta = await res.json();
+    if (delta) applyGalleryChanges(delta);
+    else loadGallery();
   }
 
   function openLightbox(index) {
@@ -601,6 +822,7 @@ document.addEventListener("DOMContentLoaded", () => {
         content = `<div class="node-content">
           <div class="control-group"><label>Steps</label><div class="slider-input-group"><input type="range" class="range-input" data-key="steps" min="1" max="100" value="${state.generationState.steps}" step="1"><input type="number" data-value-for="steps" value="${state.generationState.steps}"></div></div>
           <div class="control-group"><label>Guidance (CFG)</label><div class="slider-input-group"><input type="range" class="range-input" data-key="guidance" min="1" max="20" value="${state.generationState.guidance}" step="0.5"><input type="number" data-value-for="guidance" value="${state.generationState.guidance}" step="0.5"></div></div>
+          <div class="control-group"><label>Images</label><div class="slider-input-group"><input type="range" class="range-input" data-key="num_images" min="1" max="8" value="${state.generationState.num_images}" step="1"><input type="number" data-value-for="num_images" value="${state.generationState.num_images}"></div></div>
           <div class="control-group"><label>Img2Img Strength</label><div class="slider-input-group"><input type="range" class="range-input" data-key="strength" min="0.05" max="1.0" value="${state.generationState.strength}" step="0.05"><input type="number" data-value-for="strength" value="${state.generationState.strength}" step="0.05"></div></div>
           <div class="control-group"><label>Width</label><div class="slider-input-group"><input type="range" class="range-input" data-key="width" min="256" max="4096" value="${state.generationState.width}" step="64"><input type="number" data-value-for="width" value="${state.generationState.width}"></div></div>
           <div class="control-group"><label>Height</label><div class="slider-input-group"><input type="range" class="range-input" data-key="height" min="256" max="4096" value="${state.generationState.height}" step="64"><input type="number" data-value-for="height" value="${state.generationState.height}"></div></div>
@@ -670,6 +892,7 @@ document.addEventListener("DOMContentLoaded", () => {
         selected.textContent = option;
         state.generationState[key] = option;
         container.classList.remove("open");
+        if (key === "model_name") updateLoadUnloadButton();
       });
       optionsList.appendChild(li);
     });
@@ -923,16 +1146,20 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     ui.node.loadModelBtn.addEventListener("click", () => {
-      if (state.isModelLoaded) {
+      const { model_name, scheduler_name, vae_tiling, cpu_offload } =
+        state.generationState;
+      const switching =
+        state.isModelLoaded && model_name && model_name !== state.loadedModelName;
+      if (state.isModelLoaded && !switching) {
         sendMessage("unload_model");
       } else {
-        const { model_name, scheduler_name, vae_tiling, cpu_offload } =
-          state.generationState;
         if (!model_name || model_name === "Select a model") {
           showNotification("Please select a model first.", "error", 3000);
           return;
         }
-        sendMessage("load_model", {
+        // While a model is loaded, the next one loads in the background and
+        // swaps in between queued jobs.
+        sendMessage(switching ? "preload_model" : "load_model", {
           model_name,
           scheduler_name,
           vae_tiling,
@@ -954,6 +1181,10 @@ document.addEventListener("DOMContentLoaded", () => {
       }
       sendMessage("generate_image", payload);
     });
+
+    ui.node.cancelBtn.addEventListener("click", () =>
+      sendMessage("cancel_generation")
+    );
   }
 
   async function loadPrompts() {
@@ -1137,10 +1368,9 @@ document.addEventListener("DOMContentLoaded", () => {
       });
     });
 
-    ui.gallery.refreshBtn.addEventListener("click", () => {
-      fetch("/api/gallery")
-        .then((res) => res.json())
-        .then((data) => populateGallery(data.images));
+    ui.gallery.refreshBtn.addEventListener("click", () => loadGallery());
+    ui.gallery.grid.addEventListener("scroll", fillGalleryViewport, {
+      passive: true,
     });
 
     ui.promptBook.refreshBtn.addEventListener("click", loadPrompts);
@@ -1155,11 +1385,14 @@ document.addEventListener("DOMContentLoaded", () => {
     );
 
     ui.lightbox.closeBtn.addEventListener("click", closeLightbox);
-    ui.lightbox.nextBtn.addEventListener("click", () =>
+    ui.lightbox.nextBtn.addEventListener("click", async () => {
+      if (state.currentLightboxIndex === state.galleryImages.length - 1) {
+        await loadMoreGallery();
+      }
       showLightboxImage(
         (state.currentLightboxIndex + 1) % state.galleryImages.length
-      )
-    );
+      );
+    });
     ui.lightbox.prevBtn.addEventListener("click", () =>
       showLightboxImage(
         (state.currentLightboxIndex - 1 + state.galleryImages.length) %
@@ -1228,7 +1461,7 @@ document.addEventListener("DOMContentLoaded", () => {
       const config = await response.json();
       state.settings.models = config.models;
       state.settings.loras = config.loras;
-      populateGallery(config.gallery_images);
+      loadGallery(config.gallery);
       state.prompts = config.prompts;
       populatePromptBook(config.prompts);
 